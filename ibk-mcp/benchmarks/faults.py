@@ -0,0 +1,212 @@
+''' Inyección de latencia y errores en las llamadas AWS del servidor (solo pruebas), con reglas por servicio y operación '''
+
+import json
+import math
+import time
+import random
+import fnmatch
+import threading
+from dataclasses import dataclass, field
+from typing import Callable
+import botocore.handlers
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ReadTimeoutError
+
+# Percentil 99 de la normal estándar, para ajustar una lognormal a su p50 y p99
+_Z99 = 2.326
+# Códigos de throttling que botocore reconoce (y reintenta) por servicio
+THROTTLE_CODES = {"dynamodb": "ProvisionedThroughputExceededException", "s3": "SlowDown"}
+DEFAULT_THROTTLE_CODE = "ThrottlingException"
+
+
+def latency_sampler(spec, rng: random.Random) -> Callable[[], float]:
+    """
+    Generador de latencias (ms) a partir de su especificación:
+        25                                                    constante
+        {"distribution": "uniform", "min": 5, "max": 50}
+        {"distribution": "normal", "mean": 20, "stddev": 5}   (truncada en 0)
+        {"distribution": "lognormal", "p50": 20, "p99": 400}  (cola larga)
+        {"distribution": "exponential", "mean": 30}
+    """
+
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    distribution = spec.get("distribution", "constant")
+    if distribution == "constant":
+        return lambda: float(spec["ms"])
+    if distribution == "uniform":
+        return lambda: rng.uniform(spec["min"], spec["max"])
+    if distribution == "normal":
+        return lambda: max(0.0, rng.gauss(spec["mean"], spec["stddev"]))
+    if distribution == "lognormal":
+        mu = math.log(spec["p50"])
+        sigma = max(math.log(spec["p99"] / spec["p50"]) / _Z99, 0.0)
+        return lambda: rng.lognormvariate(mu, sigma)
+    if distribution == "exponential":
+        return lambda: rng.expovariate(1 / spec["mean"])
+    raise ValueError(f"Distribución de latencia desconocida: {distribution}")
+
+
+@dataclass
+class Rule:
+    """
+    Fallas de las operaciones que coinciden con `pattern` ('servicio.Operacion', admite comodines).
+    Cada intento HTTP se evalúa por separado, así que los reintentos de botocore también pueden fallar.
+    """
+    pattern: str
+    latency: Callable[[], float] | None = None
+    # Fracción de intentos que reciben la latencia (p. ej. picos ocasionales)
+    latency_rate: float = 1.0
+    throttle_rate: float = 0.0
+    throttle_code: str | None = None
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    # Espera antes de la excepción de timeout (None: el read timeout configurado del cliente)
+    timeout_ms: float | None = None
+    counters: dict = field(default_factory=lambda: {
+        "requests": 0, "delayed": 0, "delay_ms": 0.0, "throttled": 0, "errors": 0, "timeouts": 0
+    })
+
+
+class _Raw:
+    """Cuerpo mínimo de respuesta que AWSResponse sabe leer"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **_kwargs):
+        yield self.body
+
+
+class FaultInjector:
+    """
+    Intercepta cada intento HTTP de botocore (evento before-send) antes que moto o la red:
+    añade latencia, responde throttling o error 500, o simula un timeout de lectura.
+    Debe instalarse antes de crear las sesiones boto3 que se quieran afectar.
+    """
+
+    def __init__(self, spec: dict, seed: int = 0, armed: bool = True):
+        self.rng = random.Random(seed)
+        self.armed = armed
+        self._lock = threading.Lock()
+        self.rules = []
+        for pattern, options in spec.items():
+            options = dict(options)
+            latency = options.pop("latency_ms", None)
+            try:
+                self.rules.append(Rule(
+                    pattern=pattern,
+                    latency=latency_sampler(latency, self.rng) if latency is not None else None,
+                    **options
+                ))
+            except TypeError as e:
+                raise ValueError(f"Regla {pattern}: {e}") from e
+        self._matches: dict[tuple[str, str], Rule | None] = {}
+
+    @classmethod
+    def from_file(cls, path: str, seed: int = 0, armed: bool = True) -> "FaultInjector":
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file), seed, armed)
+
+    def rule(self, service: str, operation: str) -> Rule | None:
+        """Primera regla que coincide con la operación, en el orden del archivo"""
+        key = (service, operation)
+        if key not in self._matches:
+            self._matches[key] = next(
+                (rule for rule in self.rules if fnmatch.fnmatchcase(f"{service}.{operation}", rule.pattern)), None
+            )
+        return self._matches[key]
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def _response(self, request, service: str, status: int, code: str) -> AWSResponse:
+        message = f"Falla inyectada: {code}"
+        if service == "s3":
+            body = f"<Error><Code>{code}</Code><Message>{message}</Message></Error>".encode()
+        else:
+            body = json.dumps({"__type": code, "message": message}).encode()
+        return AWSResponse(request.url, status, {"x-amzn-ErrorType": code}, _Raw(body))
+
+    def _timeout_seconds(self, rule: Rule, service: str) -> float:
+        if rule.timeout_ms is not None:
+            return rule.timeout_ms / 1000
+        import aws_clients  # pylint: disable=import-outside-toplevel
+        # La caché y los perfiles usan el perfil rápido de DynamoDB
+        return aws_clients.AWS_FAST_TIMEOUT if service == "dynamodb" else aws_clients.AWS_READ_TIMEOUT
+
+    def inject(self, request, event_name: str) -> AWSResponse | None:
+        """
+        Aplica la regla de la operación a un intento.
+        Returns:
+            AWSResponse | None: Respuesta de error inyectada, o None para continuar hacia moto o la red.
+        Raises:
+            ReadTimeoutError: Si el intento simula un timeout de lectura.
+        """
+
+        if not self.armed:
+            return None
+        _, service, operation = event_name.split(".", 2)
+        rule = self.rule(service, operation)
+        if rule is None:
+            return None
+
+        counters = rule.counters
+        with self._lock:
+            counters["requests"] += 1
+        if rule.latency is not None and self._draw() < rule.latency_rate:
+            with self._lock:
+                delay_ms = rule.latency()
+                counters["delayed"] += 1
+                counters["delay_ms"] += delay_ms
+            time.sleep(delay_ms / 1000)
+
+        draw = self._draw()
+        if draw < rule.timeout_rate:
+            with self._lock:
+                counters["timeouts"] += 1
+            time.sleep(self._timeout_seconds(rule, service))
+            raise ReadTimeoutError(endpoint_url=request.url)
+        draw -= rule.timeout_rate
+        if draw < rule.throttle_rate:
+            with self._lock:
+                counters["throttled"] += 1
+            code = rule.throttle_code or THROTTLE_CODES.get(service, DEFAULT_THROTTLE_CODE)
+            return self._response(request, service, 503 if service == "s3" else 400, code)
+        draw -= rule.throttle_rate
+        if draw < rule.error_rate:
+            with self._lock:
+                counters["errors"] += 1
+            return self._response(request, service, 500, "InternalServerError")
+        return None
+
+    def install(self):
+        """
+        Antepone la inyección a los handlers before-send de botocore (entre ellos el de moto):
+        un intento con falla inyectada no llega a moto ni a la red.
+        """
+
+        # Las entradas son (evento, handler) o (evento, handler, posición)
+        downstream = [entry[1] for entry in botocore.handlers.BUILTIN_HANDLERS if entry[0] == "before-send"]
+
+        def before_send(request, event_name, **kwargs):
+            response = self.inject(request, event_name)
+            if response is not None:
+                return response
+            for handler in downstream:
+                response = handler(request=request, event_name=event_name, **kwargs)
+                if response is not None:
+                    return response
+            return None
+
+        botocore.handlers.BUILTIN_HANDLERS[:] = [
+            entry for entry in botocore.handlers.BUILTIN_HANDLERS if entry[0] != "before-send"
+        ] + [("before-send", before_send)]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                rule.pattern: {**rule.counters, "delay_ms": round(rule.counters["delay_ms"], 1)}
+                for rule in self.rules
+            }
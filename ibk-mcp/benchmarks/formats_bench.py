@@ -0,0 +1,52 @@
+''' Micro-benchmark de formatos de salida: tiempo de render y tamaño por formato '''
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import formats  # pylint: disable=wrong-import-position
+from synthetic import transacciones  # pylint: disable=wrong-import-position
+
+
+def bench_format(df, fmt: str, repeat: int) -> dict:
+    """Mide el render de un formato `repeat` veces"""
+    timings = []
+    output = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = formats.render(df, fmt)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "format": fmt,
+        "rows": len(df),
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "bytes": len(output.encode("utf-8")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000,10000,100000", help="Tamaños de período separados por comas")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--formats", default=",".join(formats.FORMATS))
+    args = parser.parse_args()
+
+    results = []
+    for rows in map(int, args.rows.split(",")):
+        df = transacciones(rows)
+        for fmt in args.formats.split(","):
+            results.append(bench_format(df, fmt, args.repeat))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+''' Prueba de carga de extremo a extremo: server.py local (ver local_stack.py) con una mezcla configurable de herramientas '''
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+from mcp import ClientSession
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import local_stack  # pylint: disable=wrong-import-position
+from transport_bench import open_transport, summarize  # pylint: disable=wrong-import-position
+
+DEFAULT_MIX = "get_data_by_period=5,search=2,aggregate=2,get_profile=1"
+# Herramientas cuyo resultado depende del período: un acierto usa un período ya calentado
+# y un fallo uno que nadie pidió todavía (consulta a Athena y escritura en caché)
+PERIOD_TOOLS = ("get_data_by_period", "search", "aggregate", "sample_period", "approx_stats")
+STARTUP_TIMEOUT_SECONDS = 120
+MEMORY_SAMPLE_SECONDS = 0.1
+
+
+def tool_arguments(tool: str, periodo: str | None, key: str | None) -> dict:
+    """Argumentos fijos por herramienta: la misma llamada sobre el mismo período reutiliza su caché"""
+    if tool == "get_data_by_period":
+        return {"periodo": periodo, "format": "json"}
+    if tool == "search":
+        return {"periodo": periodo, "query": "canal:app supermercado", "limit": 20}
+    if tool == "aggregate":
+        return {"periodo_range": periodo, "metrics": ["sum(monto)", "count(*)"], "group_by": ["canal", "categoria"]}
+    if tool == "sample_period":
+        return {"periodo": periodo, "n": 20}
+    if tool == "approx_stats":
+        return {"periodo_range": periodo, "columns": ["monto", "id_cliente"], "percentiles": [0.5, 0.95]}
+    if tool == "get_profile":
+        return {"key": key}
+    return {}
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """'get_data_by_period=5,search=2' -> probabilidad de cada herramienta"""
+    weights = {}
+    for part in text.split(","):
+        tool, _, weight = part.partition("=")
+        weights[tool.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Mezcla inválida: {text}")
+    return {tool: weight / total for tool, weight in weights.items()}
+
+
+def plan_calls(mix: dict[str, float], sessions: int, calls: int, hit_ratio: float, hot: int,
+               profiles: int, seed: int) -> tuple[list[list[tuple[str, str, dict]]], int]:
+    """
+    Genera de antemano las llamadas de cada sesión, para que la carga sea reproducible.
+    Args:
+        mix (dict): Probabilidad de cada herramienta.
+        sessions (int): Sesiones concurrentes.
+        calls (int): Llamadas por sesión.
+        hit_ratio (float): Fracción de llamadas que deberían resolverse desde caché.
+        hot (int): Períodos calentados antes de medir.
+        profiles (int): Clientes con perfil cargado.
+        seed (int): Semilla.
+    Returns:
+        tuple: Por sesión, lista de (herramienta, 'hit' | 'miss', argumentos); y total de períodos necesarios.
+    """
+
+    rng = np.random.default_rng(seed)
+    # Cada fallo consume un período nuevo, a continuación de los calientes
+    values = local_stack.periods(hot + sessions * calls)
+    tools = list(mix)
+    next_cold = hot
+    plan = []
+    for _ in range(sessions):
+        session_calls = []
+        for tool in rng.choice(tools, size=calls, p=[mix[tool] for tool in tools]):
+            hit = rng.random() < hit_ratio
+            periodo, key = None, None
+            if tool in PERIOD_TOOLS:
+                if hit:
+                    periodo = values[rng.integers(0, hot)]
+                else:
+                    periodo, next_cold = values[next_cold], next_cold + 1
+            elif tool == "get_profile":
+                # Un fallo es un cliente sin perfil: la lectura llega igual a DynamoDB
+                key = str(rng.integers(0, profiles)) if hit else f"sin-perfil-{rng.integers(1 << 30)}"
+            session_calls.append((str(tool), "hit" if hit else "miss", tool_arguments(tool, periodo, key)))
+        plan.append(session_calls)
+    return plan, next_cold
+
+
+def memory(pid: int | None) -> dict[str, float] | None:
+    """RSS actual y pico (VmHWM) del proceso en MB, leídos de /proc (solo Linux)"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as file:
+            fields = dict(line.split(":", 1) for line in file if ":" in line)
+    except OSError:
+        return None
+    return {name: int(fields[field].split()[0]) / 1024 for name, field in (("rss_mb", "VmRSS"), ("hwm_mb", "VmHWM"))}
+
+
+def git_revision() -> dict:
+    """Commit medido, para comparar resultados entre versiones"""
+    def run(*command):
+        return subprocess.run(command, capture_output=True, text=True, check=False,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    return {"commit": run("git", "rev-parse", "HEAD"), "dirty": bool(run("git", "status", "--porcelain", "--", ".."))}
+
+
+async def call(session: ClientSession, tool: str, arguments: dict) -> tuple[float, bool]:
+    """Ejecuta una herramienta y devuelve su latencia (ms) y si falló"""
+    start = time.perf_counter()
+    try:
+        result = await session.call_tool(tool, arguments)
+        text = result.content[0].text if result.content and hasattr(result.content[0], "text") else ""
+        # Las herramientas informan los errores de dependencias como texto
+        failed = bool(result.isError) or text.startswith("Error")
+    except Exception:  # pylint: disable=broad-exception-caught
+        failed = True
+    return (time.perf_counter() - start) * 1000, failed
+
+
+async def wait_ready(transport: str, url: str, process: subprocess.Popen | None):
+    """Espera a que el servidor acepte sesiones MCP"""
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {process.returncode})")
+        try:
+            async with open_transport(transport, url) as streams:
+                async with ClientSession(streams[0], streams[1]) as session:
+                    await session.initialize()
+                    return
+        except Exception:  # pylint: disable=broad-exception-caught
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+async def warm_up(transport: str, url: str, mix: dict[str, float], hot: int, concurrency: int):
+    """Lleva a caché cada herramienta de período de la mezcla sobre los períodos calientes"""
+    semaphore = asyncio.Semaphore(concurrency)
+    calls = [(tool, tool_arguments(tool, periodo, None))
+             for periodo in local_stack.periods(hot) for tool in mix if tool in PERIOD_TOOLS]
+
+    async def worker(tool: str, arguments: dict):
+        async with semaphore:
+            async with open_transport(transport, url) as streams:
+                async with ClientSession(streams[0], streams[1]) as session:
+                    await session.initialize()
+                    await call(session, tool, arguments)
+
+    await asyncio.gather(*(worker(tool, arguments) for tool, arguments in calls))
+
+
+async def run_load(transport: str, url: str, plan: list[list[tuple[str, str, dict]]], pid: int | None) -> dict:
+    """
+    Ejecuta todas las sesiones a la vez (carga en lazo cerrado: cada sesión espera su respuesta
+    antes de la siguiente llamada) y muestrea la memoria del servidor mientras tanto.
+    """
+
+    samples: list[dict] = []
+    setups: list[float] = []
+    results: list[tuple[str, str, float, bool]] = []
+    stop = asyncio.Event()
+
+    async def sampler():
+        while not stop.is_set():
+            sample = memory(pid)
+            if sample:
+                samples.append(sample)
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+
+    async def worker(session_calls: list[tuple[str, str, dict]]):
+        start = time.perf_counter()
+        async with open_transport(transport, url) as streams:
+            async with ClientSession(streams[0], streams[1]) as session:
+                await session.initialize()
+                setups.append((time.perf_counter() - start) * 1000)
+                for tool, cache_state, arguments in session_calls:
+                    elapsed_ms, failed = await call(session, tool, arguments)
+                    results.append((tool, cache_state, elapsed_ms, failed))
+
+    baseline = memory(pid)
+    sampling = asyncio.create_task(sampler())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(session_calls) for session_calls in plan))
+    wall_seconds = time.perf_counter() - start
+    stop.set()
+    await sampling
+    end = memory(pid)
+
+    def section(selected: list[tuple[str, str, float, bool]]) -> dict:
+        return {**summarize([elapsed for _, _, elapsed, _ in selected]),
+                "errors": sum(failed for _, _, _, failed in selected)}
+
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(results) / wall_seconds, 2) if wall_seconds else 0.0,
+        "setup": summarize(setups),
+        "call": section(results),
+        "by_tool": {tool: section([r for r in results if r[0] == tool]) for tool in sorted({r[0] for r in results})},
+        "by_cache": {state: section([r for r in results if r[1] == state]) for state in ("hit", "miss")},
+        "memory": {
+            "baseline_rss_mb": baseline["rss_mb"] if baseline else None,
+            "max_rss_mb": max((sample["rss_mb"] for sample in samples), default=None),
+            "end_rss_mb": end["rss_mb"] if end else None,
+            "peak_hwm_mb": end["hwm_mb"] if end else None,
+        },
+    }
+
+
+async def server_stats(transport: str, url: str) -> dict:
+    async with open_transport(transport, url) as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            result = await session.call_tool("get_server_stats", {})
+            return json.loads(result.content[0].text)  # type: ignore
+
+
+async def bench(args, url: str, plan: list, process: subprocess.Popen | None, faults: bool) -> dict:
+    mix = parse_mix(args.mix)
+    await wait_ready(args.transport, url, process)
+    warm_start = time.perf_counter()
+    await warm_up(args.transport, url, mix, args.hot, args.sessions)
+    # Deja que la escritura diferida vuelque a DynamoDB lo calentado
+    await asyncio.sleep(1)
+    warm_seconds = time.perf_counter() - warm_start
+
+    if faults and process is not None:
+        # Las fallas se activan después del calentamiento: todos los escenarios parten de la misma caché
+        process.send_signal(signal.SIGUSR1)
+    result = await run_load(args.transport, url, plan, process.pid if process else None)
+    return {**result, "warm_up_seconds": round(warm_seconds, 3), "server_stats": await server_stats(args.transport, url)}
+
+
+def run(args, plan: list, needed_periods: int, faults: dict | None) -> dict:
+    """
+    Una medición completa: lanza el entorno local (con las fallas indicadas), calienta, mide y lo detiene.
+    Returns:
+        dict: Resultados de la carga y, si hubo fallas, sus contadores.
+    """
+
+    path = "/sse" if args.transport == "sse" else "/mcp"
+    url = args.url or f"http://127.0.0.1:{args.port}{path}"
+    if args.url:
+        return asyncio.run(bench(args, url, plan, None, False))
+
+    with tempfile.TemporaryDirectory(prefix="ibk-mcp-load-") as work_dir:
+        command = [
+            sys.executable, os.path.join(os.path.dirname(__file__), "local_stack.py"),
+            "--port", str(args.port), "--transport", args.transport, "--rows", str(args.rows),
+            "--periods", str(needed_periods), "--profiles", str(args.profiles), "--seed", str(args.seed),
+            "--work-dir", work_dir,
+        ]
+        if args.dynamodb_endpoint:
+            command += ["--dynamodb-endpoint", args.dynamodb_endpoint]
+        report_path = os.path.join(work_dir, "faults-report.json")
+        if faults:
+            spec_path = os.path.join(work_dir, "faults.json")
+            with open(spec_path, "w", encoding="utf-8") as file:
+                json.dump(faults, file)
+            command += ["--faults", spec_path, "--faults-on-signal", "--faults-report", report_path]
+
+        with open(args.server_log, "a", encoding="utf-8") as log:
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)  # pylint: disable=consider-using-with
+        try:
+            result = asyncio.run(bench(args, url, plan, process, bool(faults)))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        if faults and os.path.exists(report_path):
+            with open(report_path, encoding="utf-8") as file:
+                result["faults"] = {"spec": faults, "injected": json.load(file)}
+        return result
+
+
+def compare(results: dict[str, dict]) -> list[dict]:
+    """Throughput y latencias de cada escenario, y su variación porcentual respecto del primero"""
+    baseline = next(iter(results.values()))
+
+    def delta(value: float, reference: float) -> float | None:
+        return round((value - reference) / reference * 100, 1) if reference else None
+
+    rows = []
+    for name, result in results.items():
+        row = {"scenario": name, "throughput_rps": result["throughput_rps"], "errors": result["call"]["errors"]}
+        row.update({metric: round(result["call"][metric], 2) for metric in ("p50_ms", "p95_ms", "p99_ms")})
+        row["throughput_delta_pct"] = delta(result["throughput_rps"], baseline["throughput_rps"])
+        row.update({
+            f"{metric}_delta_pct": delta(result["call"][metric], baseline["call"][metric])
+            for metric in ("p50_ms", "p95_ms", "p99_ms")
+        })
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transport", choices=["sse", "streamable-http"], default="streamable-http")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", default="", help="Servidor ya en marcha (no se lanza local_stack.py)")
+    parser.add_argument("--sessions", type=int, default=10, help="Sesiones MCP concurrentes")
+    parser.add_argument("--calls", type=int, default=20, help="Llamadas por sesión")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos por herramienta, p. ej. 'get_data_by_period=5,search=2'")
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="Fracción de llamadas sobre datos ya en caché")
+    parser.add_argument("--hot", type=int, default=4, help="Períodos calentados antes de medir")
+    parser.add_argument("--rows", type=int, default=10000, help="Filas por período")
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dynamodb-endpoint", default="", help="DynamoDB Local en lugar de moto (ver local_stack.py)")
+    parser.add_argument("--faults", default="", help="Reglas de fallas JSON aplicadas durante la medición (ver faults.py)")
+    parser.add_argument("--scenarios", default="",
+                        help="JSON {escenario: reglas de fallas}; mide cada uno y los compara con el primero")
+    parser.add_argument("--server-log", default=os.devnull, help="Archivo para la salida del servidor")
+    parser.add_argument("--output", default="", help="Archivo JSON de resultados (por defecto stdout)")
+    args = parser.parse_args()
+    if args.url and (args.faults or args.scenarios):
+        parser.error("--faults y --scenarios requieren lanzar el entorno local (sin --url)")
+
+    plan, needed_periods = plan_calls(parse_mix(args.mix), args.sessions, args.calls, args.hit_ratio,
+                                      args.hot, args.profiles, args.seed)
+    report = {
+        **git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "server_log")},
+    }
+
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as file:
+            scenarios = json.load(file)
+        results = {}
+        for name, faults in scenarios.items():
+            print(f"Escenario {name}...", file=sys.stderr)
+            results[name] = run(args, plan, needed_periods, faults)
+        report.update({"comparison": compare(results), "scenarios": results})
+    else:
+        faults = None
+        if args.faults:
+            with open(args.faults, encoding="utf-8") as file:
+                faults = json.load(file)
+        report.update(run(args, plan, needed_periods, faults))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+''' Servidor MCP local para pruebas de carga: server.py sobre moto (DynamoDB, Glue, S3) y Athena sustituida por DuckDB '''
+
+import os
+import re
+import sys
+import json
+import atexit
+import signal
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+import duckdb
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import transacciones  # pylint: disable=wrong-import-position
+from faults import FaultInjector  # pylint: disable=wrong-import-position
+
+DATABASE = "bench"
+TABLE = "transacciones"
+PARTITION_COLUMN = "fecha_proceso"
+DATA_BUCKET = "bench-data"
+OUTPUT_BUCKET = "bench-athena"
+CACHE_TABLE = "bench-cache"
+PROFILE_TABLE = "bench-profiles"
+FIRST_PERIOD = "2024-01-01"
+
+# Tipos de Glue de las columnas de synthetic.transacciones, por clase de dtype (la resolución de
+# las fechas, ns o us, depende de la versión de pandas); el resto se declara como string
+GLUE_TYPES = {
+    "i": "bigint",
+    "u": "bigint",
+    "f": "double",
+    "b": "boolean",
+    "M": "timestamp",
+}
+
+
+def periods(count: int, first: str = FIRST_PERIOD) -> list[str]:
+    """Períodos (días consecutivos) del entorno; load_bench usa la misma lista"""
+    start = date.fromisoformat(first)
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(count)]
+
+
+def environment(transport: str, work_dir: str) -> dict[str, str]:
+    """
+    Configuración del servidor para el entorno local. Las variables ya definidas
+    prevalecen, para medir el efecto de un ajuste (p. ej. CACHE_HEDGE_ENABLED=true).
+    """
+
+    return {
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "DATABASE_NAME": DATABASE,
+        "TABLE_NAME": TABLE,
+        "S3_OUTPUT_BUCKET": f"s3://{OUTPUT_BUCKET}/results/",
+        "CACHE_TABLE_NAME": CACHE_TABLE,
+        "PROFILE_TABLE_NAME": PROFILE_TABLE,
+        "MCP_TRANSPORT": transport,
+        # DuckDB del enrutador leería S3 directamente, fuera del alcance de moto
+        "QUERY_ROUTER_ENABLED": "false",
+        "SEARCH_INDEX_DIR": os.path.join(work_dir, "search-index"),
+        "SEARCH_INDEX_S3_URI": "",
+        "ATHENA_POLL_SECONDS": "0.05",
+    }
+
+
+def write_parquet(data_dir: str, values: list[str], rows: int, seed: int) -> dict[str, str]:
+    """
+    Escribe un período sintético por partición con el esquema de carpetas de Hive.
+    Returns:
+        dict: Ruta del archivo Parquet por período.
+    """
+
+    files = {}
+    for offset, periodo in enumerate(values):
+        folder = os.path.join(data_dir, f"{PARTITION_COLUMN}={periodo}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "part-0.parquet")
+        if not os.path.exists(path):
+            transacciones(rows, periodo, seed + offset).drop(columns=[PARTITION_COLUMN]).to_parquet(path, index=False)
+        files[periodo] = path
+    return files
+
+
+def create_resources(files: dict[str, str], profiles: int):
+    """Crea en moto (o en DynamoDB Local) las tablas, buckets y la tabla de Glue que usa el servidor"""
+    dynamodb = boto3.client("dynamodb")
+    dynamodb.create_table(
+        TableName=CACHE_TABLE,
+        KeySchema=[{"AttributeName": "name_table", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "name_table", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    dynamodb.create_table(
+        TableName=PROFILE_TABLE,
+        KeySchema=[
+            {"AttributeName": "customer_key", "KeyType": "HASH"},
+            {"AttributeName": "as_of", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "customer_key", "AttributeType": "S"},
+            {"AttributeName": "as_of", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    as_of = max(files)
+    with boto3.resource("dynamodb").Table(PROFILE_TABLE).batch_writer() as batch:
+        for key in range(profiles):
+            batch.put_item(Item={
+                "customer_key": str(key), "as_of": as_of, "last_activity": as_of,
+                "count_30d": key % 40, "amount_30d": key * 3, "active_days_30d": key % 30,
+            })
+
+    s3 = boto3.client("s3")
+    s3.create_bucket(Bucket=DATA_BUCKET)
+    s3.create_bucket(Bucket=OUTPUT_BUCKET)
+
+    sample = transacciones(1).drop(columns=[PARTITION_COLUMN])
+    columns = [{"Name": name, "Type": GLUE_TYPES.get(dtype.kind, "string")} for name, dtype in sample.dtypes.items()]
+    location = f"s3://{DATA_BUCKET}/{TABLE}"
+    glue = boto3.client("glue")
+    glue.create_database(DatabaseInput={"Name": DATABASE})
+    glue.create_table(DatabaseName=DATABASE, TableInput={
+        "Name": TABLE,
+        "StorageDescriptor": {"Columns": columns, "Location": f"{location}/"},
+        "PartitionKeys": [{"Name": PARTITION_COLUMN, "Type": "string"}],
+        "TableType": "EXTERNAL_TABLE",
+    })
+
+    # Los archivos se suben a S3 para que el planificador estime el escaneo con tamaños reales
+    for periodo, path in files.items():
+        prefix = f"{TABLE}/{PARTITION_COLUMN}={periodo}/"
+        s3.upload_file(path, DATA_BUCKET, f"{prefix}part-0.parquet")
+        glue.create_partition(DatabaseName=DATABASE, TableName=TABLE, PartitionInput={
+            "Values": [periodo],
+            "StorageDescriptor": {"Columns": columns, "Location": f"s3://{DATA_BUCKET}/{prefix}"},
+        })
+
+
+class AthenaShim:
+    """
+    Sustituto de Athena: la consulta se registra en la API de moto (con el mismo cliente, contadores
+    y timeouts que usaría el servidor) y se resuelve con DuckDB sobre los Parquet locales.
+    Solo reemplaza el envío y la descarga de awswrangler; admisión, breaker, polling y deadline
+    siguen siendo los de athena.run_query.
+    """
+
+    # Equivalencias de las funciones de Athena que usan los constructores de consultas
+    MACROS = (
+        "CREATE MACRO approx_distinct(x, e) AS approx_count_distinct(x)",
+        "CREATE MACRO approx_percentile(x, p) AS approx_quantile(x, p)",
+        "CREATE MACRO rand() AS random()",
+        # En DuckDB element_at solo acepta mapas; approx_stats exacto lo usa sobre listas
+        "CREATE MACRO element_at(arr, i) AS list_extract(arr, i)",
+    )
+    # TABLESAMPLE BERNOULLI (10) -> TABLESAMPLE 10% (bernoulli). SYSTEM también se muestrea por filas:
+    # en DuckDB muestrea vectores de 2048 filas y con períodos pequeños devolvería muestras vacías
+    _TABLESAMPLE = re.compile(r"TABLESAMPLE\s+\w+\s*\(\s*([\d.]+)\s*\)", re.IGNORECASE)
+
+    def __init__(self, data_dir: str):
+        self.connection = duckdb.connect()
+        for macro in self.MACROS:
+            self.connection.execute(macro)
+        self.connection.execute(f"CREATE SCHEMA {DATABASE}")
+        self.connection.execute(f"""
+        CREATE VIEW {DATABASE}.{TABLE} AS
+        SELECT * FROM read_parquet('{data_dir}/*/*.parquet', hive_partitioning = true,
+                                   hive_types = {{'{PARTITION_COLUMN}': VARCHAR}})
+        """)
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def translate(self, query: str) -> str:
+        return self._TABLESAMPLE.sub(r"TABLESAMPLE \1% (bernoulli)", query)
+
+    def start_query_execution(self, sql: str, database: str, s3_output: str | None = None,
+                              boto3_session=None, **_kwargs) -> str:
+        client = (boto3_session or boto3).client("athena")
+        query_execution_id = client.start_query_execution(
+            QueryString=sql,
+            QueryExecutionContext={"Database": database},
+            ResultConfiguration={"OutputLocation": s3_output or f"s3://{OUTPUT_BUCKET}/results/"},
+        )["QueryExecutionId"]
+        try:
+            # Cada hilo usa su propio cursor sobre la misma base en memoria
+            result = self.connection.cursor().execute(self.translate(sql)).df()
+        except duckdb.Error as e:
+            result = e
+        with self._lock:
+            self._results[query_execution_id] = result
+        return query_execution_id
+
+    def get_query_results(self, query_execution_id: str, chunksize: int | None = None,
+                          dtype_backend: str = "numpy_nullable", **_kwargs):
+        with self._lock:
+            result = self._results.pop(query_execution_id, None)
+        if result is None:
+            raise KeyError(f"Ejecución desconocida: {query_execution_id}")
+        if isinstance(result, Exception):
+            import awswrangler as wr  # pylint: disable=import-outside-toplevel
+            raise wr.exceptions.QueryFailed(str(result))
+
+        result = result.convert_dtypes(dtype_backend=dtype_backend)
+        if chunksize is None:
+            return result
+        return (result.iloc[start:start + chunksize] for start in range(0, max(len(result), 1), chunksize))
+
+    def install(self):
+        import athena  # pylint: disable=import-outside-toplevel
+        athena.wr.athena.start_query_execution = self.start_query_execution
+        athena.wr.athena.get_query_results = self.get_query_results
+
+
+def write_report(path: str, injector: FaultInjector):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(injector.snapshot(), file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--transport", choices=["sse", "streamable-http"], default="streamable-http")
+    parser.add_argument("--rows", type=int, default=10000, help="Filas por período")
+    parser.add_argument("--periods", type=int, default=8, help="Períodos disponibles desde " + FIRST_PERIOD)
+    parser.add_argument("--profiles", type=int, default=1000, help="Clientes con perfil ('0' .. 'N-1')")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default="", help="Directorio de datos (por defecto uno temporal)")
+    parser.add_argument("--dynamodb-endpoint", default="",
+                        help="DynamoDB Local (p. ej. http://127.0.0.1:8001) en lugar de moto para caché y perfiles")
+    parser.add_argument("--faults", default="", help="Reglas de fallas JSON por operación AWS (ver faults.py)")
+    parser.add_argument("--faults-on-signal", action="store_true",
+                        help="Las fallas se activan al recibir SIGUSR1 (p. ej. después del calentamiento)")
+    parser.add_argument("--faults-report", default="", help="Archivo donde escribir los contadores de fallas al salir")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ibk-mcp-bench-")
+    data_dir = os.path.join(work_dir, "data")
+    files = write_parquet(data_dir, periods(args.periods), args.rows, args.seed)
+
+    for name, value in environment(args.transport, work_dir).items():
+        os.environ.setdefault(name, value)
+    config = None
+    if args.dynamodb_endpoint:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.dynamodb_endpoint
+        config = {"core": {"passthrough": {"services": ["dynamodb"], "urls": []}}}
+
+    with mock_aws(config=config):  # type: ignore
+        if args.dynamodb_endpoint:
+            # DynamoDB Local acepta cualquier credencial; las de moto solo existen dentro del mock
+            os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+            os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+            # Cada ejecución parte de una caché vacía
+            dynamodb = boto3.client("dynamodb")
+            for table in set(dynamodb.list_tables()["TableNames"]) & {CACHE_TABLE, PROFILE_TABLE}:
+                dynamodb.delete_table(TableName=table)
+        create_resources(files, args.profiles)
+
+        if args.faults:
+            # Se instala antes de importar el servidor: solo afecta a sus sesiones boto3, no a la preparación
+            injector = FaultInjector.from_file(args.faults, args.seed, armed=not args.faults_on_signal)
+            injector.install()
+            signal.signal(signal.SIGUSR1, lambda *_: setattr(injector, "armed", True))
+            if args.faults_report:
+                atexit.register(write_report, args.faults_report, injector)
+                # uvicorn vuelve a emitir SIGTERM tras su apagado ordenado; salir con sys.exit ejecuta atexit
+                signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+        # Los módulos del servidor leen su configuración y crean sus clientes al importarse
+        import server  # pylint: disable=import-outside-toplevel
+        AthenaShim(data_dir).install()
+
+        server.mcp.settings.port = args.port
+        print(json.dumps({"work_dir": work_dir, "periods": len(files), "rows": args.rows}), flush=True)
+        server.serve(args.transport)
+
+
+if __name__ == "__main__":
+    main()
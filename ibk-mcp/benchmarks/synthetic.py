@@ -0,0 +1,36 @@
+''' Datos sintéticos con la forma de transacciones_bancarias para benchmarks '''
+
+import numpy as np
+import pandas as pd
+
+CATEGORIAS = ["supermercado", "restaurantes", "transporte", "servicios", "salud", "entretenimiento", "viajes", "otros"]
+CANALES = ["app", "web", "agencia", "cajero", "pos"]
+TIPOS = ["compra", "retiro", "transferencia", "pago"]
+
+
+def transacciones(rows: int, periodo: str = "2024-01-31", seed: int = 42) -> pd.DataFrame:
+    """
+    Genera un período sintético de transacciones bancarias.
+    Args:
+        rows (int): Número de filas.
+        periodo (str): Valor de `fecha_proceso`.
+        seed (int): Semilla para que los benchmarks sean reproducibles.
+    Returns:
+        pd.DataFrame: Transacciones con identificadores, montos y categorías.
+    """
+
+    rng = np.random.default_rng(seed)
+    clientes = max(rows // 20, 1)
+    return pd.DataFrame({
+        "id_transaccion": np.arange(rows, dtype="int64"),
+        "id_cliente": rng.integers(0, clientes, rows).astype(str),
+        "fecha_transaccion": pd.Timestamp(periodo) - pd.to_timedelta(rng.integers(0, 86400 * 28, rows), unit="s"),
+        "monto": np.round(rng.lognormal(4, 1.2, rows), 2),
+        "moneda": rng.choice(["PEN", "USD"], rows, p=[0.85, 0.15]),
+        "categoria": rng.choice(CATEGORIAS, rows),
+        "canal": rng.choice(CANALES, rows),
+        "tipo_transaccion": rng.choice(TIPOS, rows),
+        "comercio": np.char.add("comercio_", rng.integers(0, 2000, rows).astype(str)),
+        "es_fraude": rng.random(rows) < 0.01,
+        "fecha_proceso": periodo,
+    })
@@ -0,0 +1,112 @@
+''' Benchmark de transporte MCP: SSE vs Streamable HTTP sin estado '''
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentil por rango más cercano (en milisegundos)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """Resumen de latencias en milisegundos"""
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+
+def open_transport(transport: str, url: str):
+    """Abre el cliente del transporte indicado"""
+    if transport == "sse":
+        return sse_client(url)
+    return streamablehttp_client(url)
+
+
+async def run_session(transport: str, url: str, tool: str, arguments: dict, calls: int):
+    """
+    Abre una sesión, la inicializa y ejecuta la herramienta varias veces.
+    Returns:
+        tuple: Tiempo de establecimiento (ms) y latencias de cada llamada (ms).
+    """
+
+    start = time.perf_counter()
+    async with open_transport(transport, url) as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            setup_ms = (time.perf_counter() - start) * 1000
+
+            latencies = []
+            for _ in range(calls):
+                call_start = time.perf_counter()
+                await session.call_tool(tool, arguments)
+                latencies.append((time.perf_counter() - call_start) * 1000)
+
+    return setup_ms, latencies
+
+
+async def bench(transport: str, url: str, tool: str, arguments: dict, sessions: int, calls: int, concurrency: int):
+    """Ejecuta `sessions` sesiones con la concurrencia indicada y agrega los resultados"""
+    semaphore = asyncio.Semaphore(concurrency)
+    setups: list[float] = []
+    latencies: list[float] = []
+
+    async def worker():
+        async with semaphore:
+            setup_ms, call_ms = await run_session(transport, url, tool, arguments, calls)
+            setups.append(setup_ms)
+            latencies.extend(call_ms)
+
+    await asyncio.gather(*(worker() for _ in range(sessions)))
+
+    return {
+        "transport": transport,
+        "url": url,
+        "setup": summarize(setups),
+        "call": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sse-url", default="http://127.0.0.1:8000/sse")
+    parser.add_argument("--http-url", default="http://127.0.0.1:8000/mcp")
+    parser.add_argument("--transport", choices=["sse", "streamable-http", "both"], default="both",
+                        help="Con 'both' el servidor debe exponer ambos transportes (p. ej. dos instancias)")
+    parser.add_argument("--tool", default="get_server_stats")
+    parser.add_argument("--arguments", default="{}", help="Argumentos JSON para la herramienta")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=5, help="Llamadas por sesión")
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    targets = []
+    if args.transport in ("sse", "both"):
+        targets.append(("sse", args.sse_url))
+    if args.transport in ("streamable-http", "both"):
+        targets.append(("streamable-http", args.http_url))
+
+    results = [
+        asyncio.run(bench(transport, url, args.tool, json.loads(args.arguments),
+                          args.sessions, args.calls, args.concurrency))
+        for transport, url in targets
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,11 @@ from constructs import Construct
 DATABASE_NAME = os.getenv("DATABASE_NAME", "")
 TABLE_NAME = os.getenv("TABLE_NAME", "")
 S3_OUTPUT_BUCKET = os.getenv("S3_OUTPUT_BUCKET", "")
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "sse")
+# Parámetro de SSM con el catálogo de tablas consultables (JSON); vacío: solo DATABASE_NAME.TABLE_NAME
+TABLE_CATALOG_SSM_PARAMETER = os.getenv("TABLE_CATALOG_SSM_PARAMETER", "")
+# Tabla de perfiles por cliente creada por el stack de ETL (salida ProfileTableName)
+PROFILE_TABLE_NAME = os.getenv("PROFILE_TABLE_NAME", "")
 
 class IbkMcpStack(Stack):
     ''' Stack principal de la aplicación MCP consulting '''
@@ -44,6 +49,12 @@ class IbkMcpStack(Stack):
             "DATABASE_NAME": DATABASE_NAME,
             "TABLE_NAME": TABLE_NAME,
             "S3_OUTPUT_BUCKET": S3_OUTPUT_BUCKET,
+            "MCP_TRANSPORT": MCP_TRANSPORT,
+            "TABLE_CATALOG_SSM_PARAMETER": TABLE_CATALOG_SSM_PARAMETER,
+            # Perfiles por cliente precalculados por el pipeline (herramienta get_profile)
+            "PROFILE_TABLE_NAME": PROFILE_TABLE_NAME,
+            # Índices de búsqueda compartidos entre instancias (el rol ya puede leer y escribir este bucket)
+            "SEARCH_INDEX_S3_URI": f"s3://{S3_OUTPUT_BUCKET}/search-index" if S3_OUTPUT_BUCKET else "",
             "AWS_LWA_INVOKE_MODE": "response_stream"
         }
 
@@ -92,6 +103,7 @@ class IbkMcpStack(Stack):
                 "athena:StartQueryExecution",
                 "athena:GetQueryExecution",
                 "athena:GetQueryResults",
+                "athena:StopQueryExecution", # Cancelación de consultas abandonadas por el cliente
                 "glue:GetTable",       # Crucial: Athena usa Glue Catalog
                 "glue:GetPartitions",
                 "glue:GetDatabase"
@@ -99,6 +111,18 @@ class IbkMcpStack(Stack):
             resources=["*"] # Idealmente: arn:aws:athena:region:account:workgroup/primary
         ))
 
+        # Lectura del catálogo de tablas (se relee en caliente, sin redesplegar)
+        if TABLE_CATALOG_SSM_PARAMETER:
+            mcp_function.add_to_role_policy(aws_iam.PolicyStatement(
+                actions=["ssm:GetParameter"],
+                resources=[
+                    f"arn:aws:ssm:{self.region}:{self.account}:parameter/{TABLE_CATALOG_SSM_PARAMETER.lstrip('/')}"
+                ]
+            ))
+
+        if PROFILE_TABLE_NAME:
+            aws_dynamodb.Table.from_table_name(self, "CustomerProfiles", PROFILE_TABLE_NAME).grant_read_data(mcp_function)
+
         # C. Permisos para S3 (Athena guarda resultados aquí)
         # La Lambda necesita leer el resultado que Athena escribe.
         mcp_function.add_to_role_policy(aws_iam.PolicyStatement(
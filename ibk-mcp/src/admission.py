@@ -0,0 +1,210 @@
+''' Control de admisión de consultas Athena con cola justa por cliente '''
+
+import os
+import json
+import time
+import uuid
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+import anyio
+from botocore.exceptions import ClientError
+
+import aws_clients
+from resilience import Deadline
+
+CACHE_TABLE_NAME = os.getenv("CACHE_TABLE_NAME", "")
+# Máximo de consultas Athena simultáneas entre todas las instancias
+ATHENA_MAX_CONCURRENCY = int(os.getenv("ATHENA_MAX_CONCURRENCY", "5"))
+# Peticiones en espera por instancia antes de responder "ocupado"
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "20"))
+# Duración del préstamo de un slot; cubre instancias que mueren sin liberarlo
+ADMISSION_LEASE_SECONDS = int(os.getenv("ADMISSION_LEASE_SECONDS", "330"))
+ADMISSION_POLL_SECONDS = float(os.getenv("ADMISSION_POLL_SECONDS", "0.5"))
+# Pesos por cliente MCP, p. ej. '{"agente-batch": 1, "agente-chat": 3}'
+ADMISSION_CLIENT_WEIGHTS = json.loads(os.getenv("ADMISSION_CLIENT_WEIGHTS", "{}"))
+
+SLOT_PREFIX = "admission#athena#"
+
+
+class AdmissionRejected(Exception):
+    """La cola de admisión está llena; el cliente debe reintentar más tarde"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Servidor ocupado, reintente en {retry_after:.0f} segundos")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semáforo distribuido sobre la tabla DynamoDB de caché más una cola local.
+    Cada slot es un ítem con préstamo (`lease_until`); las peticiones en espera
+    se despachan por orden de tiempo virtual de fin (weighted fair queuing),
+    de modo que un cliente con ráfagas no acapara los slots del resto.
+    """
+
+    def __init__(self, table, max_concurrency: int, max_queue: int, lease_seconds: int, poll_seconds: float):
+        self.table = table
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = uuid.uuid4().hex
+
+        self._queue: list[tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._last_finish: dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._dispatcher: asyncio.Task | None = None
+        self._local_slots: set[str] = set()
+        self._avg_hold_seconds = 5.0
+        self.stats = {"admitted": 0, "rejected": 0, "released": 0}
+
+    def _weight(self, client_id: str) -> float:
+        return float(ADMISSION_CLIENT_WEIGHTS.get(client_id, 1))
+
+    def retry_after(self) -> float:
+        """Estimación de espera a partir de la cola y del tiempo medio de retención"""
+        return max(1.0, (len(self._queue) + 1) * self._avg_hold_seconds / self.max_concurrency)
+
+    def _try_acquire(self) -> str | None:
+        """Intenta tomar un slot libre o con préstamo vencido; devuelve su clave"""
+        now = int(time.time())
+
+        if self.table is None:
+            # Sin tabla (desarrollo local) el límite es por instancia
+            if len(self._local_slots) >= self.max_concurrency:
+                return None
+            slot = f"{SLOT_PREFIX}{uuid.uuid4().hex}"
+            self._local_slots.add(slot)
+            return slot
+
+        for index in random.sample(range(self.max_concurrency), self.max_concurrency):
+            slot = f"{SLOT_PREFIX}{index}"
+            try:
+                self.table.put_item(
+                    Item={
+                        'name_table': slot,
+                        'holder': self.owner,
+                        'lease_until': now + self.lease_seconds,
+                        'ttl': now + self.lease_seconds
+                    },
+                    ConditionExpression="attribute_not_exists(name_table) OR lease_until < :now",
+                    ExpressionAttributeValues={":now": now}
+                )
+                return slot
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+
+        return None
+
+    def _release(self, slot: str):
+        if self.table is None:
+            self._local_slots.discard(slot)
+            return
+
+        try:
+            self.table.delete_item(
+                Key={'name_table': slot},
+                ConditionExpression="#holder = :owner",
+                ExpressionAttributeNames={"#holder": "holder"},
+                ExpressionAttributeValues={":owner": self.owner}
+            )
+        except ClientError as e:
+            # Si el préstamo venció y otro lo tomó, el slot ya no es nuestro
+            print(f"Error releasing admission slot {slot}: {e}")
+
+    async def _dispatch(self):
+        """Entrega slots a la cabeza de la cola mientras haya peticiones esperando"""
+        while self._queue:
+            finish, _, waiter = self._queue[0]
+            if waiter.done():
+                heapq.heappop(self._queue)
+                continue
+
+            try:
+                slot = await asyncio.to_thread(self._try_acquire)
+            except ClientError as e:
+                # DynamoDB no disponible: se informa a quien espera en lugar de bloquear la cola
+                heapq.heappop(self._queue)
+                if not waiter.done():
+                    waiter.set_exception(e)
+                continue
+
+            if slot is None:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            heapq.heappop(self._queue)
+            self._virtual_time = finish
+            if waiter.done():
+                await asyncio.to_thread(self._release, slot)
+            else:
+                waiter.set_result(slot)
+
+    @asynccontextmanager
+    async def slot(self, client_id: str = "default", deadline: Deadline | None = None):
+        """
+        Espera turno y retiene un slot de concurrencia Athena mientras dura el bloque.
+        Args:
+            client_id (str): Cliente MCP, usado para repartir los turnos de forma justa.
+            deadline (Deadline | None): Límite de tiempo de la petición para la espera.
+        Raises:
+            AdmissionRejected: Si la cola local está llena o el turno no llega antes del límite.
+        """
+
+        if len(self._queue) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after())
+
+        start_tag = max(self._virtual_time, self._last_finish.get(client_id, 0.0))
+        finish_tag = start_tag + 1 / self._weight(client_id)
+        self._last_finish[client_id] = finish_tag
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish_tag, next(self._sequence), waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            slot = await asyncio.wait_for(waiter, timeout=deadline.remaining() if deadline else None)
+        except asyncio.TimeoutError as e:
+            # wait_for cancela el waiter, así que el despachador lo descarta
+            self.stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after()) from e
+        except asyncio.CancelledError:
+            # Cancelada justo después de recibir el slot: devolverlo
+            if waiter.done() and not waiter.cancelled():
+                await self._release_shielded(waiter.result())
+            raise
+
+        self.stats["admitted"] += 1
+        acquired_at = time.monotonic()
+        try:
+            yield slot
+        finally:
+            held = time.monotonic() - acquired_at
+            self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held
+            self.stats["released"] += 1
+            await self._release_shielded(slot)
+
+    async def _release_shielded(self, slot: str):
+        # La liberación debe completarse aunque la petición esté siendo cancelada
+        with anyio.CancelScope(shield=True):
+            await asyncio.to_thread(self._release, slot)
+
+    def snapshot(self) -> dict:
+        """Contadores y estado de la cola para las métricas del servidor"""
+        return {**self.stats, "queued": len(self._queue), "avg_hold_seconds": round(self._avg_hold_seconds, 3)}
+
+
+controller = AdmissionController(
+    table=aws_clients.get_resource("dynamodb").Table(CACHE_TABLE_NAME) if CACHE_TABLE_NAME else None,
+    max_concurrency=ATHENA_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    lease_seconds=ADMISSION_LEASE_SECONDS,
+    poll_seconds=ADMISSION_POLL_SECONDS,
+)
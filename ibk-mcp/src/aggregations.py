@@ -0,0 +1,191 @@
+''' Agregaciones con GROUP BY ejecutadas en Athena, validadas contra el esquema de Glue '''
+
+import os
+import re
+import hashlib
+from datetime import date, timedelta
+import pandas as pd
+
+import schema_dtypes
+
+# Columna de partición de la tabla (un valor por día de proceso)
+PARTITION_COLUMN = os.getenv("PARTITION_COLUMN", "fecha_proceso")
+# Rango máximo de días de una agregación
+AGGREGATE_MAX_DAYS = int(os.getenv("AGGREGATE_MAX_DAYS", "366"))
+# Tope de grupos devueltos; protege la respuesta si se agrupa por una columna de alta cardinalidad
+AGGREGATE_MAX_GROUPS = int(os.getenv("AGGREGATE_MAX_GROUPS", "10000"))
+
+# Funciones permitidas -> plantilla SQL; las que operan sobre valores exigen columna numérica
+METRIC_FUNCTIONS = {
+    "count": "count({column})",
+    "count_distinct": "count(DISTINCT {column})",
+    "sum": "sum({column})",
+    "avg": "avg({column})",
+    "min": "min({column})",
+    "max": "max({column})",
+}
+NUMERIC_FUNCTIONS = ("sum", "avg")
+NUMERIC_TYPES = schema_dtypes.INTEGER_TYPES + schema_dtypes.FLOAT_TYPES + ("decimal",)
+
+_METRIC_PATTERN = re.compile(r"^\s*(\w+)\s*\(\s*(\*|\w+)\s*\)\s*$")
+
+
+def parse_period_range(periodo_range: str, max_days: int = AGGREGATE_MAX_DAYS) -> tuple[str, str]:
+    """
+    Valida un rango de períodos.
+    Args:
+        periodo_range (str): 'YYYY-MM-DD' o 'YYYY-MM-DD:YYYY-MM-DD' (ambos extremos incluidos).
+        max_days (int): Máximo de días del rango.
+    Returns:
+        tuple: Fecha inicial y final en formato ISO.
+    """
+
+    parts = [part.strip() for part in periodo_range.split(":")]
+    if len(parts) not in (1, 2):
+        raise ValueError(f"Rango de períodos inválido: {periodo_range}. Use 'YYYY-MM-DD:YYYY-MM-DD'")
+    try:
+        start = date.fromisoformat(parts[0])
+        end = date.fromisoformat(parts[-1])
+    except ValueError as e:
+        raise ValueError(f"Rango de períodos inválido: {periodo_range}. Use 'YYYY-MM-DD:YYYY-MM-DD'") from e
+
+    if end < start:
+        raise ValueError(f"Rango de períodos invertido: {periodo_range}")
+    if (end - start).days + 1 > max_days:
+        raise ValueError(f"El rango {periodo_range} supera el máximo de {max_days} días")
+    return start.isoformat(), end.isoformat()
+
+
+def period_values(start: str, end: str) -> list[str]:
+    """Valores de partición (días) de un rango validado, ambos extremos incluidos"""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [(first + timedelta(days=offset)).isoformat() for offset in range((last - first).days + 1)]
+
+
+def check_column(column: str, column_types: dict[str, str]) -> str:
+    if column not in column_types:
+        raise ValueError(f"Columna desconocida: {column}. Columnas: {', '.join(column_types)}")
+    return column
+
+
+def split_metric(metric: str, column_types: dict[str, str]) -> tuple[str, str]:
+    """
+    Valida una métrica como 'sum(monto)' o 'count(*)' contra el esquema.
+    Returns:
+        tuple: Función y columna ('*' para count(*)).
+    """
+
+    match = _METRIC_PATTERN.match(metric.lower())
+    if not match or match.group(1) not in METRIC_FUNCTIONS:
+        raise ValueError(f"Métrica inválida: {metric}. Funciones: {', '.join(METRIC_FUNCTIONS)}")
+
+    function, column = match.groups()
+    if column == "*":
+        if function != "count":
+            raise ValueError(f"Solo count admite '*': {metric}")
+        return function, column
+
+    check_column(column, column_types)
+    base = schema_dtypes.base_type(column_types[column])
+    if function in NUMERIC_FUNCTIONS and base not in NUMERIC_TYPES:
+        raise ValueError(f"{function} requiere una columna numérica; {column} es {column_types[column]}")
+    return function, column
+
+
+def metric_alias(function: str, column: str) -> str:
+    return "count" if column == "*" else f"{function}_{column}"
+
+
+def parse_metrics(metrics: list[str], column_types: dict[str, str]) -> dict[str, tuple[str, str]]:
+    """
+    Valida las métricas y les asigna alias únicos.
+    Returns:
+        dict: Alias -> (función, columna); una métrica repetida aparece una sola vez.
+    Raises:
+        ValueError: Si dos métricas distintas producen el mismo alias,
+            p. ej. count(distinct_x) y count_distinct(x).
+    """
+
+    parsed = {}
+    for metric in metrics:
+        function, column = split_metric(metric, column_types)
+        alias = metric_alias(function, column)
+        if parsed.get(alias, (function, column)) != (function, column):
+            other = "{}({})".format(*parsed[alias])  # pylint: disable=consider-using-f-string
+            raise ValueError(f"Las métricas {metric} y {other} producen la misma columna {alias}")
+        parsed[alias] = (function, column)
+    return parsed
+
+
+def metric_expression(function: str, column: str) -> str:
+    """Expresión SQL de una métrica validada"""
+    if column == "*":
+        return "count(*)"
+    return METRIC_FUNCTIONS[function].format(column=f'"{column}"')
+
+
+def build_query(
+    database: str,
+    table: str,
+    column_types: dict[str, str],
+    periodo_range: str,
+    group_by: list[str],
+    metrics: list[str],
+    partition_column: str = PARTITION_COLUMN
+) -> tuple[str, str]:
+    """
+    Construye una única consulta GROUP BY sobre las particiones del rango.
+    Args:
+        database (str): Base de datos de Glue.
+        table (str): Tabla consultada.
+        column_types (dict): Tipos Athena por columna (Glue).
+        periodo_range (str): Rango de períodos (ver parse_period_range).
+        group_by (list[str]): Columnas de agrupación (pueden estar vacías: total global).
+        metrics (list[str]): Métricas, p. ej. ['sum(monto)', 'count(*)'].
+        partition_column (str): Columna de partición de la tabla.
+    Returns:
+        tuple: Consulta SQL y clave de caché determinista de la agregación.
+    """
+
+    start, end = parse_period_range(periodo_range)
+    if not metrics:
+        raise ValueError("Indique al menos una métrica, p. ej. 'sum(monto)' o 'count(*)'")
+
+    groups = list(dict.fromkeys(check_column(column, column_types) for column in group_by))
+    selected = {
+        alias: metric_expression(function, column)
+        for alias, (function, column) in parse_metrics(metrics, column_types).items()
+    }
+    clashing = [alias for alias in selected if alias in groups]
+    if clashing:
+        raise ValueError(f"Las métricas {', '.join(clashing)} coinciden con columnas de agrupación")
+
+    columns = [f'"{column}"' for column in groups]
+    select = ", ".join(columns + [f'{expression} AS "{alias}"' for alias, expression in selected.items()])
+    query = f"""
+    SELECT {select}
+    FROM {database}.{table}
+    WHERE {partition_column} BETWEEN '{start}' AND '{end}'
+    """
+    if columns:
+        # Un grupo de más permite avisar del corte (ver truncate)
+        query += f"""GROUP BY {", ".join(columns)}
+    ORDER BY {", ".join(columns)}
+    LIMIT {AGGREGATE_MAX_GROUPS + 1}
+    """
+
+    spec = f"{table}|{start}|{end}|{','.join(groups)}|{','.join(selected)}"
+    cache_key = f"aggregate_{hashlib.sha256(spec.encode()).hexdigest()[:32]}"
+    return query, cache_key
+
+
+def truncate(df: pd.DataFrame) -> tuple[pd.DataFrame, bool]:
+    """
+    Aplica el tope de grupos a un resultado de build_query, que pide AGGREGATE_MAX_GROUPS + 1.
+    Returns:
+        tuple: Resultado con a lo sumo AGGREGATE_MAX_GROUPS filas y si se recortó.
+    """
+
+    if len(df) > AGGREGATE_MAX_GROUPS:
+        return df.head(AGGREGATE_MAX_GROUPS), True
+    return df, False
@@ -0,0 +1,281 @@
+''' Estadísticas aproximadas con funciones de sketch de Athena y muestreo TABLESAMPLE '''
+
+import os
+import math
+import hashlib
+import pandas as pd
+
+import schema_dtypes
+import aggregations
+
+# Error estándar máximo de approx_distinct (2.3% es el valor por defecto de Athena)
+APPROX_DISTINCT_ERROR = float(os.getenv("APPROX_DISTINCT_ERROR", "0.023"))
+# Error de rango aproximado de approx_percentile (sketch con precisión por defecto)
+APPROX_PERCENTILE_RANK_ERROR = float(os.getenv("APPROX_PERCENTILE_RANK_ERROR", "0.01"))
+# BERNOULLI muestrea filas (sin sesgo, pero escanea todo); SYSTEM descarta bloques y sí reduce bytes escaneados
+APPROX_SAMPLE_METHOD = os.getenv("APPROX_SAMPLE_METHOD", "BERNOULLI").upper()
+# Los percentiles exactos ordenan todos los valores de la columna en un solo arreglo (un solo nodo):
+# solo se calculan si la estimación del planificador queda bajo estos topes (filas, o bytes sin estadísticas)
+APPROX_EXACT_PERCENTILE_MAX_ROWS = int(os.getenv("APPROX_EXACT_PERCENTILE_MAX_ROWS", "5000000"))
+APPROX_EXACT_PERCENTILE_MAX_BYTES = int(os.getenv("APPROX_EXACT_PERCENTILE_MAX_BYTES", str(256 * 1024 ** 2)))
+# Cuantil normal para los intervalos de confianza del 95%
+Z_95 = 1.96
+
+
+def _percentile_alias(percentile: float) -> str:
+    return f"p{round(percentile * 100, 2):g}".replace(".", "_")
+
+
+def validate(
+    column_types: dict[str, str],
+    columns: list[str],
+    percentiles: list[float],
+    sample_percent: float | None
+) -> tuple[list[str], list[float]]:
+    """Valida columnas, percentiles y porcentaje de muestreo; devuelve columnas y percentiles normalizados"""
+    if not columns:
+        raise ValueError("Indique al menos una columna")
+    for column in columns:
+        if column not in column_types:
+            raise ValueError(f"Columna desconocida: {column}. Columnas: {', '.join(column_types)}")
+    for percentile in percentiles:
+        if not 0 < percentile < 1:
+            raise ValueError(f"Percentil inválido: {percentile}. Use valores entre 0 y 1, p. ej. 0.5")
+    if sample_percent is not None and not 0 < sample_percent <= 100:
+        raise ValueError(f"Porcentaje de muestreo inválido: {sample_percent}. Use un valor en (0, 100]")
+    return list(dict.fromkeys(columns)), sorted(set(percentiles))
+
+
+def is_numeric(column_types: dict[str, str], column: str) -> bool:
+    return schema_dtypes.base_type(column_types[column]) in aggregations.NUMERIC_TYPES
+
+
+def exact_percentiles_allowed(rows: int | None, bytes_scanned: int | None) -> bool:
+    """
+    Indica si la ruta exacta puede calcular percentiles ordenando los valores en memoria.
+    Args:
+        rows (int | None): Filas estimadas por el planificador (estadísticas de Glue).
+        bytes_scanned (int | None): Bytes estimados, usados si no hay filas.
+    Returns:
+        bool: False si la estimación supera el tope o no hay estimación.
+    """
+    if rows is not None:
+        return rows <= APPROX_EXACT_PERCENTILE_MAX_ROWS
+    return bytes_scanned is not None and bytes_scanned <= APPROX_EXACT_PERCENTILE_MAX_BYTES
+
+
+def percentile_method(exact: bool, exact_percentiles: bool) -> str:
+    """Ruta con la que se calcularon los percentiles, para informarla en el resultado"""
+    if not exact:
+        return "approx_percentile"
+    return "sorted_array" if exact_percentiles else "omitted"
+
+
+def build_query(
+    database: str,
+    table: str,
+    column_types: dict[str, str],
+    periodo_range: str,
+    columns: list[str],
+    percentiles: list[float],
+    sample_percent: float | None = None,
+    exact: bool = False,
+    partition_column: str = aggregations.PARTITION_COLUMN,
+    exact_percentiles: bool = True
+) -> str:
+    """
+    Construye una única consulta de estadísticas.
+    En modo aproximado usa approx_distinct / approx_percentile y, si se indica, TABLESAMPLE.
+    En modo exacto usa count(DISTINCT) y percentiles sobre el arreglo ordenado (sin muestreo).
+    Args:
+        database (str): Base de datos de Glue.
+        table (str): Tabla consultada.
+        column_types (dict): Tipos Athena por columna (Glue).
+        periodo_range (str): Rango de períodos (ver aggregations.parse_period_range).
+        columns (list[str]): Columnas a describir.
+        percentiles (list[float]): Percentiles de las columnas numéricas, entre 0 y 1.
+        sample_percent (float | None): Porcentaje de filas muestreadas (solo modo aproximado).
+        exact (bool): Calcular los valores exactos (ruta de referencia).
+        partition_column (str): Columna de partición de la tabla.
+        exact_percentiles (bool): En modo exacto, calcular los percentiles (ver exact_percentiles_allowed);
+            si no, se devuelven nulos.
+    Returns:
+        str: Consulta SQL.
+    """
+
+    start, end = aggregations.parse_period_range(periodo_range)
+    select = ['count(*) AS "rows"']
+    for column in columns:
+        quoted = f'"{column}"'
+        if exact:
+            select.append(f'count(DISTINCT {quoted}) AS "{column}__distinct"')
+        else:
+            select.append(f'approx_distinct({quoted}, {APPROX_DISTINCT_ERROR}) AS "{column}__distinct"')
+        if not is_numeric(column_types, column):
+            continue
+
+        select.append(f'count({quoted}) AS "{column}__count"')
+        select.append(f'min({quoted}) AS "{column}__min"')
+        select.append(f'max({quoted}) AS "{column}__max"')
+        select.append(f'avg({quoted}) AS "{column}__avg"')
+        select.append(f'stddev_samp({quoted}) AS "{column}__stddev"')
+        for percentile in percentiles:
+            alias = f"{column}__{_percentile_alias(percentile)}"
+            if exact and not exact_percentiles:
+                select.append(f'CAST(NULL AS double) AS "{alias}"')
+            elif exact:
+                sorted_values = f"array_sort(array_agg({quoted}) FILTER (WHERE {quoted} IS NOT NULL))"
+                position = f"greatest(1, CAST(ceil({percentile} * count({quoted})) AS integer))"
+                select.append(f'element_at({sorted_values}, {position}) AS "{alias}"')
+            else:
+                select.append(f'approx_percentile({quoted}, {percentile}) AS "{alias}"')
+
+    source = f"{database}.{table}"
+    if sample_percent is not None and sample_percent < 100 and not exact:
+        source += f" TABLESAMPLE {APPROX_SAMPLE_METHOD} ({sample_percent})"
+
+    return f"""
+    SELECT {", ".join(select)}
+    FROM {source}
+    WHERE {partition_column} BETWEEN '{start}' AND '{end}'
+    """
+
+
+def cache_key(table: str, periodo_range: str, columns: list[str], percentiles: list[float],
+              sample_percent: float | None, exact: bool, exact_percentiles: bool = True) -> str:
+    start, end = aggregations.parse_period_range(periodo_range)
+    spec = f"{table}|{start}|{end}|{','.join(columns)}|{percentiles}|{sample_percent}|{exact}|{APPROX_SAMPLE_METHOD}"
+    if exact and not exact_percentiles:
+        spec += "|no_percentiles"
+    return f"approx_{hashlib.sha256(spec.encode()).hexdigest()[:32]}"
+
+
+def query_stats(df: pd.DataFrame, elapsed_seconds: float) -> dict:
+    """Bytes escaneados y tiempos de la ejecución, desde los metadatos que awswrangler adjunta al DataFrame"""
+    statistics = getattr(df, "query_metadata", {}).get("Statistics", {})
+    return {
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "engine_ms": statistics.get("EngineExecutionTimeInMillis"),
+        "bytes_scanned": statistics.get("DataScannedInBytes"),
+    }
+
+
+def attach_query_stats(df: pd.DataFrame, stats: dict) -> pd.DataFrame:
+    """Guarda el costo de la ejecución como columnas, para que viaje con el resultado en caché"""
+    for name, value in stats.items():
+        df[f"query__{name}"] = value
+    return df
+
+
+def read_query_stats(row: dict) -> dict:
+    return {name: _number(row.get(f"query__{name}")) for name in ("elapsed_seconds", "engine_ms", "bytes_scanned")}
+
+
+def _number(value):
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def interpret(
+    row: dict,
+    column_types: dict[str, str],
+    columns: list[str],
+    percentiles: list[float],
+    sample_percent: float | None,
+    exact: bool,
+    exact_percentiles: bool = True
+) -> dict:
+    """
+    Convierte la fila de resultados en estadísticas con sus cotas de error (intervalos del 95%).
+    Args:
+        row (dict): Única fila devuelta por la consulta.
+        column_types (dict): Tipos Athena por columna.
+        columns (list[str]): Columnas descritas.
+        percentiles (list[float]): Percentiles pedidos.
+        sample_percent (float | None): Porcentaje de muestreo usado.
+        exact (bool): Si los valores son exactos.
+        exact_percentiles (bool): Si la ruta exacta calculó los percentiles.
+    Returns:
+        dict: Estadísticas por columna, filas estimadas y notas sobre el error.
+    """
+
+    fraction = 1.0 if exact or not sample_percent else min(sample_percent, 100) / 100
+    sampled_rows = int(_number(row["rows"]) or 0)
+    rows = {"value": round(sampled_rows / fraction)}
+    if fraction < 1:
+        # Bernoulli: el conteo escalado tiene error relativo sqrt((1 - f) / n)
+        relative = math.sqrt((1 - fraction) / max(sampled_rows, 1))
+        rows.update(sampled=sampled_rows, interval=[round(rows["value"] * (1 - Z_95 * relative)),
+                                                    round(rows["value"] * (1 + Z_95 * relative))])
+
+    stats = {}
+    for column in columns:
+        distinct = _number(row[f"{column}__distinct"])
+        info = {"distinct": {"value": distinct}}
+        if not exact and distinct is not None:
+            margin = Z_95 * APPROX_DISTINCT_ERROR * distinct
+            info["distinct"]["interval"] = [max(0, round(distinct - margin)), round(distinct + margin)]
+        if fraction < 1:
+            # Los distintos de una muestra no se extrapolan: son una cota inferior del total
+            info["distinct"]["lower_bound_only"] = True
+
+        if is_numeric(column_types, column):
+            count = int(_number(row[f"{column}__count"]) or 0)
+            average = _number(row[f"{column}__avg"])
+            stddev = _number(row[f"{column}__stddev"])
+            info["min"] = _number(row[f"{column}__min"])
+            info["max"] = _number(row[f"{column}__max"])
+            info["avg"] = {"value": average}
+            if fraction < 1 and average is not None and stddev is not None and count:
+                margin = Z_95 * stddev / math.sqrt(count)
+                info["avg"]["interval"] = [average - margin, average + margin]
+
+            info["percentiles"] = {}
+            for percentile in percentiles:
+                value = _number(row[f"{column}__{_percentile_alias(percentile)}"])
+                entry = {"value": value}
+                if not exact:
+                    # Error en rango (percentil efectivo), del sketch más el del muestreo
+                    rank_error = APPROX_PERCENTILE_RANK_ERROR
+                    if fraction < 1 and count:
+                        rank_error += Z_95 * math.sqrt(percentile * (1 - percentile) / count)
+                    entry["rank_interval"] = [round(max(0.0, percentile - rank_error), 4),
+                                              round(min(1.0, percentile + rank_error), 4)]
+                info["percentiles"][_percentile_alias(percentile)] = entry
+
+        stats[column] = info
+
+    return {
+        "method": "exact" if exact else "approximate",
+        "percentile_method": percentile_method(exact, exact_percentiles),
+        "sample_percent": None if fraction == 1 else sample_percent,
+        "sample_method": APPROX_SAMPLE_METHOD if fraction < 1 else None,
+        "rows": rows,
+        "columns": stats,
+    }
+
+
+def compare(approx: dict, exact: dict) -> dict:
+    """Diferencias relativas y costo de la ruta aproximada frente a la exacta"""
+    differences = {}
+    for column, info in approx["columns"].items():
+        reference = exact["columns"][column]
+        pairs = [("distinct", info["distinct"]["value"], reference["distinct"]["value"])]
+        if "avg" in info:
+            pairs.append(("avg", info["avg"]["value"], reference["avg"]["value"]))
+            pairs.extend((name, entry["value"], reference["percentiles"][name]["value"])
+                         for name, entry in info["percentiles"].items())
+        differences[column] = {
+            name: None if not reference_value or value is None else round((value - reference_value) / reference_value, 6)
+            for name, value, reference_value in pairs
+        }
+
+    cost_approx, cost_exact = approx["query"], exact["query"]
+    return {
+        "relative_error": differences,
+        "latency_ratio": round(cost_approx["elapsed_seconds"] / cost_exact["elapsed_seconds"], 4)
+        if cost_exact["elapsed_seconds"] else None,
+        "bytes_ratio": round(cost_approx["bytes_scanned"] / cost_exact["bytes_scanned"], 4)
+        if cost_approx["bytes_scanned"] is not None and cost_exact["bytes_scanned"] else None,
+    }
@@ -0,0 +1,167 @@
+''' Ejecución de consultas Athena con progreso MCP y cancelación '''
+
+import os
+import asyncio
+from typing import Iterator
+import anyio
+import pandas as pd
+import awswrangler as wr
+from botocore.exceptions import BotoCoreError, ClientError
+from mcp.server.fastmcp import Context
+
+import aws_clients
+import admission
+from resilience import Deadline, DeadlineExceeded, breakers
+
+# Intervalo entre consultas del estado de la ejecución
+ATHENA_POLL_SECONDS = float(os.getenv("ATHENA_POLL_SECONDS", "0.5"))
+
+breaker = breakers["athena"]
+
+
+class ProgressReporter:
+    """
+    Envía notificaciones de progreso MCP con un contador creciente.
+    El detalle (estado, bytes escaneados, filas enviadas) va en el mensaje.
+    """
+
+    def __init__(self, ctx: Context | None):
+        self.ctx = ctx
+        self.step = 0
+
+    async def report(self, message: str):
+        """Notifica un paso de progreso si el cliente lo solicitó"""
+        if self.ctx is None:
+            return
+
+        self.step += 1
+        await self.ctx.report_progress(self.step, message=message)
+
+
+async def wait_for_query(query_execution_id: str, progress: ProgressReporter, deadline: Deadline) -> dict:
+    """
+    Espera a que termine la ejecución notificando estado y bytes escaneados.
+    Args:
+        query_execution_id (str): Id de la ejecución en Athena.
+        progress (ProgressReporter): Destino de las notificaciones de progreso.
+        deadline (Deadline): Límite de tiempo de la petición.
+    Returns:
+        dict: Descripción final de la ejecución (`QueryExecution`).
+    Raises:
+        DeadlineExceeded: Si la consulta no termina dentro del presupuesto.
+    """
+
+    athena_client = aws_clients.get_client("athena")
+    last_status = None
+
+    while True:
+        response = await asyncio.to_thread(athena_client.get_query_execution, QueryExecutionId=query_execution_id)
+        execution = response["QueryExecution"]
+        state = execution["Status"]["State"]
+        scanned = execution.get("Statistics", {}).get("DataScannedInBytes", 0)
+
+        if (state, scanned) != last_status:
+            await progress.report(f"{state}: {scanned} bytes escaneados")
+            last_status = (state, scanned)
+
+        if state == "SUCCEEDED":
+            return execution
+        if state in ("FAILED", "CANCELLED"):
+            raise wr.exceptions.QueryFailed(execution["Status"].get("StateChangeReason", state))
+
+        deadline.check(f"terminar la consulta {query_execution_id}")
+        await asyncio.sleep(deadline.timeout(ATHENA_POLL_SECONDS))
+
+
+async def stop_query(query_execution_id: str):
+    """Detiene la ejecución en Athena para liberar el slot de concurrencia"""
+    # Protegido de la cancelación en curso para que la llamada llegue a enviarse
+    with anyio.CancelScope(shield=True):
+        try:
+            await asyncio.to_thread(
+                aws_clients.get_client("athena").stop_query_execution,
+                QueryExecutionId=query_execution_id
+            )
+            print(f"Athena query {query_execution_id} stopped")
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Error stopping query {query_execution_id}: {e}")
+
+
+async def run_query(
+    query: str,
+    database: str,
+    s3_output: str,
+    progress: ProgressReporter | None = None,
+    chunksize: int | None = None,
+    client_id: str = "default",
+    deadline: Deadline | None = None,
+    dtype_backend: str = "numpy_nullable"
+) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """
+    Lanza la consulta en Athena, informa su progreso y descarga el resultado.
+    Si la petición MCP se cancela o el cliente se desconecta, la consulta se detiene.
+    La ejecución ocupa un slot del control de admisión solo mientras corre en Athena.
+    Args:
+        query (str): Consulta SQL a ejecutar.
+        database (str): Base de datos de Glue.
+        s3_output (str): Ubicación S3 para los resultados de Athena.
+        progress (ProgressReporter | None): Destino de las notificaciones de progreso.
+        chunksize (int | None): Si se indica, devuelve un iterador de DataFrames de ese tamaño.
+        client_id (str): Cliente MCP, para el reparto justo de la concurrencia.
+        deadline (Deadline | None): Límite de tiempo de la petición.
+        dtype_backend (str): Backend de tipos de pandas ("numpy_nullable" o "pyarrow").
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: Resultado de la consulta.
+    Raises:
+        admission.AdmissionRejected: Si la cola de admisión está llena.
+        CircuitOpenError: Si Athena está marcada como caída.
+        DeadlineExceeded: Si el presupuesto de la petición se agota.
+    """
+
+    session = aws_clients.get_session()
+    progress = progress or ProgressReporter(None)
+    deadline = deadline or Deadline()
+
+    breaker.check()
+    try:
+        await progress.report("ADMISSION: esperando turno de concurrencia")
+        async with admission.controller.slot(client_id, deadline):
+            query_execution_id = str(await asyncio.to_thread(
+                wr.athena.start_query_execution,
+                sql=query,
+                database=database,
+                s3_output=s3_output,
+                boto3_session=session
+            ))
+            await progress.report("QUEUED: consulta enviada a Athena")
+
+            try:
+                await wait_for_query(query_execution_id, progress, deadline)
+            except wr.exceptions.QueryFailed:
+                raise
+            except BaseException:
+                # Cancelación MCP, desconexión del cliente, deadline o error de polling: no dejar la consulta viva
+                await stop_query(query_execution_id)
+                raise
+
+        deadline.check("descargar el resultado")
+        result = await asyncio.to_thread(
+            wr.athena.get_query_results,
+            query_execution_id,
+            chunksize=chunksize,
+            dtype_backend=dtype_backend,
+            boto3_session=session
+        )
+    except wr.exceptions.QueryFailed:
+        # Athena respondió: el fallo es de la consulta, no de la dependencia
+        breaker.record_success()
+        raise
+    except (ClientError, BotoCoreError, DeadlineExceeded):
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.abandon()
+        raise
+
+    breaker.record_success()
+    return result
@@ -0,0 +1,142 @@
+''' Fábrica única de clientes AWS compartida por el servidor MCP '''
+
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "32"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "20"))
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "4"))
+# Perfil "rápido" para dependencias opcionales (caché): fallar pronto es mejor que esperar
+AWS_FAST_TIMEOUT = float(os.getenv("AWS_FAST_TIMEOUT", "1"))
+AWS_FAST_MAX_ATTEMPTS = int(os.getenv("AWS_FAST_MAX_ATTEMPTS", "2"))
+
+# Configuración común: pool explícito, keep-alive TCP, timeouts cortos y reintentos adaptativos
+BOTO_CONFIG = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=AWS_CONNECT_TIMEOUT,
+    read_timeout=AWS_READ_TIMEOUT,
+    retries={"mode": "adaptive", "max_attempts": AWS_MAX_ATTEMPTS},
+)
+
+FAST_CONFIG = BOTO_CONFIG.merge(Config(
+    connect_timeout=AWS_FAST_TIMEOUT,
+    read_timeout=AWS_FAST_TIMEOUT,
+    retries={"mode": "adaptive", "max_attempts": AWS_FAST_MAX_ATTEMPTS},
+))
+
+_lock = threading.RLock()
+_request_counts: dict[str, int] = {}
+
+
+def _count_request(service_name: str):
+    """Devuelve un handler de botocore que cuenta cada intento HTTP del servicio"""
+    def handler(**_kwargs):
+        with _lock:
+            _request_counts[service_name] = _request_counts.get(service_name, 0) + 1
+    return handler
+
+
+class PooledSession(boto3.Session):
+    """
+    Sesión boto3 que reutiliza un único cliente por servicio.
+    awswrangler crea un cliente nuevo en cada llamada; al recibir esta sesión
+    vía `boto3_session` todas sus llamadas comparten el mismo pool de conexiones.
+    """
+
+    def __init__(self, *args, config: Config = BOTO_CONFIG, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._config = config
+        self._clients: dict[tuple, object] = {}
+        self._resources: dict[str, object] = {}
+
+    def client(self, service_name, *args, **kwargs):
+        key = (service_name, kwargs.get("region_name"), kwargs.get("endpoint_url"))
+        with _lock:
+            cached = self._clients.get(key)
+            if cached is not None:
+                return cached
+
+            # Nuestra configuración prevalece sobre la que envíe el llamador (p. ej. awswrangler)
+            config = kwargs.get("config")
+            kwargs["config"] = config.merge(self._config) if config else self._config
+            created = super().client(service_name, *args, **kwargs)
+            created.meta.events.register("before-send", _count_request(service_name))
+            self._clients[key] = created
+            return created
+
+    def resource(self, service_name, *args, **kwargs):
+        with _lock:
+            cached = self._resources.get(service_name)
+            if cached is not None:
+                return cached
+
+            # boto3 construye el recurso sobre self.client, así que comparte el cliente cacheado
+            created = super().resource(service_name, *args, **kwargs)
+            self._resources[service_name] = created
+            return created
+
+    def pooled_clients(self) -> dict[str, object]:
+        """Clientes de bajo nivel creados hasta ahora, indexados por servicio"""
+        with _lock:
+            return {key[0]: client for key, client in self._clients.items()}
+
+
+_session = PooledSession()
+_fast_session = PooledSession(config=FAST_CONFIG)
+
+
+def get_session() -> PooledSession:
+    """Sesión compartida para pasar como `boto3_session` a awswrangler"""
+    return _session
+
+
+def get_client(service_name: str):
+    """Cliente boto3 compartido del servicio indicado"""
+    return _session.client(service_name)
+
+
+def get_resource(service_name: str, fast: bool = False):
+    """
+    Recurso boto3 compartido del servicio indicado.
+    Args:
+        service_name (str): Servicio AWS.
+        fast (bool): Usa el perfil de timeouts cortos y pocos reintentos.
+    """
+    return (_fast_session if fast else _session).resource(service_name)
+
+
+def _new_connections(client) -> int:
+    """Conexiones TCP/TLS abiertas por el pool urllib3 del cliente"""
+    try:
+        manager = client._endpoint.http_session._manager  # pylint: disable=protected-access
+        pools = manager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+    except (AttributeError, KeyError):
+        return 0
+
+
+def connection_stats() -> dict[str, dict[str, int]]:
+    """
+    Contadores por cliente de reutilización de conexiones.
+    Returns:
+        dict: Por servicio, peticiones enviadas, conexiones nuevas y peticiones que reutilizaron una conexión.
+    """
+    new_connections: dict[str, int] = {}
+    for session in (_session, _fast_session):
+        for service_name, client in session.pooled_clients().items():
+            new_connections[service_name] = new_connections.get(service_name, 0) + _new_connections(client)
+
+    stats = {}
+    for service_name, opened in new_connections.items():
+        with _lock:
+            requests = _request_counts.get(service_name, 0)
+        stats[service_name] = {
+            "requests": requests,
+            "new_connections": opened,
+            "reused_connections": max(requests - opened, 0),
+        }
+    return stats
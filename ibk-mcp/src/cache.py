@@ -0,0 +1,483 @@
+''' Caché de resultados en DynamoDB '''
+
+import os
+import time
+import atexit
+import hashlib
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+from resilience import Deadline, breakers
+
+CACHE_TABLE_NAME = os.getenv("CACHE_TABLE_NAME", "")
+# Tope por lectura/escritura de caché, además del tiempo restante de la petición
+CACHE_TIMEOUT_SECONDS = float(os.getenv("CACHE_TIMEOUT_SECONDS", "1.5"))
+# Si queda menos tiempo que esto, la escritura en caché se omite
+CACHE_WRITE_MIN_SECONDS = float(os.getenv("CACHE_WRITE_MIN_SECONDS", "5"))
+# Lecturas con cobertura (hedging): segunda petición si la primera supera el p95 observado
+CACHE_HEDGE_ENABLED = os.getenv("CACHE_HEDGE_ENABLED", "false").lower() == "true"
+# Fracción máxima de lecturas que pueden generar una petición de cobertura
+CACHE_HEDGE_MAX_RATE = float(os.getenv("CACHE_HEDGE_MAX_RATE", "0.05"))
+CACHE_HEDGE_PERCENTILE = float(os.getenv("CACHE_HEDGE_PERCENTILE", "95"))
+CACHE_HEDGE_MIN_MS = float(os.getenv("CACHE_HEDGE_MIN_MS", "5"))
+# Umbral mientras no hay suficientes muestras de latencia
+CACHE_HEDGE_DEFAULT_MS = float(os.getenv("CACHE_HEDGE_DEFAULT_MS", "50"))
+
+# Escritura diferida: las escrituras se encolan y se vuelcan en lotes fuera del camino de respuesta.
+# Solo es segura en Lambda con streamable-http, donde la respuesta del POST lleva el resultado de la
+# herramienta y FlushOnResponse vuelca antes de cerrarla. Con SSE el POST responde 202 al recibir el
+# mensaje y el resultado viaja por el stream GET, así que ninguna respuesta marca el fin de la
+# herramienta y lo encolado se perdería al congelarse la instancia: ahí se escribe de forma síncrona
+_LAMBDA_SSE = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME")) and os.getenv("MCP_TRANSPORT", "sse") == "sse"
+CACHE_WRITE_BEHIND = os.getenv("CACHE_WRITE_BEHIND", "false" if _LAMBDA_SSE else "true").lower() == "true"
+CACHE_FLUSH_INTERVAL_SECONDS = float(os.getenv("CACHE_FLUSH_INTERVAL_SECONDS", "0.05"))
+CACHE_FLUSH_BATCH_SIZE = int(os.getenv("CACHE_FLUSH_BATCH_SIZE", "25"))
+CACHE_WRITE_QUEUE_MAX = int(os.getenv("CACHE_WRITE_QUEUE_MAX", "200"))
+# Tiempo máximo de vaciado al apagar la instancia (Lambda da ~500 ms tras SIGTERM con extensiones)
+CACHE_FLUSH_SHUTDOWN_SECONDS = float(os.getenv("CACHE_FLUSH_SHUTDOWN_SECONDS", "0.4"))
+# Volcar las escrituras pendientes antes de cerrar cada respuesta HTTP. En Lambda la instancia se
+# congela al terminar la respuesta y lo encolado se perdería; por defecto activo solo en Lambda
+CACHE_FLUSH_ON_RESPONSE = os.getenv(
+    "CACHE_FLUSH_ON_RESPONSE", "true" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "false"
+).lower() == "true"
+CACHE_FLUSH_RESPONSE_SECONDS = float(os.getenv("CACHE_FLUSH_RESPONSE_SECONDS", "1"))
+# Tamaño máximo de un ítem de DynamoDB (400 KB, contando nombres de atributos)
+CACHE_MAX_ITEM_BYTES = int(os.getenv("CACHE_MAX_ITEM_BYTES", str(400 * 1024)))
+
+# Inicializar DynamoDB (perfil rápido: la caché es opcional y no debe bloquear la petición)
+dynamodb = aws_clients.get_resource("dynamodb", fast=True)
+cache_table = dynamodb.Table(CACHE_TABLE_NAME) if CACHE_TABLE_NAME else None  # type: ignore
+breaker = breakers["dynamodb"]
+
+
+@dataclass
+class CacheEntry:
+    """
+    Entrada de caché; puede estar vencida si DynamoDB aún no la ha purgado por TTL.
+    `payload` es el DataFrame en Arrow IPC, neutro respecto al formato de salida;
+    `rows` permite aplicar el límite de filas sin decodificarlo (None en entradas antiguas);
+    `etag` identifica el contenido, para que un cliente que ya lo tiene no lo vuelva a descargar.
+    """
+    payload: bytes
+    expires_at: int
+    rows: int | None = None
+    etag: str | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+class HedgePolicy:
+    """
+    Umbral adaptativo y contadores de las lecturas con cobertura.
+    El umbral es el percentil configurado de las últimas latencias de `get_item`.
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, percentile: float, max_rate: float, min_ms: float, default_ms: float):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_ms = min_ms
+        self.default_ms = default_ms
+        self._latencies_ms: deque[float] = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self.stats = {"reads": 0, "hedges": 0, "hedge_wins": 0, "saved_ms": 0.0}
+
+    def record_latency(self, elapsed_ms: float):
+        with self._lock:
+            self._latencies_ms.append(elapsed_ms)
+
+    def threshold_ms(self) -> float:
+        with self._lock:
+            samples = sorted(self._latencies_ms)
+        if len(samples) < self.MIN_SAMPLES:
+            return self.default_ms
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_ms, samples[index])
+
+    def allow_hedge(self) -> bool:
+        """
+        Respeta el tope de cobertura para no duplicar la carga sobre DynamoDB.
+        Contando la nueva cobertura, porque con pocas lecturas `hedges < reads * max_rate`
+        ya se cumple en la primera (0 < 1 * 0.05).
+        """
+        return self.stats["hedges"] + 1 <= self.stats["reads"] * self.max_rate
+
+    def record_saving(self, saved_ms: float):
+        self.stats["saved_ms"] += saved_ms
+
+    def snapshot(self) -> dict:
+        reads = self.stats["reads"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 3),
+            "hedge_rate": round(self.stats["hedges"] / reads, 4) if reads else 0.0,
+            "threshold_ms": round(self.threshold_ms(), 3),
+        }
+
+
+hedging = HedgePolicy(CACHE_HEDGE_PERCENTILE, CACHE_HEDGE_MAX_RATE, CACHE_HEDGE_MIN_MS, CACHE_HEDGE_DEFAULT_MS)
+
+
+def content_etag(payload: bytes) -> str:
+    """Hash del contenido: cambia solo si cambian los datos"""
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def get_cached_result(key: str) -> CacheEntry | None:
+    """Obtiene la entrada de la caché si existe, vigente o vencida"""
+    if not cache_table or not breaker.allow():
+        return None
+
+    try:
+        response = cache_table.get_item(Key={'name_table': key})
+        breaker.record_success()
+        if 'Item' in response:
+            item = response['Item']
+            # Entradas antiguas con texto renderizado (sin 'payload') se tratan como fallo de caché
+            if 'payload' in item:
+                print(f"Cache hit for {key}")
+                # Entradas anteriores al ETag lo calculan al leerse
+                return _entry(item)
+    except (ClientError, BotoCoreError) as e:
+        breaker.record_failure()
+        print(f"Error reading cache: {e}")
+
+    return None
+
+def _item(key: str, payload: bytes, ttl_seconds: int, rows: int | None) -> dict:
+    item = {
+        'name_table': key,
+        'payload': payload,
+        'etag': content_etag(payload),
+        'ttl': int(time.time()) + ttl_seconds
+    }
+    if rows is not None:
+        item['rows'] = rows
+    return item
+
+def item_size(item: dict) -> int:
+    """Tamaño aproximado del ítem según las reglas de DynamoDB (nombres más valores)"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode())
+        if isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, str):
+            size += len(value.encode())
+        else:
+            # Números: hasta 21 bytes
+            size += 21
+    return size
+
+
+def _entry(item: dict) -> CacheEntry:
+    return CacheEntry(
+        payload=bytes(item['payload']),
+        expires_at=int(item.get('ttl', 0)),
+        rows=int(item['rows']) if 'rows' in item else None,
+        etag=item.get('etag') or content_etag(bytes(item['payload']))
+    )
+
+def save_cached_result(key: str, payload: bytes, ttl_seconds: int = 3600, rows: int | None = None):
+    """Guarda el resultado en la caché"""
+    if not cache_table or not breaker.allow():
+        return
+
+    item = _item(key, payload, ttl_seconds, rows)
+    if item_size(item) > CACHE_MAX_ITEM_BYTES:
+        print(f"Cache write skipped for {key}: {item_size(item)} bytes exceed the item limit")
+        return
+
+    try:
+        cache_table.put_item(Item=item)
+        breaker.record_success()
+        print(f"Cache saved for {key}")
+    except (ClientError, BotoCoreError) as e:
+        breaker.record_failure()
+        print(f"Error saving cache: {e}")
+
+
+def delete_cached_result(key: str):
+    """Borra la entrada de la caché"""
+    if not cache_table or not breaker.allow():
+        return
+
+    try:
+        cache_table.delete_item(Key={'name_table': key})
+        breaker.record_success()
+        print(f"Cache invalidated for {key}")
+    except (ClientError, BotoCoreError) as e:
+        breaker.record_failure()
+        print(f"Error invalidating cache: {e}")
+
+
+class WriteBehindQueue:
+    """
+    Cola de escrituras de caché volcada en segundo plano con BatchWriteItem.
+    Varias escrituras de la misma clave se colapsan en la última. Los fallos
+    y descartes se cuentan en `stats` en lugar de imprimirse.
+    Mientras un ítem espera su volcado, las lecturas de su clave se sirven desde la cola.
+    """
+
+    def __init__(self, table, interval: float, batch_size: int, max_pending: int,
+                 max_item_bytes: int = CACHE_MAX_ITEM_BYTES):
+        self.table = table
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_item_bytes = max_item_bytes
+        self._pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._flusher: asyncio.Task | None = None
+        # queued = flushed + failed + dropped + coalesced + discarded + pending
+        self.stats = {
+            "queued": 0, "flushed": 0, "failed": 0, "dropped": 0, "coalesced": 0, "discarded": 0,
+            "oversized": 0, "batches": 0
+        }
+
+    def enqueue(self, item: dict):
+        """Encola un ítem y se asegura de que el volcado en segundo plano esté activo"""
+        if item_size(item) > self.max_item_bytes:
+            # DynamoDB rechazaría el lote completo en el que viaje
+            self.stats["oversized"] += 1
+            return
+
+        with self._lock:
+            if item['name_table'] in self._pending:
+                # La escritura anterior de la clave queda sustituida por esta
+                self.stats["coalesced"] += 1
+            elif len(self._pending) >= self.max_pending:
+                # Cola llena: se descarta la escritura más antigua
+                self._pending.pop(next(iter(self._pending)))
+                self.stats["dropped"] += 1
+            self._pending[item['name_table']] = item
+            self.stats["queued"] += 1
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    def discard(self, key: str):
+        """Quita una escritura pendiente (la entrada se invalidó antes de volcarse)"""
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.stats["discarded"] += 1
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Entrada aún no volcada de la clave, si la hay"""
+        with self._lock:
+            item = self._pending.get(key)
+        return _entry(item) if item is not None else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _put_each(self, batch: list[dict]):
+        """Escribe los ítems uno a uno: un ítem inválido no arrastra al resto del lote"""
+        for index, item in enumerate(batch):
+            try:
+                self.table.put_item(Item=item)
+                self.stats["flushed"] += 1
+            except ClientError:
+                self.stats["failed"] += 1
+            except BotoCoreError:
+                # DynamoDB dejó de responder a mitad del lote: no insistir con el resto
+                breaker.record_failure()
+                self.stats["failed"] += len(batch) - index
+                return
+
+    def flush_once(self) -> int:
+        """Vuelca un lote de ítems pendientes; devuelve cuántos se intentaron"""
+        with self._lock:
+            keys = list(self._pending)[:self.batch_size]
+            batch = [self._pending.pop(key) for key in keys]
+
+        if not batch:
+            return 0
+
+        if not breaker.allow():
+            self.stats["failed"] += len(batch)
+            return len(batch)
+
+        try:
+            with self.table.batch_writer() as writer:
+                for item in batch:
+                    writer.put_item(Item=item)
+            breaker.record_success()
+            self.stats["flushed"] += len(batch)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ValidationException":
+                # El lote se rechaza entero por un ítem inválido: DynamoDB responde, no está caída
+                breaker.record_success()
+                self._put_each(batch)
+            else:
+                breaker.record_failure()
+                self.stats["failed"] += len(batch)
+        except BotoCoreError:
+            breaker.record_failure()
+            self.stats["failed"] += len(batch)
+
+        self.stats["batches"] += 1
+        return len(batch)
+
+    async def _run(self):
+        """Volcado periódico mientras haya escrituras pendientes"""
+        while self.pending():
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.flush_once)
+
+    def drain(self, timeout: float):
+        """Vaciado síncrono y acotado en el tiempo, para el apagado de la instancia"""
+        limit = time.monotonic() + timeout
+        while time.monotonic() < limit and self.flush_once():
+            pass
+
+    async def flush(self, timeout: float):
+        """Vaciado acotado sin bloquear el event loop, antes de cerrar una respuesta"""
+        if self.pending():
+            await asyncio.to_thread(self.drain, timeout)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "pending": self.pending()}
+
+
+write_behind = WriteBehindQueue(cache_table, CACHE_FLUSH_INTERVAL_SECONDS, CACHE_FLUSH_BATCH_SIZE, CACHE_WRITE_QUEUE_MAX)
+if cache_table is not None:
+    atexit.register(write_behind.drain, CACHE_FLUSH_SHUTDOWN_SECONDS)
+
+
+class FlushOnResponse:
+    """
+    Middleware ASGI que vuelca la escritura diferida antes del último fragmento de cada respuesta.
+    Con Lambda Web Adapter la invocación termina (y la instancia se congela) al cerrarse la respuesta,
+    así que lo encolado durante la petición se escribe antes de ese punto.
+    La garantía cubre streamable-http, donde la respuesta del POST incluye el resultado de la herramienta;
+    con SSE no, y por eso en Lambda con SSE la escritura diferida está desactivada por defecto.
+    """
+
+    def __init__(self, app, queue: WriteBehindQueue, timeout: float):
+        self.app = app
+        self.queue = queue
+        self.timeout = timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_flush(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                await self.queue.flush(self.timeout)
+            await send(message)
+
+        await self.app(scope, receive, send_after_flush)
+
+
+def _timed_get(key: str) -> CacheEntry | None:
+    start = time.perf_counter()
+    entry = get_cached_result(key)
+    hedging.record_latency((time.perf_counter() - start) * 1000)
+    return entry
+
+
+async def hedged_get(key: str) -> CacheEntry | None:
+    """
+    Lectura con cobertura: si `get_item` no responde dentro del umbral adaptativo
+    se lanza una segunda lectura y gana la primera respuesta.
+    """
+
+    hedging.stats["reads"] += 1
+    primary = asyncio.create_task(asyncio.to_thread(_timed_get, key))
+    done, _ = await asyncio.wait({primary}, timeout=hedging.threshold_ms() / 1000)
+    if done or not hedging.allow_hedge():
+        return await primary
+
+    hedging.stats["hedges"] += 1
+    hedge = asyncio.create_task(asyncio.to_thread(_timed_get, key))
+    done, _ = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+    winner = done.pop()
+
+    if winner is hedge:
+        hedging.stats["hedge_wins"] += 1
+        # La latencia ahorrada se conoce cuando la lectura original termina
+        won_at = time.perf_counter()
+        primary.add_done_callback(lambda _: hedging.record_saving((time.perf_counter() - won_at) * 1000))
+
+    return winner.result()
+
+
+async def lookup(key: str, deadline: Deadline) -> CacheEntry | None:
+    """
+    Lee la caché sin exceder el presupuesto de la petición.
+    Args:
+        key (str): Clave de caché.
+        deadline (Deadline): Límite de tiempo de la petición.
+    Returns:
+        CacheEntry | None: Entrada encontrada, o None si no hay o no hubo tiempo.
+    """
+
+    # Escrita hace un momento y aún en la cola: no hace falta ir a DynamoDB (ni de nuevo al origen)
+    pending = write_behind.get(key)
+    if pending is not None:
+        return pending
+
+    read = hedged_get(key) if CACHE_HEDGE_ENABLED else asyncio.to_thread(get_cached_result, key)
+    try:
+        return await asyncio.wait_for(read, timeout=deadline.timeout(CACHE_TIMEOUT_SECONDS))
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        print(f"Cache read timed out for {key}")
+        return None
+
+
+async def save(key: str, payload: bytes, deadline: Deadline, ttl_seconds: int = 3600, rows: int | None = None):
+    """
+    Guarda el resultado en caché. Con escritura diferida solo se encola;
+    en modo síncrono se escribe si queda margen suficiente en el presupuesto.
+    """
+    if not cache_table:
+        return
+    if rows == 0:
+        # Un resultado vacío suele ser una partición aún no cargada; guardarlo la ocultaría hasta que venza el TTL
+        print(f"Cache write skipped for {key}: empty result")
+        return
+
+    if CACHE_WRITE_BEHIND:
+        write_behind.enqueue(_item(key, payload, ttl_seconds, rows))
+        return
+
+    if deadline.remaining() < CACHE_WRITE_MIN_SECONDS:
+        print(f"Cache write skipped for {key}: deadline too close")
+        return
+
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(save_cached_result, key, payload, ttl_seconds, rows),
+            timeout=deadline.timeout(CACHE_TIMEOUT_SECONDS)
+        )
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        print(f"Cache write timed out for {key}")
+
+
+async def invalidate(key: str, deadline: Deadline):
+    """Borra la entrada (y su escritura pendiente, si la hay) para que la próxima lectura vaya al origen"""
+    if not cache_table:
+        return
+
+    write_behind.discard(key)
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(delete_cached_result, key),
+            timeout=deadline.timeout(CACHE_TIMEOUT_SECONDS)
+        )
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        print(f"Cache invalidation timed out for {key}")
@@ -0,0 +1,173 @@
+''' Catálogo declarativo de tablas consultables, con políticas de consulta y caché por tabla '''
+
+import os
+import re
+import json
+import time
+import threading
+from dataclasses import dataclass, asdict, fields
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+import aggregations
+import glue_catalog
+import summary
+
+# Origen del catálogo: archivo JSON local o parámetro de SSM (el archivo tiene prioridad).
+# Sin ninguno de los dos se sirve solo la tabla de DATABASE_NAME / TABLE_NAME.
+TABLE_CATALOG_FILE = os.getenv("TABLE_CATALOG_FILE", "")
+TABLE_CATALOG_SSM_PARAMETER = os.getenv("TABLE_CATALOG_SSM_PARAMETER", "")
+# Cada cuánto se relee el origen: agregar o cambiar tablas no requiere redesplegar
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+DATABASE_NAME = os.getenv("DATABASE_NAME", "")
+TABLE_NAME = os.getenv("TABLE_NAME", "")
+# Vigencia por defecto de los resultados en caché (DynamoDB)
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+# Los nombres se interpolan en SQL y en claves de caché: solo identificadores simples
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass(frozen=True)
+class TableConfig:
+    """Tabla permitida y sus políticas de consulta y caché"""
+    # Nombre con el que los clientes piden la tabla (y espacio de nombres de sus claves de caché)
+    name: str
+    database: str
+    table: str
+    partition_column: str = aggregations.PARTITION_COLUMN
+    # Columnas que devuelve get_data_by_period (vacío: todas)
+    projection: tuple[str, ...] = ()
+    cache_ttl_seconds: int = CACHE_TTL_SECONDS
+    # Límites por defecto de la respuesta y del escaneo (None: los del servidor)
+    max_rows: int | None = None
+    max_bytes: int | None = None
+    max_scan_bytes: int | None = None
+    description: str = ""
+
+    def cache_key(self, key: str) -> str:
+        """
+        Clave de caché dentro del espacio de nombres de la tabla y de la versión de su esquema
+        en Glue, para que un cambio de esquema no sirva resultados con las columnas anteriores
+        """
+        version = glue_catalog.schemas.version(self.database, self.table)
+        return f"{self.name}@{version}#{key}" if version else f"{self.name}#{key}"
+
+    def select_list(self) -> str:
+        return ", ".join(f'"{column}"' for column in self.projection) or "*"
+
+    def budget(self, max_rows: int | None, max_bytes: int | None) -> tuple[int, int]:
+        """Presupuesto de la respuesta: el pedido por el cliente, si no el de la tabla, si no el del servidor"""
+        return summary.budget(
+            self.max_rows if max_rows is None else max_rows,
+            self.max_bytes if max_bytes is None else max_bytes
+        )
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "projection": list(self.projection)}
+
+
+def _parse_entry(name: str, entry: dict) -> TableConfig:
+    allowed = {item.name for item in fields(TableConfig)} - {"name"}
+    unknown = set(entry) - allowed
+    if unknown:
+        raise ValueError(f"Tabla {name}: claves desconocidas {sorted(unknown)}")
+
+    config = TableConfig(
+        name=name,
+        **{**entry, "projection": tuple(column.lower() for column in entry.get("projection", []))}
+    )
+    for value in (config.name, config.database, config.table, config.partition_column, *config.projection):
+        if not _IDENTIFIER.match(value):
+            raise ValueError(f"Tabla {name}: identificador inválido {value!r}")
+    return config
+
+
+def parse(document: dict) -> tuple[dict[str, TableConfig], str]:
+    """
+    Valida un documento de catálogo.
+    Args:
+        document (dict): {"default": "ventas", "tables": {"ventas": {"database": ..., "table": ..., ...}}}
+    Returns:
+        tuple: Tablas por nombre y nombre de la tabla por defecto.
+    Raises:
+        ValueError: Si el documento no es válido.
+    """
+
+    tables = {name.lower(): _parse_entry(name.lower(), entry) for name, entry in document.get("tables", {}).items()}
+    if not tables:
+        raise ValueError("El catálogo no define tablas")
+    default = (document.get("default") or next(iter(tables))).lower()
+    if default not in tables:
+        raise ValueError(f"La tabla por defecto {default} no está en el catálogo")
+    return tables, default
+
+
+def _read_source() -> dict:
+    if TABLE_CATALOG_FILE:
+        with open(TABLE_CATALOG_FILE, encoding="utf-8") as file:
+            return json.load(file)
+    if TABLE_CATALOG_SSM_PARAMETER:
+        response = aws_clients.get_client("ssm").get_parameter(Name=TABLE_CATALOG_SSM_PARAMETER, WithDecryption=True)
+        return json.loads(response["Parameter"]["Value"])
+    return {"tables": {TABLE_NAME: {"database": DATABASE_NAME, "table": TABLE_NAME}}}
+
+
+class Catalog:
+    """Tablas permitidas, releídas del origen cada CATALOG_REFRESH_SECONDS"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._tables: dict[str, TableConfig] = {}
+        self._default = ""
+        self._loaded_at = 0.0
+        self.stats = {"reloads": 0, "reload_errors": 0}
+
+    def _load(self):
+        try:
+            tables, default = parse(_read_source())
+        except (OSError, ValueError, TypeError, ClientError, BotoCoreError) as e:
+            self.stats["reload_errors"] += 1
+            if not self._tables:
+                raise ValueError(f"No se pudo cargar el catálogo de tablas: {e}") from e
+            # Se conserva el último catálogo válido
+            print(f"Error reloading table catalog: {e}")
+            self._loaded_at = time.monotonic()
+            return
+
+        if set(tables) != set(self._tables):
+            print(f"Table catalog: {sorted(tables)} (default {default})")
+        self._tables, self._default = tables, default
+        self._loaded_at = time.monotonic()
+        self.stats["reloads"] += 1
+
+    def entries(self) -> dict[str, TableConfig]:
+        with self._lock:
+            if not self._tables or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                self._load()
+            return dict(self._tables)
+
+    def resolve(self, name: str | None) -> TableConfig:
+        """
+        Configuración de la tabla pedida.
+        Args:
+            name (str | None): Nombre de la tabla en el catálogo (None: la tabla por defecto).
+        Returns:
+            TableConfig: Configuración de la tabla.
+        Raises:
+            ValueError: Si la tabla no está en el catálogo.
+        """
+
+        tables = self.entries()
+        name = (name or self._default).lower()
+        if name not in tables:
+            raise ValueError(f"Tabla no permitida: {name}. Opciones: {', '.join(sorted(tables))}")
+        return tables[name]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "tables": sorted(self._tables), "default": self._default}
+
+
+tables = Catalog(CATALOG_REFRESH_SECONDS)
@@ -0,0 +1,99 @@
+''' Serializadores de resultados para las herramientas MCP '''
+
+import io
+import json
+import base64
+import pandas as pd
+import pyarrow as pa
+
+# "text" mantiene la salida histórica de DataFrame.to_string()
+FORMATS = ("text", "csv", "json", "markdown", "arrow")
+DEFAULT_FORMAT = "text"
+
+
+def _markdown_cells(values: pd.Series) -> list[str]:
+    """Celdas en una sola línea: '|' escapado, saltos de línea como <br> y nulos vacíos"""
+    # Los nulos se vacían antes de convertir a texto: astype(str) los escribiría como <NA>, None o nan
+    return (
+        values.astype(object).where(values.notna(), "").astype(str)
+        .str.replace("|", r"\|", regex=False)
+        .str.replace(r"\r\n|\r|\n", "<br>", regex=True)
+        .tolist()
+    )
+
+
+def _markdown(df: pd.DataFrame, header: bool) -> str:
+    """Tabla Markdown sin relleno de columnas (tabulate no es necesario)"""
+    lines = []
+    if header:
+        lines.append("| " + " | ".join(_markdown_cells(pd.Series(df.columns, dtype=object))) + " |")
+        lines.append("|" + "---|" * len(df.columns))
+    if len(df):
+        cells = [_markdown_cells(df[column]) for column in df.columns]
+        lines.extend("| " + " | ".join(row) + " |" for row in zip(*cells))
+    return "\n".join(lines)
+
+
+def _json_values(values: pd.Series) -> str:
+    """Valores de una columna como arreglo JSON"""
+    if pd.api.types.is_integer_dtype(values.dtype) and values.hasnans:
+        # El encoder convierte los enteros con nulos en float (1.0); como objetos se mantienen enteros
+        values = values.astype(object).where(values.notna(), None)
+    return values.to_json(orient="values", date_format="iso")
+
+
+def _json(df: pd.DataFrame) -> str:
+    """JSON columnar compacto: {"columns": [...], "data": {columna: [valores]}}"""
+    # Cada columna se serializa con el encoder C de pandas y se ensambla sin volver a parsear
+    columns = [str(column) for column in df.columns]
+    data = ",".join(
+        f"{json.dumps(name, ensure_ascii=False)}:{_json_values(df[column])}"
+        for name, column in zip(columns, df.columns)
+    )
+    header = json.dumps(columns, ensure_ascii=False, separators=(",", ":"))
+    return f'{{"columns":{header},"data":{{{data}}}}}'
+
+
+def _arrow(df: pd.DataFrame) -> str:
+    """Arrow IPC (stream) en base64, para clientes programáticos"""
+    return base64.b64encode(to_payload(df)).decode("ascii")
+
+
+def render(df: pd.DataFrame, fmt: str = DEFAULT_FORMAT, header: bool = True) -> str:
+    """
+    Renderiza un DataFrame en el formato pedido.
+    Args:
+        df (pd.DataFrame): Datos a renderizar.
+        fmt (str): Uno de FORMATS.
+        header (bool): Incluir cabecera (False para bloques de streaming posteriores al primero).
+    Returns:
+        str: Resultado serializado.
+    """
+
+    if fmt == "text":
+        return df.to_string(header=header)
+    if fmt == "csv":
+        return df.to_csv(index=False, header=header)
+    if fmt == "json":
+        return _json(df)
+    if fmt == "markdown":
+        return _markdown(df, header)
+    if fmt == "arrow":
+        return _arrow(df)
+    raise ValueError(f"Formato no soportado: {fmt}. Opciones: {', '.join(FORMATS)}")
+
+
+def to_payload(df: pd.DataFrame) -> bytes:
+    """Serializa el DataFrame como Arrow IPC comprimido (formato neutro de la caché)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def from_payload(payload: bytes) -> pd.DataFrame:
+    """Reconstruye el DataFrame desde su representación Arrow IPC"""
+    with pa.ipc.open_stream(payload) as reader:
+        return reader.read_all().to_pandas()
@@ -0,0 +1,149 @@
+''' Caché en proceso de las definiciones de tablas del catálogo de Glue '''
+
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+
+# Pasado este tiempo la definición se revalida con Glue en segundo plano (se sigue sirviendo la anterior)
+SCHEMA_CACHE_TTL_SECONDS = float(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "900"))
+
+
+@dataclass
+class TableDefinition:
+    """Columnas, tipos y claves de partición de una tabla de Glue"""
+    database: str
+    table: str
+    # Columnas de datos y de partición, en orden, con su tipo Athena
+    columns: dict[str, str]
+    partition_keys: list[str]
+    version: str
+    location: str = ""
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def as_dict(self) -> dict:
+        return {
+            "database": self.database,
+            "table": self.table,
+            "columns": [
+                {"name": name, "type": athena_type, "partition_key": name in self.partition_keys}
+                for name, athena_type in self.columns.items()
+            ],
+            "partition_keys": self.partition_keys,
+            "version": self.version,
+            "location": self.location,
+            "cache_age_seconds": round(self.age, 1),
+        }
+
+
+def fetch(database: str, table: str) -> TableDefinition:
+    """Lee la definición de la tabla directamente de Glue"""
+    response = aws_clients.get_client("glue").get_table(DatabaseName=database, Name=table)
+    item = response["Table"]
+    descriptor = item.get("StorageDescriptor", {})
+    partition_keys = [column["Name"].lower() for column in item.get("PartitionKeys", [])]
+    columns = {column["Name"].lower(): column["Type"].lower() for column in descriptor.get("Columns", [])}
+    columns.update({column["Name"].lower(): column["Type"].lower() for column in item.get("PartitionKeys", [])})
+    return TableDefinition(
+        database=database,
+        table=table,
+        columns=columns,
+        partition_keys=partition_keys,
+        # Glue incrementa VersionId en cada cambio de la tabla; sin él se usa la fecha de actualización
+        version=str(item.get("VersionId") or item.get("UpdateTime", "")),
+        location=descriptor.get("Location", "")
+    )
+
+
+class SchemaCache:
+    """
+    Definiciones de tablas con TTL y revalidación en segundo plano (stale-while-revalidate).
+    Solo la primera lectura de una tabla espera a Glue; después, una definición vencida
+    se sigue sirviendo mientras un hilo la refresca, y se reemplaza si cambió su versión.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables: dict[tuple[str, str], TableDefinition] = {}
+        self._refreshing: set[tuple[str, str]] = set()
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "version_changes": 0, "refresh_errors": 0}
+
+    def get(self, database: str, table: str) -> TableDefinition:
+        """
+        Definición de la tabla.
+        Raises:
+            ClientError: Si la tabla no existe o Glue falla y no hay una definición previa.
+        """
+
+        key = (database, table)
+        with self._lock:
+            definition = self._tables.get(key)
+            if definition is not None:
+                self.stats["hits"] += 1
+                if definition.age >= self.ttl and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=key, daemon=True).start()
+                return definition
+            self.stats["misses"] += 1
+
+        definition = fetch(database, table)
+        with self._lock:
+            self._tables[key] = definition
+        return definition
+
+    def _refresh(self, database: str, table: str):
+        key = (database, table)
+        try:
+            fresh = fetch(database, table)
+            with self._lock:
+                current = self._tables.get(key)
+                self.stats["refreshes"] += 1
+                if current is not None and current.version != fresh.version:
+                    self.stats["version_changes"] += 1
+                    print(f"Glue table {database}.{table} changed: version {current.version} -> {fresh.version}")
+                self._tables[key] = fresh
+        except (ClientError, BotoCoreError) as e:
+            # Se conserva la definición anterior; se reintentará en la próxima lectura
+            self.stats["refresh_errors"] += 1
+            print(f"Error refreshing Glue table {database}.{table}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def version(self, database: str, table: str) -> str:
+        """
+        Versión de la definición ya cargada, sin llamar a Glue ("" si aún no se cargó).
+        Forma parte de las claves de caché de la tabla (ver catalog.TableConfig.cache_key):
+        cuando la revalidación detecta un cambio de versión, los resultados guardados con el
+        esquema anterior dejan de leerse y vencen por su TTL.
+        """
+        with self._lock:
+            definition = self._tables.get((database, table))
+        return definition.version if definition is not None else ""
+
+    def warm(self, database: str, tables: list[str]):
+        """Carga las tablas en segundo plano al arrancar, para que la primera petición no espere a Glue"""
+        def load():
+            for table in tables:
+                try:
+                    self.get(database, table)
+                except (ClientError, BotoCoreError) as e:
+                    print(f"Error warming Glue table {database}.{table}: {e}")
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tables = {f"{db}.{table}": definition.version for (db, table), definition in self._tables.items()}
+        return {**self.stats, "tables": tables}
+
+
+schemas = SchemaCache(SCHEMA_CACHE_TTL_SECONDS)
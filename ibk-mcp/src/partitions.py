@@ -0,0 +1,182 @@
+''' Metadatos de particiones (Glue) y tamaño de sus archivos (S3) para estimar el volumen a escanear '''
+
+import os
+import glob
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import aws_clients
+
+# Vigencia de los metadatos de particiones y listados de S3 en memoria
+PARTITION_CACHE_SECONDS = float(os.getenv("PARTITION_CACHE_SECONDS", "300"))
+# Entradas máximas de cada caché (consultas de particiones y ubicaciones listadas); se descartan las menos usadas
+PARTITION_CACHE_MAX_ENTRIES = int(os.getenv("PARTITION_CACHE_MAX_ENTRIES", "256"))
+
+_lock = threading.Lock()
+_partitions_cache: OrderedDict[tuple, tuple[float, list]] = OrderedDict()
+_listing_cache: OrderedDict[str, tuple[float, tuple[list[str], int]]] = OrderedDict()
+
+
+@dataclass
+class Partition:
+    """Partición de Glue: valor de la columna de partición, ubicación y formato"""
+    value: str
+    location: str
+    input_format: str
+    # Tamaño y filas registrados en los parámetros de Glue (si la tabla tiene estadísticas)
+    size_bytes: int | None = None
+    rows: int | None = None
+
+
+@dataclass
+class ScanEstimate:
+    """Estimación del volumen que una consulta leería de las particiones indicadas"""
+    partitions: list[Partition]
+    bytes: int
+    # "glue" si todas las particiones tenían estadísticas, "s3" si hubo que listar archivos
+    source: str
+    missing: list[str] = field(default_factory=list)
+    files: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def rows(self) -> int | None:
+        """Filas de las particiones según Glue, o None si alguna no tiene estadísticas"""
+        if not self.partitions or any(partition.rows is None for partition in self.partitions):
+            return None
+        return sum(partition.rows for partition in self.partitions)  # type: ignore
+
+    def as_dict(self) -> dict:
+        return {
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "partitions": len(self.partitions),
+            "source": self.source,
+            "missing": self.missing,
+        }
+
+
+def _cached(cache: OrderedDict, key, loader):
+    now = time.monotonic()
+    with _lock:
+        hit = cache.get(key)
+        if hit and now - hit[0] < PARTITION_CACHE_SECONDS:
+            cache.move_to_end(key)
+            return hit[1]
+    value = loader()
+    with _lock:
+        cache[key] = (now, value)
+        cache.move_to_end(key)
+        while len(cache) > PARTITION_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+    return value
+
+
+def get_partitions(database: str, table: str, column: str, values: list[str]) -> list[Partition]:
+    """
+    Particiones de Glue cuyo valor de `column` está en `values`.
+    Se pide el rango mínimo-máximo a Glue y se filtra localmente por los valores exactos.
+    """
+
+    if not values:
+        return []
+    wanted = set(values)
+
+    def load() -> list[Partition]:
+        paginator = aws_clients.get_client("glue").get_paginator("get_partitions")
+        expression = f"{column} BETWEEN '{min(values)}' AND '{max(values)}'"
+        found = []
+        for page in paginator.paginate(DatabaseName=database, TableName=table, Expression=expression):
+            for item in page.get("Partitions", []):
+                value = item["Values"][0]
+                if value not in wanted:
+                    continue
+                descriptor = item.get("StorageDescriptor", {})
+                parameters = {**descriptor.get("Parameters", {}), **item.get("Parameters", {})}
+                size = parameters.get("totalSize")
+                # numRows lo escriben ANALYZE/Hive; recordCount, los crawlers de Glue
+                rows = parameters.get("numRows") or parameters.get("recordCount")
+                found.append(Partition(
+                    value=value,
+                    location=descriptor.get("Location", ""),
+                    input_format=descriptor.get("InputFormat", ""),
+                    size_bytes=int(size) if size else None,
+                    rows=int(rows) if rows else None
+                ))
+        return found
+
+    return _cached(_partitions_cache, (database, table, column, tuple(sorted(wanted))), load)
+
+
+def _visible(path: str) -> bool:
+    # Athena ignora archivos que empiezan con "_" o "." (p. ej. _SUCCESS)
+    name = path.rstrip("/").rsplit("/", 1)[-1]
+    return not name.startswith(("_", "."))
+
+
+def list_files(location: str) -> tuple[list[str], int]:
+    """
+    Archivos de datos de una ubicación y su tamaño total.
+    Acepta ubicaciones s3:// y rutas locales (estas últimas para pruebas sin AWS).
+    """
+
+    def load() -> tuple[list[str], int]:
+        if not location.startswith("s3://"):
+            root = location.removeprefix("file://")
+            paths = [p for p in glob.glob(os.path.join(root, "**", "*"), recursive=True)
+                     if os.path.isfile(p) and _visible(p)]
+            return sorted(paths), sum(os.path.getsize(p) for p in paths)
+
+        parsed = urlparse(location)
+        prefix = parsed.path.lstrip("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        paginator = aws_clients.get_client("s3").get_paginator("list_objects_v2")
+        files, total = [], 0
+        for page in paginator.paginate(Bucket=parsed.netloc, Prefix=prefix):
+            for item in page.get("Contents", []):
+                if item["Size"] and _visible(item["Key"]):
+                    files.append(f"s3://{parsed.netloc}/{item['Key']}")
+                    total += item["Size"]
+        return files, total
+
+    return _cached(_listing_cache, location, load)
+
+
+def estimate_scan(database: str, table: str, column: str, values: list[str], with_files: bool = False) -> ScanEstimate:
+    """
+    Estima los bytes a escanear: estadísticas de Glue si existen, si no el listado de S3.
+    Args:
+        database (str): Base de datos de Glue.
+        table (str): Tabla.
+        column (str): Columna de partición.
+        values (list[str]): Valores de partición que lee la consulta.
+        with_files (bool): Listar también los archivos (necesario para leerlos fuera de Athena).
+    Returns:
+        ScanEstimate: Estimación con las particiones encontradas.
+    """
+
+    found = get_partitions(database, table, column, values)
+    present = {partition.value for partition in found}
+    total = 0
+    source = "glue"
+    files = {}
+    for partition in found:
+        if partition.size_bytes is not None and not with_files:
+            total += partition.size_bytes
+            continue
+        listed, size = list_files(partition.location)
+        files[partition.value] = listed
+        total += partition.size_bytes if partition.size_bytes is not None else size
+        if partition.size_bytes is None:
+            source = "s3"
+
+    return ScanEstimate(
+        partitions=found,
+        bytes=total,
+        source=source,
+        missing=sorted(set(values) - present),
+        files=files
+    )
@@ -0,0 +1,235 @@
+''' Diferencias entre dos períodos calculadas en el servidor '''
+
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+import aggregations
+
+# Máximo de filas de diferencia devueltas (los conteos por tipo de cambio siempre son completos)
+COMPARE_MAX_ROWS = int(os.getenv("COMPARE_MAX_ROWS", "1000"))
+
+# Tipos de cambio, en el orden en que se informan
+CHANGES = ("added", "removed", "changed")
+
+# Equivalente pandas de cada función de aggregations.METRIC_FUNCTIONS
+LOCAL_FUNCTIONS = {
+    "count": "count",
+    "count_distinct": "nunique",
+    "sum": "sum",
+    "avg": "mean",
+    "min": "min",
+    "max": "max",
+}
+
+
+def parse(
+    column_types: dict[str, str],
+    a: str,
+    b: str,
+    keys: list[str],
+    metrics: list[str]
+) -> tuple[str, str, list[str], list[tuple[str, str, str]]]:
+    """
+    Valida los períodos, claves y métricas de la comparación.
+    Returns:
+        tuple: Períodos normalizados, claves y métricas como (función, columna, alias).
+    """
+
+    a, _ = aggregations.parse_period_range(a, max_days=1)
+    b, _ = aggregations.parse_period_range(b, max_days=1)
+    if not keys:
+        raise ValueError("Indique al menos una columna clave, p. ej. ['id_cliente']")
+    if not metrics:
+        raise ValueError("Indique al menos una métrica, p. ej. 'sum(monto)' o 'count(*)'")
+
+    keys = list(dict.fromkeys(aggregations.check_column(key, column_types) for key in keys))
+    parsed = aggregations.parse_metrics(metrics, column_types)
+    return a, b, keys, [(function, column, alias) for alias, (function, column) in parsed.items()]
+
+
+def cache_key(table: str, a: str, b: str, keys: list[str], metrics: list[tuple[str, str, str]]) -> str:
+    spec = f"{table}|{a}|{b}|{','.join(keys)}|{','.join(alias for _, _, alias in metrics)}"
+    return f"compare_{hashlib.sha256(spec.encode()).hexdigest()[:32]}"
+
+
+def build_diff_query(database: str, table: str, a: str, b: str, keys: list[str],
+                     metrics: list[tuple[str, str, str]], partition_column: str = aggregations.PARTITION_COLUMN) -> str:
+    """
+    Una sola consulta: agrega cada período por clave y los cruza con FULL OUTER JOIN,
+    devolviendo solo las claves añadidas, eliminadas o con alguna métrica distinta.
+    """
+
+    quoted_keys = [f'"{key}"' for key in keys]
+    selected = ", ".join(
+        quoted_keys + [f'{aggregations.metric_expression(f, c)} AS "{alias}"' for f, c, alias in metrics]
+    )
+
+    def side(name: str, periodo: str) -> str:
+        return f"""{name} AS (
+        SELECT {selected}, 1 AS "__present"
+        FROM {database}.{table}
+        WHERE {partition_column} = '{periodo}'
+        GROUP BY {", ".join(quoted_keys)}
+    )"""
+
+    join = " AND ".join(f"a.{key} IS NOT DISTINCT FROM b.{key}" for key in quoted_keys)
+    changed = " OR ".join(f'a."{alias}" IS DISTINCT FROM b."{alias}"' for _, _, alias in metrics)
+    columns = [f"coalesce(a.{key}, b.{key}) AS {key}" for key in quoted_keys]
+    columns.append("""CASE WHEN a."__present" IS NULL THEN 'added'
+             WHEN b."__present" IS NULL THEN 'removed'
+             ELSE 'changed' END AS "change\"""")
+    for _, _, alias in metrics:
+        columns.append(f'a."{alias}" AS "{alias}_a"')
+        columns.append(f'b."{alias}" AS "{alias}_b"')
+
+    # Los conteos por tipo de cambio se agregan sobre toda la diferencia (no sobre la página truncada)
+    # y se adjuntan a cada fila; la página se ordena por clave para que el corte sea estable
+    counts = ", ".join(f"count(*) FILTER (WHERE \"change\" = '{change}') AS \"__{change}\"" for change in CHANGES)
+    order = ", ".join(quoted_keys)
+    return f"""
+    WITH {side("a", a)},
+    {side("b", b)},
+    diff AS (
+        SELECT {", ".join(columns)}
+        FROM a FULL OUTER JOIN b ON {join}
+        WHERE a."__present" IS NULL OR b."__present" IS NULL OR {changed}
+    ),
+    counts AS (
+        SELECT {counts}
+        FROM diff
+    ),
+    page AS (
+        SELECT *
+        FROM diff
+        ORDER BY {order}
+        LIMIT {COMPARE_MAX_ROWS + 1}
+    )
+    SELECT page.*, counts.*
+    FROM page CROSS JOIN counts
+    ORDER BY {order}
+    """
+
+
+def build_totals_query(database: str, table: str, a: str, b: str, metrics: list[tuple[str, str, str]],
+                       partition_column: str = aggregations.PARTITION_COLUMN) -> str:
+    """Métricas globales de cada período, para los deltas agregados"""
+    selected = ", ".join(f'{aggregations.metric_expression(f, c)} AS "{alias}"' for f, c, alias in metrics)
+    return f"""
+    SELECT {partition_column} AS "periodo", {selected}
+    FROM {database}.{table}
+    WHERE {partition_column} IN ('{a}', '{b}')
+    GROUP BY {partition_column}
+    """
+
+
+def _aggregate(df: pd.DataFrame, keys: list[str], metrics: list[tuple[str, str, str]]) -> pd.DataFrame:
+    named = {
+        alias: pd.NamedAgg(column=keys[0] if column == "*" else column,
+                           aggfunc="size" if column == "*" else LOCAL_FUNCTIONS[function])
+        for function, column, alias in metrics
+    }
+    return df.groupby(keys, dropna=False, observed=True).agg(**named).reset_index()
+
+
+def covers(df: pd.DataFrame, keys: list[str], metrics: list[tuple[str, str, str]]) -> bool:
+    """Indica si un resultado en caché tiene todas las columnas que usa la comparación"""
+    needed = set(keys) | {column for _, column, _ in metrics if column != "*"}
+    return needed.issubset(df.columns)
+
+
+def diff_frames(df_a: pd.DataFrame, df_b: pd.DataFrame, keys: list[str],
+                metrics: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """
+    Misma diferencia que build_diff_query, sobre dos resultados ya en caché (merge vectorizado).
+    Returns:
+        pd.DataFrame: Claves, tipo de cambio y métricas de cada período (sufijos _a y _b).
+    """
+
+    left = _aggregate(df_a, keys, metrics)
+    right = _aggregate(df_b, keys, metrics)
+    for key in keys:
+        # Claves categóricas con categorías distintas en cada período no se pueden cruzar directamente
+        if isinstance(left[key].dtype, pd.CategoricalDtype) or isinstance(right[key].dtype, pd.CategoricalDtype):
+            left[key] = left[key].astype(object)
+            right[key] = right[key].astype(object)
+
+    merged = left.merge(right, on=keys, how="outer", suffixes=("_a", "_b"), indicator=True)
+    changed = np.zeros(len(merged), dtype=bool)
+    for _, _, alias in metrics:
+        before, after = merged[f"{alias}_a"], merged[f"{alias}_b"]
+        changed |= ~((before == after).fillna(False).to_numpy(dtype=bool) | (before.isna() & after.isna()).to_numpy())
+
+    merged["change"] = np.select(
+        [merged["_merge"] == "right_only", merged["_merge"] == "left_only"], ["added", "removed"], "changed"
+    )
+    merged = merged[(merged["_merge"] != "both").to_numpy() | changed]
+    ordered = keys + ["change"] + [f"{alias}_{side}" for _, _, alias in metrics for side in ("a", "b")]
+    # Mismo orden que la página de build_diff_query
+    return merged[ordered].sort_values(keys, na_position="last", kind="stable").reset_index(drop=True)
+
+
+def totals_frames(df_a: pd.DataFrame, df_b: pd.DataFrame, a: str, b: str,
+                  metrics: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """Métricas globales de cada período calculadas sobre los resultados en caché"""
+    rows = []
+    for periodo, df in ((a, df_a), (b, df_b)):
+        row = {"periodo": periodo}
+        for function, column, alias in metrics:
+            row[alias] = len(df) if column == "*" else df[column].agg(LOCAL_FUNCTIONS[function])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _value(value):
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def report(diff: pd.DataFrame, totals: pd.DataFrame, a: str, b: str,
+           metrics: list[tuple[str, str, str]], source: str) -> dict:
+    """
+    Arma la respuesta: conteos por tipo de cambio, deltas agregados y las filas de diferencia.
+    Args:
+        diff (pd.DataFrame): Filas añadidas, eliminadas o cambiadas.
+        totals (pd.DataFrame): Métricas globales por período (columna 'periodo').
+        a (str): Período base.
+        b (str): Período comparado.
+        metrics (list): Métricas como (función, columna, alias).
+        source (str): Origen del cálculo ("cache" o "query": Athena o DuckDB según el enrutador).
+    Returns:
+        dict: Diferencia lista para serializar.
+    """
+
+    by_period = {str(row["periodo"]): row for row in totals.to_dict("records")}
+    deltas = {}
+    for _, _, alias in metrics:
+        before = _value(by_period.get(a, {}).get(alias))
+        after = _value(by_period.get(b, {}).get(alias))
+        delta = None if before is None or after is None else after - before
+        deltas[alias] = {
+            "a": before,
+            "b": after,
+            "delta": delta,
+            "delta_pct": round(delta / before * 100, 4) if delta is not None and before else None,
+        }
+
+    count_columns = [f"__{change}" for change in CHANGES]
+    if set(count_columns).issubset(diff.columns):
+        # Conteos de build_diff_query: completos aunque la página esté truncada
+        counts = {change: int(diff[f"__{change}"].iloc[0]) if len(diff) else 0 for change in CHANGES}
+        diff = diff.drop(columns=count_columns)
+    else:
+        counts = diff["change"].value_counts().to_dict()
+    rows = diff.head(COMPARE_MAX_ROWS).astype(object)
+    return {
+        "a": a,
+        "b": b,
+        "source": source,
+        "changes": {change: int(counts.get(change, 0)) for change in CHANGES},
+        "totals": deltas,
+        "truncated": len(diff) > COMPARE_MAX_ROWS,
+        "rows": rows.where(rows.notna(), None).to_dict("records"),
+    }
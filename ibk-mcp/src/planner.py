@@ -0,0 +1,118 @@
+''' Planificación previa de consultas: predicado de partición obligatorio y presupuesto de bytes escaneados '''
+
+import os
+import re
+import json
+import asyncio
+from dataclasses import dataclass
+from botocore.exceptions import BotoCoreError, ClientError
+
+import partitions
+
+# Máximo de bytes que una consulta puede escanear (0 desactiva el límite)
+QUERY_MAX_SCAN_BYTES = int(os.getenv("QUERY_MAX_SCAN_BYTES", str(10 * 1024 ** 3)))
+# Porcentaje mínimo al reducir una consulta a muestra; por debajo se rechaza
+PLANNER_MIN_SAMPLE_PERCENT = float(os.getenv("PLANNER_MIN_SAMPLE_PERCENT", "0.1"))
+
+stats = {"planned": 0, "over_budget": 0, "rejected": 0, "downgraded": 0, "unknown": 0, "not_found": 0}
+
+
+class QueryRejected(Exception):
+    """La consulta no pasó la planificación (sin predicado de partición o sobre el presupuesto)"""
+
+
+class PartitionNotFound(QueryRejected):
+    """Las particiones pedidas no están en Glue: la consulta solo devolvería un resultado vacío"""
+
+
+@dataclass
+class Plan:
+    """Resultado de la planificación: estimación y si la consulta excede el presupuesto"""
+    estimate: partitions.ScanEstimate | None
+    budget_bytes: int
+    action: str = "run"
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.budget_bytes) and self.estimate is not None and self.estimate.bytes > self.budget_bytes
+
+    def sample_percent(self) -> float | None:
+        """Porcentaje de muestreo que deja la consulta dentro del presupuesto, o None si sería demasiado pequeño"""
+        if not self.over_budget:
+            return 100.0
+        percent = round(self.budget_bytes / self.estimate.bytes * 100, 4)  # type: ignore
+        return percent if percent >= PLANNER_MIN_SAMPLE_PERCENT else None
+
+    def as_meta(self) -> dict:
+        return {
+            "scan_estimate": self.estimate.as_dict() if self.estimate else None,
+            "budget_bytes": self.budget_bytes,
+            "action": self.action,
+        }
+
+
+def has_partition_predicate(query: str, column: str) -> bool:
+    """Indica si la cláusula WHERE filtra por la columna de partición (=, IN o BETWEEN)"""
+    pattern = rf"\bWHERE\b.*\b{re.escape(column)}\b\s*(=|IN\b|BETWEEN\b)"
+    return re.search(pattern, query, flags=re.IGNORECASE | re.DOTALL) is not None
+
+
+async def preflight(query: str, database: str, table: str, column: str, values: list[str],
+                    budget_bytes: int | None = None, require_all: bool = True) -> Plan:
+    """
+    Valida la consulta y estima lo que escaneará antes de enviarla.
+    Args:
+        query (str): Consulta SQL generada por la herramienta.
+        database (str): Base de datos de Glue.
+        table (str): Tabla consultada.
+        column (str): Columna de partición.
+        values (list[str]): Valores de partición que lee la consulta.
+        budget_bytes (int | None): Presupuesto de la tabla (None: QUERY_MAX_SCAN_BYTES).
+        require_all (bool): Exigir todas las particiones; con False (rangos) basta con que exista alguna.
+    Returns:
+        Plan: Estimación (None si no se pudo obtener) y presupuesto aplicable.
+    Raises:
+        QueryRejected: Si la consulta no filtra por la columna de partición.
+        PartitionNotFound: Si faltan en Glue las particiones pedidas.
+    """
+
+    stats["planned"] += 1
+    if not has_partition_predicate(query, column) or not values:
+        stats["rejected"] += 1
+        raise QueryRejected(f"La consulta debe filtrar por la columna de partición {column}")
+
+    try:
+        estimate = await asyncio.to_thread(partitions.estimate_scan, database, table, column, values)
+    except (ClientError, BotoCoreError) as e:
+        # Sin metadatos no se bloquea la consulta: el límite de Athena por workgroup sigue aplicando
+        stats["unknown"] += 1
+        print(f"Scan estimate unavailable for {table}: {e}")
+        estimate = None
+
+    if estimate is not None and estimate.missing and (require_all or not estimate.partitions):
+        stats["not_found"] += 1
+        raise PartitionNotFound(f"Partición no encontrada en {table}: {', '.join(estimate.missing)}")
+
+    plan = Plan(estimate=estimate, budget_bytes=QUERY_MAX_SCAN_BYTES if budget_bytes is None else budget_bytes)
+    if plan.over_budget:
+        stats["over_budget"] += 1
+    print(f"Query plan: {json.dumps({'table': table, 'partitions': len(values), **plan.as_meta()})}")
+    return plan
+
+
+def reject(plan: Plan, suggestion: str) -> QueryRejected:
+    """Marca el plan como rechazado y construye el error con el motivo y una alternativa"""
+    plan.action = "rejected"
+    stats["rejected"] += 1
+    return QueryRejected(
+        f"La consulta escanearía ~{plan.estimate.bytes} bytes, sobre el máximo de {plan.budget_bytes}. {suggestion}"  # type: ignore
+    )
+
+
+def downgrade(plan: Plan, action: str):
+    plan.action = action
+    stats["downgraded"] += 1
+
+
+def snapshot() -> dict:
+    return {**stats, "budget_bytes": QUERY_MAX_SCAN_BYTES}
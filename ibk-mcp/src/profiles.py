@@ -0,0 +1,65 @@
+''' Lectura de perfiles precalculados por cliente (DynamoDB), cargados por el pipeline de ETL '''
+
+import os
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+from resilience import breakers
+
+# Tabla creada por el stack de ETL (salida ProfileTableName); vacía desactiva get_profile
+PROFILE_TABLE_NAME = os.getenv("PROFILE_TABLE_NAME", "")
+
+profile_table = aws_clients.get_resource("dynamodb", fast=True).Table(PROFILE_TABLE_NAME) if PROFILE_TABLE_NAME else None
+breaker = breakers["dynamodb"]
+stats = {"lookups": 0, "found": 0, "errors": 0}
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def get_profile(key: str, as_of: str | None = None) -> dict | None:
+    """
+    Perfil más reciente del cliente (o el vigente a una fecha de corte).
+    Es una sola lectura por clave: la tabla guarda una fotografía por cliente y fecha de corte.
+    Args:
+        key (str): Identificador del cliente.
+        as_of (str | None): Fecha de corte máxima ('YYYY-MM-DD'); None para la última disponible.
+    Returns:
+        dict | None: Perfil con sus ventanas móviles, o None si el cliente no tiene perfil.
+    Raises:
+        CircuitOpenError: Si DynamoDB está marcada como caída.
+        ClientError | BotoCoreError: Si DynamoDB falla.
+    """
+
+    stats["lookups"] += 1
+    breaker.check()
+    condition = Key("customer_key").eq(key)
+    if as_of:
+        condition = condition & Key("as_of").lte(as_of)
+
+    try:
+        response = profile_table.query(  # type: ignore
+            KeyConditionExpression=condition,
+            ScanIndexForward=False,
+            Limit=1
+        )
+        breaker.record_success()
+    except (ClientError, BotoCoreError):
+        breaker.record_failure()
+        stats["errors"] += 1
+        raise
+
+    items = response.get("Items", [])
+    if not items:
+        return None
+    stats["found"] += 1
+    return {name: _plain(value) for name, value in items[0].items() if name != "ttl"}
+
+
+def snapshot() -> dict:
+    return {**stats, "enabled": profile_table is not None}
@@ -0,0 +1,138 @@
+''' Pool de procesos para renderizar resultados grandes fuera del intérprete principal '''
+
+import os
+import sys
+import asyncio
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+
+import formats
+import render_worker
+
+# Procesos de render; 0 desactiva el pool y todo se renderiza en hilos del proceso principal.
+# Lambda no tiene /dev/shm (ni semáforos ni memoria compartida), así que allí el pool no se usa
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", "0" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "2"))
+# Por debajo de este tamaño (Arrow IPC) el coste de enviar al pool no compensa
+RENDER_POOL_MIN_BYTES = int(os.getenv("RENDER_POOL_MIN_BYTES", str(512 * 1024)))
+# Veces que el pool puede romperse (y recrearse) antes de desactivarlo
+RENDER_POOL_MAX_FAILURES = int(os.getenv("RENDER_POOL_MAX_FAILURES", "3"))
+
+_executor: ProcessPoolExecutor | None = None
+_unavailable = RENDER_POOL_WORKERS <= 0
+_slots: asyncio.Semaphore | None = None
+_lock = threading.Lock()
+stats = {"in_process": 0, "pooled": 0, "pool_errors": 0, "pool_broken": 0}
+
+
+def _start_workers(executor: ProcessPoolExecutor):
+    """
+    Crea todos los procesos del pool de una vez. Con spawn cada hijo vuelve a importar el
+    __main__ del padre (server.py como __mp_main__, con sus clientes AWS y el servidor MCP);
+    mientras arrancan, __main__ apunta a render_worker, que solo importa formats.
+    El executor crea un proceso por tarea enviada mientras no haya uno libre, así que
+    enviar una tarea vacía por proceso los arranca todos aquí y no más tarde, bajo demanda
+    y fuera de este cambio de __main__. Se llama con `_lock` tomado.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = render_worker
+    try:
+        for _ in range(RENDER_POOL_WORKERS):
+            executor.submit(render_worker.ready)
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    """Crea el pool bajo demanda; si el entorno no lo soporta se desactiva"""
+    global _executor, _unavailable, _slots  # pylint: disable=global-statement
+    if _unavailable:
+        return None
+
+    with _lock:
+        if _executor is None:
+            try:
+                # spawn evita heredar hilos y sockets del servidor en los hijos
+                executor = ProcessPoolExecutor(
+                    max_workers=RENDER_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                _start_workers(executor)
+                _executor = executor
+                _slots = asyncio.Semaphore(RENDER_POOL_WORKERS * 2)
+            except (OSError, NotImplementedError, PermissionError) as e:
+                # Sin /dev/shm (p. ej. Lambda) no hay semáforos ni memoria compartida
+                print(f"Render pool unavailable, rendering in-process: {e}")
+                _unavailable = True
+                return None
+
+    return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """
+    Un pool roto rechaza todas las tareas siguientes: se descarta para recrearlo en el
+    próximo render, salvo que se haya roto demasiadas veces y quede desactivado.
+    """
+    global _executor, _unavailable  # pylint: disable=global-statement
+    executor.shutdown(wait=False, cancel_futures=True)
+    with _lock:
+        if _executor is executor:
+            _executor = None
+        stats["pool_broken"] += 1
+        if stats["pool_broken"] >= RENDER_POOL_MAX_FAILURES:
+            print("Render pool broke too many times, rendering in-process from now on")
+            _unavailable = True
+
+
+async def _render_in_pool(executor: ProcessPoolExecutor, payload: bytes, fmt: str) -> str:
+    async with _slots:  # type: ignore
+        block = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        try:
+            block.buf[:len(payload)] = payload
+            future = executor.submit(render_worker.render_shared, block.name, len(payload), fmt)
+            return await asyncio.wrap_future(future)
+        finally:
+            block.close()
+            block.unlink()
+
+
+async def render(df: pd.DataFrame | None, payload: bytes, fmt: str) -> str:
+    """
+    Renderiza un resultado: en el proceso principal si es pequeño, en el pool si es grande.
+    Args:
+        df (pd.DataFrame | None): DataFrame ya materializado, si se tiene (evita decodificar).
+        payload (bytes): El mismo resultado en Arrow IPC (formato de la caché).
+        fmt (str): Formato de salida (ver formats.FORMATS).
+    Returns:
+        str: Resultado renderizado.
+    """
+
+    if len(payload) >= RENDER_POOL_MIN_BYTES:
+        executor = _get_executor()
+        if executor is not None:
+            try:
+                result = await _render_in_pool(executor, payload, fmt)
+                stats["pooled"] += 1
+                return result
+            except BrokenProcessPool as e:
+                # Un hijo murió (p. ej. por memoria) y el pool ya no acepta tareas
+                stats["pool_errors"] += 1
+                print(f"Render pool broken, rendering in-process: {e}")
+                _discard_executor(executor)
+            except (OSError, RuntimeError) as e:
+                # Fallo de esta tarea (p. ej. sin memoria compartida): se sigue en el proceso principal
+                stats["pool_errors"] += 1
+                print(f"Render pool error, rendering in-process: {e}")
+
+    stats["in_process"] += 1
+    if df is None:
+        df = await asyncio.to_thread(formats.from_payload, payload)
+    return await asyncio.to_thread(formats.render, df, fmt)
+
+
+def snapshot() -> dict:
+    return {**stats, "enabled": not _unavailable, "workers": RENDER_POOL_WORKERS}
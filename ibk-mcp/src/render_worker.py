@@ -0,0 +1,38 @@
+''' Código que ejecutan los procesos del pool de render; solo importa formats para que los hijos arranquen ligeros '''
+
+from multiprocessing import shared_memory
+import pandas as pd
+import pyarrow as pa
+
+import formats
+
+
+def _read_shared(block: shared_memory.SharedMemory, size: int) -> pd.DataFrame:
+    # Todas las referencias de Arrow al bloque deben soltarse antes de cerrarlo;
+    # el payload va comprimido, así que el DataFrame resultante no apunta al bloque
+    view = block.buf[:size]
+    buffer = pa.py_buffer(view)
+    with pa.ipc.open_stream(buffer) as reader:
+        table = reader.read_all()
+    df = table.to_pandas()
+    del table, reader, buffer
+    view.release()
+    return df
+
+
+def ready():
+    """Tarea vacía con la que el pool arranca sus procesos"""
+
+
+def render_shared(name: str, size: int, fmt: str) -> str:
+    """
+    Se ejecuta en el proceso hijo: lee el Arrow IPC directamente de la memoria
+    compartida (sin copiar ni deserializar un DataFrame con pickle) y lo renderiza.
+    """
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        df = _read_shared(block, size)
+    finally:
+        block.close()
+    return formats.render(df, fmt)
@@ -0,0 +1,116 @@
+''' Circuit breakers por dependencia y presupuestos de tiempo por petición '''
+
+import os
+import time
+import threading
+
+# Presupuesto total de una petición; por debajo del timeout de 5 minutos de la Lambda
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "270"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(Exception):
+    """La dependencia está marcada como caída y no se intenta la llamada"""
+
+
+class DeadlineExceeded(Exception):
+    """El presupuesto de tiempo de la petición se agotó"""
+
+
+class Deadline:
+    """Instante límite de una petición, propagado a cada llamada a AWS"""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Segundos restantes (nunca negativos)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout para una llamada: el menor entre `cap` y el tiempo restante"""
+        return min(cap, self.remaining())
+
+    def check(self, operation: str):
+        """Lanza DeadlineExceeded si ya no queda tiempo para `operation`"""
+        if self.expired():
+            raise DeadlineExceeded(f"Tiempo agotado antes de {operation}")
+
+
+class CircuitBreaker:
+    """
+    Breaker clásico cerrado / abierto / semiabierto.
+    Tras `failure_threshold` fallos seguidos se abre y rechaza llamadas durante
+    `reset_seconds`; después deja pasar una sola llamada de prueba.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar a la dependencia ahora"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def check(self):
+        """Lanza CircuitOpenError si el breaker no permite la llamada"""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuito abierto para {self.name}")
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.stats["opened"] += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def abandon(self):
+        """La llamada no llegó a la dependencia: libera la prueba semiabierta sin decidir"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, **self.stats}
+
+
+breakers = {
+    "dynamodb": CircuitBreaker("dynamodb"),
+    "athena": CircuitBreaker("athena"),
+}
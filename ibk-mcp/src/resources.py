@@ -0,0 +1,81 @@
+''' Períodos como recursos MCP (ibk://{table}/{periodo}) con ETag y avisos de cambio '''
+
+import json
+import weakref
+import threading
+from pydantic import AnyUrl
+
+# Plantillas de URI: el recurso y su revalidación condicionada al ETag que el cliente ya tiene
+PERIOD_URI = "ibk://{table}/{periodo}"
+PERIOD_IF_NONE_MATCH_URI = "ibk://{table}/{periodo}/{etag}"
+MIME_TYPE = "application/json"
+
+_lock = threading.Lock()
+# Último ETag servido o guardado por URI, para detectar cambios de contenido
+_etags: dict[str, str] = {}
+# Sesiones que leyeron cada URI: reciben notifications/resources/updated cuando cambia
+_watchers: dict[str, weakref.WeakSet] = {}
+stats = {"reads": 0, "not_modified": 0, "notifications": 0, "notification_errors": 0}
+
+
+def period_uri(table: str, periodo: str) -> str:
+    return PERIOD_URI.format(table=table, periodo=periodo)
+
+
+def watch(uri: str, session):
+    """Registra la sesión para avisarle cuando el contenido del recurso cambie (solo en este proceso)"""
+    if session is None:
+        return
+    with _lock:
+        _watchers.setdefault(uri, weakref.WeakSet()).add(session)
+
+
+def document(uri: str, etag: str, rows: int | None, expires_at: int, data: str | None) -> str:
+    """
+    Contenido del recurso: ETag y metadatos, y los datos en JSON columnar salvo que el cliente
+    ya tenga esa versión (`data` None), en cuyo caso solo se confirma que no cambió.
+    """
+
+    header = {"uri": uri, "etag": etag, "rows": rows, "expires_at": expires_at, "not_modified": data is None}
+    if data is None:
+        stats["not_modified"] += 1
+        return json.dumps(header)
+    stats["reads"] += 1
+    return json.dumps(header)[:-1] + f', "data": {data}}}'
+
+
+async def _notify(uri: str):
+    with _lock:
+        sessions = list(_watchers.get(uri, ()))
+    for session in sessions:
+        try:
+            await session.send_resource_updated(AnyUrl(uri))
+            stats["notifications"] += 1
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Sesión cerrada: deja de recibir avisos
+            stats["notification_errors"] += 1
+            print(f"Resource notification failed for {uri}: {e}")
+            with _lock:
+                _watchers.get(uri, weakref.WeakSet()).discard(session)
+
+
+async def publish(uri: str, etag: str):
+    """Registra la versión vigente del recurso y avisa a quienes lo leyeron si cambió"""
+    with _lock:
+        previous = _etags.get(uri)
+        _etags[uri] = etag
+    if previous is not None and previous != etag:
+        await _notify(uri)
+
+
+async def invalidate(uri: str):
+    """El recurso dejó de ser válido (entrada de caché borrada): se avisa a quienes lo leyeron"""
+    with _lock:
+        _etags.pop(uri, None)
+    await _notify(uri)
+
+
+def snapshot() -> dict:
+    with _lock:
+        watched = sum(len(sessions) for sessions in _watchers.values())
+        return {**stats, "tracked": len(_etags), "watchers": watched}
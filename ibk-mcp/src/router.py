@@ -0,0 +1,166 @@
+''' Enrutador de consultas: DuckDB en proceso para particiones pequeñas, Athena para el resto '''
+
+import os
+import json
+import asyncio
+import threading
+from dataclasses import dataclass
+import pandas as pd
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+import partitions
+from resilience import Deadline, DeadlineExceeded
+
+try:
+    import duckdb
+except ImportError:  # DuckDB es opcional: sin él todo va a Athena
+    duckdb = None
+
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() == "true"
+# Por debajo de este volumen estimado la consulta se resuelve con DuckDB leyendo los archivos directamente
+ROUTER_DUCKDB_MAX_BYTES = int(os.getenv("ROUTER_DUCKDB_MAX_BYTES", str(64 * 1024 * 1024)))
+DUCKDB_MAX_CONCURRENCY = int(os.getenv("DUCKDB_MAX_CONCURRENCY", "2"))
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "2"))
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "512MB")
+# Directorio de trabajo de DuckDB (por defecto usaría ~/.duckdb); en Lambda solo /tmp admite escritura
+DUCKDB_HOME = os.getenv("DUCKDB_HOME", "/tmp/duckdb")
+# Extensiones (httpfs); puede apuntar a un directorio incluido en la imagen para no descargarlas
+DUCKDB_EXTENSION_DIRECTORY = os.getenv("DUCKDB_EXTENSION_DIRECTORY", os.path.join(DUCKDB_HOME, "extensions"))
+
+_slots = threading.BoundedSemaphore(DUCKDB_MAX_CONCURRENCY)
+stats = {"athena": 0, "duckdb": 0, "duckdb_fallbacks": 0}
+
+
+@dataclass
+class Route:
+    """Decisión de enrutamiento de una consulta"""
+    engine: str
+    reason: str
+    estimate: partitions.ScanEstimate | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "engine": self.engine,
+            "reason": self.reason,
+            **({"scan": self.estimate.as_dict()} if self.estimate else {}),
+        }
+
+
+def _decide(database: str, table: str, column: str, values: list[str]) -> Route:
+    if not QUERY_ROUTER_ENABLED or duckdb is None:
+        return Route("athena", "router disabled" if duckdb is not None else "duckdb not installed")
+
+    estimate = partitions.estimate_scan(database, table, column, values)
+    if estimate.missing:
+        return Route("athena", f"partitions not in Glue: {', '.join(estimate.missing)}", estimate)
+    if estimate.bytes > ROUTER_DUCKDB_MAX_BYTES:
+        return Route("athena", f"scan above {ROUTER_DUCKDB_MAX_BYTES} bytes", estimate)
+    for partition in estimate.partitions:
+        if "parquet" not in partition.input_format.lower():
+            return Route("athena", f"partition {partition.value} is not Parquet", estimate)
+        if f"{column}=" not in partition.location:
+            # DuckDB obtiene la columna de partición de la ruta (estilo Hive)
+            return Route("athena", f"partition {partition.value} location is not Hive-style", estimate)
+
+    # Solo ahora se listan los archivos (DuckDB los necesita; para estimar bastaban las estadísticas)
+    estimate = partitions.estimate_scan(database, table, column, values, with_files=True)
+    if estimate.bytes > ROUTER_DUCKDB_MAX_BYTES:
+        return Route("athena", f"scan above {ROUTER_DUCKDB_MAX_BYTES} bytes", estimate)
+    return Route("duckdb", f"scan within {ROUTER_DUCKDB_MAX_BYTES} bytes", estimate)
+
+
+async def route(database: str, table: str, column: str, values: list[str]) -> Route:
+    """
+    Elige el motor para una consulta sobre las particiones `values` de la tabla y registra la decisión.
+    Si los metadatos no se pueden leer, la consulta va a Athena.
+    """
+
+    try:
+        decision = await asyncio.to_thread(_decide, database, table, column, values)
+    except (ClientError, BotoCoreError) as e:
+        decision = Route("athena", f"scan estimate failed: {e}")
+
+    stats[decision.engine] += 1
+    print(f"Query routing: {json.dumps({'table': table, 'partitions': len(values), **decision.as_dict()})}")
+    return decision
+
+
+def _literal(value: str) -> str:
+    """Literal SQL de texto (CREATE VIEW y CREATE SECRET no admiten parámetros preparados)"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _configure_s3(connection):
+    """Credenciales de la sesión boto3 para que DuckDB lea S3 (extensión httpfs)"""
+    session = aws_clients.get_session()
+    credentials = session.get_credentials()
+    if credentials is None:
+        return
+    frozen = credentials.get_frozen_credentials()
+    try:
+        connection.execute("LOAD httpfs")
+    except duckdb.Error:  # type: ignore
+        # Aún no está en DUCKDB_EXTENSION_DIRECTORY: se descarga una vez por instancia
+        connection.execute("INSTALL httpfs; LOAD httpfs;")
+    connection.execute(
+        f"CREATE SECRET (TYPE s3, KEY_ID {_literal(frozen.access_key)}, SECRET {_literal(frozen.secret_key)}, "
+        f"SESSION_TOKEN {_literal(frozen.token or '')}, REGION {_literal(session.region_name or 'us-east-1')})"
+    )
+
+
+def _execute(connection, query: str, database: str, table: str, files: list[str]) -> pd.DataFrame:
+    # La conexión se cierra en el mismo hilo que la usa, también tras una interrupción
+    with _slots, connection:
+        connection.execute(f"SET threads = {DUCKDB_THREADS}")
+        connection.execute(f"SET memory_limit = '{DUCKDB_MEMORY_LIMIT}'")
+        # Por defecto INSTALL escribe en ~/.duckdb y los desbordes en el directorio actual (no escribibles en Lambda)
+        os.makedirs(DUCKDB_HOME, exist_ok=True)
+        connection.execute(f"SET home_directory = {_literal(DUCKDB_HOME)}")
+        connection.execute(f"SET extension_directory = {_literal(DUCKDB_EXTENSION_DIRECTORY)}")
+        connection.execute(f"SET temp_directory = {_literal(os.path.join(DUCKDB_HOME, 'tmp'))}")
+        if any(path.startswith("s3://") for path in files):
+            _configure_s3(connection)
+
+        # La tabla se expone como vista con el mismo nombre calificado, así la consulta de Athena no cambia
+        connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{database}"')
+        connection.execute(
+            f'CREATE VIEW "{database}"."{table}" AS SELECT * FROM read_parquet([{", ".join(map(_literal, files))}], '
+            'hive_partitioning = true, hive_types_autocast = false, union_by_name = true)'
+        )
+        return connection.execute(query).df()
+
+
+async def run_duckdb(query: str, database: str, table: str, decision: Route,
+                     deadline: Deadline) -> pd.DataFrame | None:
+    """
+    Ejecuta la consulta en DuckDB sobre los archivos de las particiones elegidas.
+    Si se agota el presupuesto de la petición, la consulta se interrumpe.
+    Returns:
+        pd.DataFrame | None: Resultado, o None si DuckDB falló y la consulta debe ir a Athena.
+    Raises:
+        DeadlineExceeded: Si la consulta no termina antes del límite.
+    """
+
+    files = [path for listed in decision.estimate.files.values() for path in listed]  # type: ignore
+    connection = duckdb.connect()  # type: ignore
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(_execute, connection, query, database, table, files),
+            timeout=deadline.remaining()
+        )
+    except asyncio.TimeoutError as e:
+        connection.interrupt()
+        raise DeadlineExceeded("Tiempo agotado en la consulta DuckDB") from e
+    except asyncio.CancelledError:
+        connection.interrupt()
+        raise
+    except (duckdb.Error, OSError) as e:  # type: ignore
+        # Extensión httpfs no disponible, archivo ilegible, SQL no soportado por DuckDB...
+        stats["duckdb_fallbacks"] += 1
+        print(f"DuckDB query failed, falling back to Athena: {e}")
+        return None
+
+
+def snapshot() -> dict:
+    return {**stats, "enabled": QUERY_ROUTER_ENABLED and duckdb is not None, "duckdb_max_bytes": ROUTER_DUCKDB_MAX_BYTES}
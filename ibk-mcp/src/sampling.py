@@ -0,0 +1,81 @@
+''' Muestras representativas de filas por período '''
+
+import os
+import pandas as pd
+
+import aggregations
+
+# Porcentaje de filas que TABLESAMPLE BERNOULLI deja pasar si Glue no tiene el número de filas de la partición
+SAMPLE_PERCENT = float(os.getenv("SAMPLE_PERCENT", "1"))
+# Filas que Athena puede devolver por cada fila pedida; la muestra final se elige localmente con la semilla
+SAMPLE_OVERSAMPLE = int(os.getenv("SAMPLE_OVERSAMPLE", "20"))
+SAMPLE_MAX_ROWS = int(os.getenv("SAMPLE_MAX_ROWS", "1000"))
+# Porcentaje mínimo: en particiones enormes el cálculo se redondearía a 0 y TABLESAMPLE (0.0) no devuelve filas
+SAMPLE_MIN_PERCENT = float(os.getenv("SAMPLE_MIN_PERCENT", "0.0001"))
+
+
+def validate(periodo: str, n: int) -> str:
+    """Valida el período (un solo día) y el tamaño de la muestra; devuelve el período normalizado"""
+    if not 0 < n <= SAMPLE_MAX_ROWS:
+        raise ValueError(f"Tamaño de muestra inválido: {n}. Use un valor entre 1 y {SAMPLE_MAX_ROWS}")
+    start, _ = aggregations.parse_period_range(periodo, max_days=1)
+    return start
+
+
+def cache_key(periodo: str, n: int, seed: int) -> str:
+    return f"sample_{periodo}_{n}_{seed}"
+
+
+def sampled_select(database: str, table: str, periodo: str, percent: float, method: str = "BERNOULLI",
+                   partition_column: str = aggregations.PARTITION_COLUMN, columns: str = "*") -> str:
+    """
+    SELECT muestreado (todas las columnas o las de `columns`) sobre la partición del período.
+    BERNOULLI elige filas (pero Athena lee toda la partición); SYSTEM elige bloques y reduce lo escaneado.
+    """
+
+    sample = f" TABLESAMPLE {method} ({percent})" if percent < 100 else ""
+    return f"""
+    SELECT {columns}
+    FROM {database}.{table}{sample}
+    WHERE {partition_column} = '{periodo}'
+    """
+
+
+def sample_percent(n: int, rows: int | None, percent: float = SAMPLE_PERCENT) -> float:
+    """
+    Porcentaje de muestreo para obtener unas n * SAMPLE_OVERSAMPLE filas de una partición de `rows` filas.
+    Sin el número de filas (estadísticas de Glue) se usa `percent`. Nunca baja de SAMPLE_MIN_PERCENT.
+    """
+
+    if not rows:
+        return percent
+    return min(100.0, max(SAMPLE_MIN_PERCENT, round(n * SAMPLE_OVERSAMPLE / rows * 100, 4)))
+
+
+def build_query(database: str, table: str, periodo: str, n: int, percent: float = SAMPLE_PERCENT,
+                method: str = "BERNOULLI", partition_column: str = aggregations.PARTITION_COLUMN,
+                columns: str = "*") -> str:
+    """
+    Consulta de muestra sobre la partición del período (sin TABLESAMPLE si `percent` es 100).
+    Athena no admite semilla en el muestreo: el determinismo lo da la caché de la muestra.
+    """
+
+    query = sampled_select(database, table, periodo, percent, method, partition_column, columns)
+    # Un LIMIT sin orden se quedaría con las primeras filas de los archivos; rand() lo hace uniforme
+    return query + f"ORDER BY rand()\n    LIMIT {n * SAMPLE_OVERSAMPLE}\n    "
+
+
+def shortfall(rows: int, n: int) -> str:
+    """Aviso para anteponer a la respuesta si la muestra tiene menos filas de las pedidas"""
+    return f"[Muestra de {rows} filas; se pidieron {n}]\n" if rows < n else ""
+
+
+def reservoir(df: pd.DataFrame, n: int, seed: int) -> pd.DataFrame:
+    """
+    Muestra uniforme sin reemplazo de `n` filas, reproducible con `seed`.
+    Sobre un resultado ya materializado equivale al muestreo de reservorio, sin recorrer fila a fila.
+    """
+
+    if len(df) <= n:
+        return df.reset_index(drop=True)
+    return df.sample(n=n, random_state=seed).sort_index().reset_index(drop=True)
@@ -0,0 +1,132 @@
+''' Materialización de resultados con tipos derivados del esquema de Glue '''
+
+import os
+import json
+import threading
+from typing import Iterable
+import pandas as pd
+
+import glue_catalog
+
+# Backend de tipos para leer resultados: "numpy_nullable" o "pyarrow"
+ATHENA_DTYPE_BACKEND = os.getenv("ATHENA_DTYPE_BACKEND", "numpy_nullable")
+# Filas por bloque al materializar; cada bloque se compacta antes de leer el siguiente
+MATERIALIZE_CHUNK_ROWS = int(os.getenv("MATERIALIZE_CHUNK_ROWS", "50000"))
+# Un texto pasa a categórico si sus valores distintos no superan esta fracción de las filas
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", "0.5"))
+# Reducir double a float32 pierde precisión (p. ej. en `monto`), por eso es opcional
+DOWNCAST_FLOATS = os.getenv("DOWNCAST_FLOATS", "false").lower() == "true"
+
+INTEGER_TYPES = ("tinyint", "smallint", "int", "integer", "bigint")
+FLOAT_TYPES = ("float", "double", "real")
+STRING_TYPES = ("string", "varchar", "char")
+
+_lock = threading.Lock()
+memory_stats = {"queries": 0, "bytes_before": 0, "bytes_after": 0}
+
+
+def table_types(database: str, table: str) -> dict[str, str]:
+    """Columnas y tipos Athena de la tabla según el catálogo de Glue (caché en proceso)"""
+    return glue_catalog.schemas.get(database, table).columns
+
+
+def base_type(athena_type: str) -> str:
+    return athena_type.split("(")[0].strip().lower()
+
+
+def plan_dtypes(sample: pd.DataFrame, column_types: dict[str, str]) -> dict[str, str]:
+    """
+    Decide la conversión de cada columna a partir del esquema y de un bloque de muestra.
+    Returns:
+        dict: Columna -> "integer", "float" o "category".
+    """
+
+    plan = {}
+    rows = max(len(sample), 1)
+    for column in sample.columns:
+        base = base_type(column_types.get(column, ""))
+        if base in INTEGER_TYPES:
+            plan[column] = "integer"
+        elif base in FLOAT_TYPES and DOWNCAST_FLOATS:
+            plan[column] = "float"
+        elif base in STRING_TYPES and sample[column].nunique(dropna=True) / rows <= CATEGORY_MAX_RATIO:
+            plan[column] = "category"
+    return plan
+
+
+def apply_plan(df: pd.DataFrame, plan: dict[str, str]) -> pd.DataFrame:
+    """Aplica el plan de tipos a un bloque"""
+    for column, target in plan.items():
+        if column not in df.columns:
+            continue
+        if target == "category":
+            df[column] = df[column].astype("category")
+        else:
+            df[column] = pd.to_numeric(df[column], downcast=target)  # type: ignore
+    return df
+
+
+def _concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena bloques conservando los categóricos (unifica sus categorías)"""
+    if len(frames) == 1:
+        return frames[0]
+
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            categories = pd.Index([])
+            for frame in frames:
+                categories = categories.union(frame[column].cat.categories)
+            for frame in frames:
+                frame[column] = frame[column].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def materialize(chunks: Iterable[pd.DataFrame], column_types: dict[str, str],
+                columns: list[str] | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Construye el DataFrame bloque a bloque, compactando cada uno según el esquema,
+    de modo que el pico de memoria es el resultado compacto más un bloque.
+    Args:
+        chunks (Iterable[pd.DataFrame]): Bloques leídos de Athena.
+        column_types (dict): Tipos Athena por columna (Glue).
+        columns (list[str] | None): Columnas seleccionadas por la consulta, para el resultado
+            vacío (sin bloques). Si no se indican se usan todas las de la tabla.
+    Returns:
+        tuple: DataFrame compacto y reporte de memoria de la consulta.
+    """
+
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+
+    frames = []
+    plan = None
+    bytes_before = 0
+    for chunk in chunks:
+        bytes_before += int(chunk.memory_usage(deep=True).sum())
+        if plan is None:
+            plan = plan_dtypes(chunk, column_types)
+        frames.append(apply_plan(chunk, plan))
+
+    df = _concat(frames) if frames else pd.DataFrame(columns=list(column_types) if columns is None else columns)
+    bytes_after = int(df.memory_usage(deep=True).sum())
+    report = {
+        "rows": len(df),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_saved": bytes_before - bytes_after,
+        "categories": sorted(c for c, t in (plan or {}).items() if t == "category"),
+    }
+
+    with _lock:
+        memory_stats["queries"] += 1
+        memory_stats["bytes_before"] += bytes_before
+        memory_stats["bytes_after"] += bytes_after
+
+    print(f"Memory report: {json.dumps(report)}")
+    return df, report
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {**memory_stats, "bytes_saved": memory_stats["bytes_before"] - memory_stats["bytes_after"]}
@@ -0,0 +1,317 @@
+''' Índice invertido sobre las columnas de texto de un período en caché, para búsquedas sin releer la partición '''
+
+import io
+import os
+import re
+import glob
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws_clients
+import formats
+
+# Nivel local: índices ya construidos en el disco efímero de la instancia
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "/tmp/ibk-mcp-search")
+# Máximo de índices en disco; al superarlo se borran los más antiguos
+SEARCH_INDEX_MAX_FILES = int(os.getenv("SEARCH_INDEX_MAX_FILES", "64"))
+# Nivel compartido (opcional): s3://bucket/prefijo, para que otras instancias no reconstruyan el índice
+SEARCH_INDEX_S3_URI = os.getenv("SEARCH_INDEX_S3_URI", "")
+# Períodos cuyo índice y filas se mantienen decodificados en memoria
+SEARCH_INDEX_MEMORY_ENTRIES = int(os.getenv("SEARCH_INDEX_MEMORY_ENTRIES", "8"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+
+_TOKEN = re.compile(r"\w+")
+# Los términos de campo se guardan como "columna:token"; los globales, solo "token"
+_FIELD_SEPARATOR = ":"
+# Partes de una consulta: [campo:]valor, donde el valor puede ir entre comillas ('nombre:"juan perez"')
+_QUERY_PART = re.compile(r'(?:([^\s:"]+):)?(?:"([^"]*)"?|(\S+))')
+
+stats = {"memory_hits": 0, "disk_hits": 0, "s3_hits": 0, "builds": 0, "searches": 0, "tier_errors": 0}
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokens en minúsculas y sin tildes, para que 'Perú' y 'peru' coincidan"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN.findall(text)
+
+
+def _text_columns(df: pd.DataFrame) -> list[str]:
+    return [
+        column for column in df.columns
+        if isinstance(df[column].dtype, pd.CategoricalDtype)
+        or pd.api.types.is_string_dtype(df[column].dtype)
+    ]
+
+
+def _column_postings(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Pares (término, fila) de una columna; se tokeniza cada valor distinto una sola vez"""
+    codes, uniques = pd.factorize(df[column])
+    pairs = []
+    for code, value in enumerate(uniques):
+        for token in set(tokenize(str(value))):
+            pairs.append((token, code))
+            pairs.append((f"{column}{_FIELD_SEPARATOR}{token}", code))
+    if not pairs:
+        return pd.DataFrame({"term": pd.Series(dtype=object), "row": pd.Series(dtype=np.int32)})
+
+    rows = pd.DataFrame({"row": np.arange(len(codes), dtype=np.int32), "code": codes})
+    return rows.merge(pd.DataFrame(pairs, columns=["term", "code"]), on="code")[["term", "row"]]
+
+
+def build(df: pd.DataFrame) -> pa.Table:
+    """
+    Construye el índice: una fila por término con la lista ordenada de filas que lo contienen.
+    Returns:
+        pa.Table: Columnas `term` (string) y `rows` (list<int32>).
+    """
+
+    frames = [_column_postings(df, column) for column in _text_columns(df)]
+    postings = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"term": [], "row": []})
+    postings = postings.drop_duplicates().sort_values(["term", "row"], kind="stable")
+
+    terms, starts = np.unique(postings["term"].to_numpy(dtype=object), return_index=True)
+    offsets = np.append(starts, len(postings)).astype(np.int32)
+    rows = pa.ListArray.from_arrays(pa.array(offsets), pa.array(postings["row"].to_numpy(dtype=np.int32)))
+    return pa.table({"term": pa.array(terms.tolist(), type=pa.string()), "rows": rows})
+
+
+def _serialize(table: pa.Table) -> bytes:
+    sink = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _deserialize(data: bytes) -> pa.Table:
+    with pa.ipc.open_stream(data) as reader:
+        return reader.read_all()
+
+
+class InvertedIndex:
+    """Índice cargado en memoria: término -> posición, y las listas de filas como un único arreglo"""
+
+    def __init__(self, table: pa.Table):
+        table = table.combine_chunks()
+        rows = table.column("rows").chunk(0) if table.num_rows else pa.array([], type=pa.list_(pa.int32()))
+        self._positions = {term: i for i, term in enumerate(table.column("term").to_pylist())}
+        self._offsets = rows.offsets.to_numpy()
+        self._rows = rows.values.to_numpy()
+        # Columnas indexadas (en minúsculas); los tokens no contienen el separador
+        self._fields = {
+            term.rpartition(_FIELD_SEPARATOR)[0].lower(): term.rpartition(_FIELD_SEPARATOR)[0]
+            for term in self._positions if _FIELD_SEPARATOR in term
+        }
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def rows(self, term: str) -> np.ndarray:
+        position = self._positions.get(term)
+        if position is None:
+            return self._rows[:0]
+        return self._rows[self._offsets[position]:self._offsets[position + 1]]
+
+    def terms(self, query: str) -> list[str]:
+        """
+        Términos del índice que exige la consulta.
+        Cada parte puede ser libre ('lima') o restringida a una columna ('canal:app'); para exigir
+        varias palabras en la misma columna se usan comillas ('nombre:"juan perez"'), sin ellas
+        solo la primera queda restringida. Un prefijo que no es una columna indexada ('12:30')
+        se trata como texto libre.
+        """
+
+        terms = []
+        for match in _QUERY_PART.finditer(query):
+            field, quoted, bare = match.groups()
+            value = quoted if quoted is not None else bare
+            column = self._fields.get(field.lower()) if field else None
+            if field and column is None:
+                value = f"{field}{_FIELD_SEPARATOR}{value}"
+            prefix = f"{column}{_FIELD_SEPARATOR}" if column else ""
+            terms.extend(prefix + token for token in tokenize(value))
+        return terms
+
+    def match(self, query: str) -> np.ndarray:
+        """Filas que contienen todos los términos de la consulta (ver terms)"""
+        matched = None
+        for term in self.terms(query):
+            rows = self.rows(term)
+            matched = rows if matched is None else np.intersect1d(matched, rows, assume_unique=True)
+            if not len(matched):
+                return matched
+        return matched if matched is not None else self._rows[:0]
+
+
+@dataclass
+class Searchable:
+    """Período listo para buscar: filas decodificadas e índice, válidos mientras lo sea la entrada de caché"""
+    df: pd.DataFrame
+    index: InvertedIndex
+    expires_at: int
+    source: str
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+_memory: OrderedDict[str, Searchable] = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached(cache_key: str) -> Searchable | None:
+    """Período ya cargado en memoria y aún vigente"""
+    with _lock:
+        searchable = _memory.get(cache_key)
+        if searchable is None or not searchable.fresh:
+            return None
+        _memory.move_to_end(cache_key)
+        stats["memory_hits"] += 1
+        return searchable
+
+
+def forget(cache_key: str):
+    """Descarta el período de memoria (su entrada de caché se invalidó)"""
+    with _lock:
+        _memory.pop(cache_key, None)
+
+
+def _remember(cache_key: str, searchable: Searchable):
+    with _lock:
+        _memory[cache_key] = searchable
+        _memory.move_to_end(cache_key)
+        while len(_memory) > SEARCH_INDEX_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _file_name(cache_key: str, digest: str) -> str:
+    # El resumen del payload forma parte del nombre: un período recargado genera un índice nuevo
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', cache_key)}-{digest}.arrow"
+
+
+def _read_disk(name: str) -> bytes | None:
+    path = os.path.join(SEARCH_INDEX_DIR, name)
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        os.utime(path)
+        return data
+    except FileNotFoundError:
+        return None
+
+
+def _write_disk(name: str, data: bytes):
+    os.makedirs(SEARCH_INDEX_DIR, exist_ok=True)
+    temporary = os.path.join(SEARCH_INDEX_DIR, f".{name}.{threading.get_ident()}")
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, os.path.join(SEARCH_INDEX_DIR, name))
+
+    files = sorted(glob.glob(os.path.join(SEARCH_INDEX_DIR, "*.arrow")), key=os.path.getmtime)
+    for path in files[:max(0, len(files) - SEARCH_INDEX_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _s3_location(name: str) -> tuple[str, str]:
+    parsed = urlparse(SEARCH_INDEX_S3_URI)
+    prefix = parsed.path.strip("/")
+    return parsed.netloc, f"{prefix}/{name}" if prefix else name
+
+
+def _read_s3(name: str) -> bytes | None:
+    bucket, key = _s3_location(name)
+    try:
+        return aws_clients.get_client("s3").get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            raise
+        return None
+
+
+def _write_s3(name: str, data: bytes):
+    bucket, key = _s3_location(name)
+    aws_clients.get_client("s3").put_object(Bucket=bucket, Key=key, Body=data)
+
+
+def load(cache_key: str, payload: bytes, expires_at: int, df: pd.DataFrame | None = None) -> Searchable:
+    """
+    Índice del período: memoria, disco local, S3 y, si no existe en ningún nivel, se construye
+    una sola vez y se guarda en los niveles inferiores.
+    Args:
+        cache_key (str): Clave de caché del período.
+        payload (bytes): Filas del período en Arrow IPC (tal como están en la caché).
+        expires_at (int): Vencimiento de la entrada de caché (epoch).
+        df (pd.DataFrame | None): Las mismas filas ya decodificadas, si se tienen.
+    Returns:
+        Searchable: Filas e índice del período.
+    """
+
+    name = _file_name(cache_key, hashlib.sha256(payload).hexdigest()[:16])
+    if df is None:
+        df = formats.from_payload(payload)
+
+    data, source = _read_disk(name), "disk"
+    if data is None and SEARCH_INDEX_S3_URI:
+        try:
+            data, source = _read_s3(name), "s3"
+            if data is not None:
+                _write_disk(name, data)
+        except (ClientError, BotoCoreError, OSError) as e:
+            stats["tier_errors"] += 1
+            print(f"Error reading search index from S3: {e}")
+            data = None
+
+    if data is not None:
+        stats[f"{source}_hits"] += 1
+        table = _deserialize(data)
+    else:
+        start = time.perf_counter()
+        table = build(df)
+        data, source = _serialize(table), "build"
+        stats["builds"] += 1
+        print(f"Search index built for {cache_key}: {table.num_rows} terms, {len(data)} bytes, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        try:
+            _write_disk(name, data)
+            if SEARCH_INDEX_S3_URI:
+                _write_s3(name, data)
+        except (ClientError, BotoCoreError, OSError) as e:
+            # Sin persistencia el índice sigue sirviendo desde memoria
+            stats["tier_errors"] += 1
+            print(f"Error persisting search index: {e}")
+
+    searchable = Searchable(df=df, index=InvertedIndex(table), expires_at=expires_at, source=source)
+    _remember(cache_key, searchable)
+    return searchable
+
+
+def search(searchable: Searchable, query: str, limit: int = SEARCH_MAX_RESULTS) -> tuple[pd.DataFrame, int]:
+    """
+    Busca en el período.
+    Returns:
+        tuple: Filas coincidentes (hasta `limit`, en orden original) y total de coincidencias.
+    """
+
+    stats["searches"] += 1
+    rows = searchable.index.match(query)
+    return searchable.df.iloc[rows[:limit]].reset_index(drop=True), len(rows)
+
+
+def snapshot() -> dict:
+    with _lock:
+        loaded = len(_memory)
+    return {**stats, "loaded_periods": loaded, "s3_tier": bool(SEARCH_INDEX_S3_URI)}
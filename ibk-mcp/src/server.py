@@ -1,116 +1,996 @@
 ''' Example MCP server for currency conversion tool '''
 
 import os
+import json
 import time
-import boto3
-from botocore.exceptions import ClientError
+import asyncio
+from typing import Annotated, Iterator
 import pandas as pd
-import awswrangler as wr
-from mcp.server.fastmcp import FastMCP
+import uvicorn
+from botocore.exceptions import BotoCoreError, ClientError
+from mcp.server.fastmcp import FastMCP, Context
+from mcp.types import CallToolResult, TextContent
 from dotenv import load_dotenv
 
 load_dotenv()
 
+import aws_clients  # pylint: disable=wrong-import-position
+import athena  # pylint: disable=wrong-import-position
+import admission  # pylint: disable=wrong-import-position
+import cache  # pylint: disable=wrong-import-position
+import resilience  # pylint: disable=wrong-import-position
+import schema_dtypes  # pylint: disable=wrong-import-position
+import formats  # pylint: disable=wrong-import-position
+import render_pool  # pylint: disable=wrong-import-position
+import summary  # pylint: disable=wrong-import-position
+import aggregations  # pylint: disable=wrong-import-position
+import approximate  # pylint: disable=wrong-import-position
+import sampling  # pylint: disable=wrong-import-position
+import period_diff  # pylint: disable=wrong-import-position
+import router  # pylint: disable=wrong-import-position
+import planner  # pylint: disable=wrong-import-position
+import glue_catalog  # pylint: disable=wrong-import-position
+import catalog  # pylint: disable=wrong-import-position
+import search_index  # pylint: disable=wrong-import-position
+import profiles  # pylint: disable=wrong-import-position
+import resources  # pylint: disable=wrong-import-position
+from resilience import Deadline, DeadlineExceeded, CircuitOpenError  # pylint: disable=wrong-import-position
+
 DATABASE_NAME = os.getenv("DATABASE_NAME", "")
-TABLE_NAME = os.getenv("TABLE_NAME", "")
 S3_OUTPUT_BUCKET = os.getenv("S3_OUTPUT_BUCKET", "")
-CACHE_TABLE_NAME = os.getenv("CACHE_TABLE_NAME", "")
-
-# Inicializar DynamoDB
-dynamodb = boto3.resource("dynamodb")
-cache_table = dynamodb.Table(CACHE_TABLE_NAME) if CACHE_TABLE_NAME else None  # type: ignore
+# "sse" (sesiones largas) o "streamable-http" (sin estado: cualquier instancia atiende cualquier petición)
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "sse")
+# Filas por bloque al leer resultados de Athena en modo streaming
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "5000"))
+# Margen con el que el streaming se corta y devuelve un resultado parcial
+STREAM_DEADLINE_MARGIN_SECONDS = float(os.getenv("STREAM_DEADLINE_MARGIN_SECONDS", "10"))
 
 # Configurar FastMCP con debug y dependencias explícitas para evitar conflictos
-mcp = FastMCP("IBK-MCP-Server")
+# En modo streamable-http no se guarda estado de sesión, lo que permite escalar horizontalmente en Lambda
+mcp = FastMCP(
+    "IBK-MCP-Server",
+    stateless_http=MCP_TRANSPORT == "streamable-http"
+)
 
-def get_cached_result(key: str):
-    """Obtiene el resultado de la caché si existe"""
-    if not cache_table:
-        return None
+def client_id_of(ctx: Context | None) -> str:
+    """Identificador del cliente MCP para el control de admisión"""
+    if ctx is None:
+        return "default"
+    return ctx.client_id or "default"
 
-    try:
-        response = cache_table.get_item(Key={'name_table': key})
-        if 'Item' in response:
-            print(f"Cache hit for {key}")
-            return response['Item'].get('data')
-    except ClientError as e:
-        print(f"Error reading cache: {e}")
+async def sql_query(
+    query: str,
+    progress: athena.ProgressReporter | None = None,
+    chunksize: int | None = None,
+    client_id: str = "default",
+    deadline: Deadline | None = None,
+    table: catalog.TableConfig | None = None,
+    scan: tuple[catalog.TableConfig, list[str]] | None = None
+) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """
+    Ejecuta una consulta SQL y devuelve el resultado como un DataFrame.
+    Informa el progreso al cliente MCP y detiene la consulta si la petición se cancela.
+    Si se indica la tabla consultada, el resultado se materializa por bloques con tipos
+    compactos derivados de su esquema en Glue (enteros reducidos, textos categóricos).
+    Si se indican la tabla y las particiones que lee, la consulta se enruta: las lecturas
+    pequeñas se resuelven en proceso con DuckDB y el resto en Athena.
+    Args:
+        query (str): Consulta SQL a ejecutar.
+        progress (ProgressReporter | None): Notificaciones de progreso MCP de la petición.
+        chunksize (int | None): Si se indica, devuelve un iterador de DataFrames de ese tamaño.
+        client_id (str): Cliente MCP que origina la consulta (reparto justo de concurrencia).
+        deadline (Deadline | None): Límite de tiempo de la petición.
+        table (TableConfig | None): Tabla consultada, para derivar los tipos de columna. La consulta
+            debe leer su proyección (`select_list`), que da las columnas de un resultado vacío.
+        scan (tuple | None): Tabla y valores de partición que lee la consulta, para enrutarla.
+            Solo para SQL que DuckDB también entiende (sin funciones propias de Athena).
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: DataFrame (o bloques) con los resultados de la consulta.
+    """
 
-    return None
+    source = table or (scan[0] if scan else None)
+    database = source.database if source else DATABASE_NAME
 
-def save_cached_result(key: str, data: str, ttl_seconds: int = 3600):
-    """Guarda el resultado en la caché"""
-    if not cache_table:
-        return
+    column_types = {}
+    columns = (list(table.projection) or None) if table else None
+    if table and chunksize is None:
+        try:
+            column_types = await asyncio.to_thread(schema_dtypes.table_types, table.database, table.table)
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error reading Glue schema for {table.table}: {e}")
 
-    try:
-        expiration = int(time.time()) + ttl_seconds
-        cache_table.put_item(
-            Item={
-                'name_table': key,
-                'data': data,
-                'ttl': expiration
-            }
-        )
-        print(f"Cache saved for {key}")
-    except ClientError as e:
-        print(f"Error saving cache: {e}")
+    df_result = None
+    if scan and chunksize is None:
+        scanned, values = scan
+        decision = await router.route(scanned.database, scanned.table, scanned.partition_column, values)
+        if decision.engine == "duckdb":
+            if progress:
+                await progress.report("DUCKDB: consulta resuelta en proceso")
+            df_result = await router.run_duckdb(query, scanned.database, scanned.table, decision,
+                                                deadline or Deadline())
+
+    if df_result is not None:
+        if column_types:
+            df_result, _ = await asyncio.to_thread(schema_dtypes.materialize, df_result, column_types, columns)
+        return df_result
+
+    df_result = await athena.run_query(
+        query,
+        database=database,
+        s3_output=S3_OUTPUT_BUCKET,
+        progress=progress,
+        chunksize=schema_dtypes.MATERIALIZE_CHUNK_ROWS if column_types else chunksize,
+        client_id=client_id,
+        deadline=deadline,
+        dtype_backend=schema_dtypes.ATHENA_DTYPE_BACKEND
+    )
 
-def sql_query(query: str) -> pd.DataFrame:
+    if column_types:
+        df_result, _ = await asyncio.to_thread(schema_dtypes.materialize, df_result, column_types, columns)  # type: ignore
+
+    return df_result
+
+async def stream_query(query: str, ctx: Context, deadline: Deadline, fmt: str = formats.DEFAULT_FORMAT) -> str:
     """
-    Ejecuta una consulta SQL en Athena y devuelve el resultado como un DataFrame.
+    Ejecuta la consulta leyendo Athena por bloques y envía cada bloque renderizado
+    al cliente como mensaje parcial, sin materializar el resultado completo.
+    Si el presupuesto de la petición se acerca a su fin, corta y devuelve lo enviado.
     Args:
         query (str): Consulta SQL a ejecutar.
+        ctx (Context): Contexto MCP de la petición en curso.
+        deadline (Deadline): Límite de tiempo de la petición.
+        fmt (str): Formato de cada bloque (ver formats.FORMATS).
     Returns:
-        pd.DataFrame: DataFrame con los resultados de la consulta.
+        str: Resumen de las filas y bloques enviados.
     """
 
-    df_result = wr.athena.read_sql_query(
-        sql=query,
-        database=DATABASE_NAME,
-        s3_output=S3_OUTPUT_BUCKET,
-        ctas_approach=False
+    progress = athena.ProgressReporter(ctx)
+    chunks = await sql_query(query, progress, chunksize=STREAM_CHUNK_ROWS,
+                             client_id=client_id_of(ctx), deadline=deadline)
+    if isinstance(chunks, pd.DataFrame):
+        chunks = iter([chunks])
+
+    rows = 0
+    blocks = 0
+    while True:
+        if deadline.remaining() < STREAM_DEADLINE_MARGIN_SECONDS:
+            return f"Resultado parcial: {rows} filas enviadas en {blocks} bloques antes del límite de tiempo"
+
+        # La descarga de cada bloque es bloqueante: se hace fuera del event loop
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+
+        await ctx.log("info", formats.render(chunk, fmt, header=blocks == 0), logger_name="partial_content")
+        rows += len(chunk)
+        blocks += 1
+        await progress.report(f"{rows} filas enviadas")
+
+    return f"{rows} filas enviadas en {blocks} bloques"
+
+async def respond(
+    df: pd.DataFrame | None,
+    payload: bytes,
+    fmt: str,
+    rows: int | None,
+    max_rows: int,
+    max_bytes: int
+) -> str:
+    """
+    Renderiza el resultado si cabe en el presupuesto de la respuesta; si no, devuelve un resumen.
+    Args:
+        df (pd.DataFrame | None): Resultado ya materializado, si se tiene.
+        payload (bytes): El mismo resultado en Arrow IPC.
+        fmt (str): Formato de salida.
+        rows (int | None): Filas del resultado, si se conocen sin decodificarlo.
+        max_rows (int): Máximo de filas (0 sin límite).
+        max_bytes (int): Máximo de bytes de la respuesta renderizada (0 sin límite).
+    Returns:
+        str: Resultado renderizado o resumen JSON.
+    """
+
+    if df is not None:
+        rows = len(df)
+    if max_rows and rows is None:
+        df = await asyncio.to_thread(formats.from_payload, payload)
+        rows = len(df)
+
+    if max_rows and rows > max_rows:  # type: ignore
+        if df is None:
+            df = await asyncio.to_thread(formats.from_payload, payload)
+        return await asyncio.to_thread(summary.render_summary, df, f"{rows} filas superan max_rows={max_rows}")
+
+    text = await render_pool.render(df, payload, fmt)
+    size = len(text.encode("utf-8"))
+    if max_bytes and size > max_bytes:
+        if df is None:
+            df = await asyncio.to_thread(formats.from_payload, payload)
+        return await asyncio.to_thread(summary.render_summary, df, f"{size} bytes superan max_bytes={max_bytes}")
+
+    return text
+
+async def respond_aggregate(
+    df: pd.DataFrame | None,
+    payload: bytes,
+    fmt: str,
+    rows: int | None,
+    max_rows: int,
+    max_bytes: int
+) -> str:
+    """Como respond, pero recorta la agregación a AGGREGATE_MAX_GROUPS grupos y avisa del corte"""
+    if df is None and (rows is None or rows > aggregations.AGGREGATE_MAX_GROUPS):
+        df = await asyncio.to_thread(formats.from_payload, payload)
+    if df is None:
+        return await respond(None, payload, fmt, rows, max_rows, max_bytes)
+
+    df, truncated = aggregations.truncate(df)
+    if not truncated:
+        return await respond(df, payload, fmt, None, max_rows, max_bytes)
+    payload = await asyncio.to_thread(formats.to_payload, df)
+    text = await respond(df, payload, fmt, None, max_rows, max_bytes)
+    return (f"[Resultado truncado: más de {aggregations.AGGREGATE_MAX_GROUPS} grupos; "
+            f"reduzca el rango o las columnas de agrupación]\n{text}")
+
+def with_meta(text: str, plan: planner.Plan | None) -> CallToolResult | str:
+    """Adjunta la planificación (bytes estimados, presupuesto, acción) en `_meta` del resultado"""
+    if plan is None:
+        return text
+    return CallToolResult(
+        content=[TextContent(type="text", text=text)],
+        structuredContent={"result": text},
+        _meta={"plan": plan.as_meta()}
     )
 
-    return df_result
+async def resolve_table(table: str | None) -> catalog.TableConfig:
+    """
+    Configuración de la tabla pedida (el catálogo puede releerse de su origen).
+    También carga su esquema de Glue, cuya versión forma parte de las claves de caché de la tabla.
+    """
+    config = await asyncio.to_thread(catalog.tables.resolve, table)
+    try:
+        await asyncio.to_thread(glue_catalog.schemas.get, config.database, config.table)
+    except (ClientError, BotoCoreError) as e:
+        # Sin esquema las claves no llevan versión; la consulta sigue y mostrará su propio error
+        print(f"Error reading Glue schema for {config.table}: {e}")
+    return config
+
+async def plan_query(query: str, config: catalog.TableConfig, values: list[str],
+                     require_all: bool = True) -> planner.Plan:
+    """Planificación previa con la columna de partición y el presupuesto de escaneo de la tabla"""
+    return await planner.preflight(query, config.database, config.table, config.partition_column,
+                                   values, config.max_scan_bytes, require_all)
+
+def period_query(config: catalog.TableConfig, periodo: str) -> str:
+    """Lectura completa (con la proyección de la tabla) de la partición de un período"""
+    return f"""
+    SELECT {config.select_list()}
+    FROM {config.database}.{config.table}
+    WHERE {config.partition_column} = '{periodo}'
+    """
+
+async def load_period(
+    config: catalog.TableConfig,
+    periodo: str,
+    ctx: Context | None,
+    deadline: Deadline
+) -> tuple[pd.DataFrame, bytes, planner.Plan]:
+    """
+    Lee la partición completa del período, la guarda en caché y publica su nueva versión (ETag).
+    Raises:
+        QueryRejected: Si la partición supera el presupuesto de escaneo de la tabla.
+    """
+
+    query = period_query(config, periodo)
+    plan = await plan_query(query, config, [periodo])
+    if plan.over_budget:
+        raise planner.reject(plan, "Use aggregate o sample_period para este período.")
+    result = await sql_query(query, athena.ProgressReporter(ctx), client_id=client_id_of(ctx),
+                             deadline=deadline, table=config, scan=(config, [periodo]))
+    payload = await asyncio.to_thread(formats.to_payload, result)
+    await cache.save(config.cache_key(f"period_{periodo}"), payload, deadline, config.cache_ttl_seconds,
+                     rows=len(result))
+    await resources.publish(resources.period_uri(config.name, periodo), cache.content_etag(payload))
+    return result, payload, plan
 
 @mcp.tool()
-def get_data_by_period(periodo: str) -> str:
+async def get_data_by_period(
+    periodo: str,
+    table: str | None = None,
+    stream: bool = False,
+    format: str = formats.DEFAULT_FORMAT,  # pylint: disable=redefined-builtin
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
     """
-    Obtiene datos de la tabla especificada para un período dado.
+    Obtiene datos de una tabla del catálogo para un período dado (ver list_tables).
+     Si el resultado supera max_rows o max_bytes se devuelve un resumen JSON
+     (filas, min/max/media y nulos por columna, categorías más frecuentes y una muestra).
      Primero consulta la caché (DynamoDB), si no encuentra el dato, consulta Athena.
+     Si la partición supera el presupuesto de escaneo se devuelve una muestra de ella;
+     la estimación de bytes va en los metadatos (_meta.plan) del resultado.
     Args:
         periodo (str): Período para filtrar los datos (formato 'YYYY-MM-DD').
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+        stream (bool): Si es True, las filas se envían por bloques como mensajes parciales
+            a medida que llegan de Athena y el resultado final es solo un resumen.
+        format (str): "text" (tabla alineada), "csv", "json" (columnar compacto),
+            "markdown" o "arrow" (Arrow IPC en base64).
+        max_rows (int | None): Máximo de filas a devolver (0 sin límite; por defecto el del servidor).
+        max_bytes (int | None): Máximo de bytes de la respuesta (0 sin límite; por defecto el del servidor).
+            No aplican en modo streaming.
     Returns:
-        str: Resultados de la consulta en formato de cadena.
+        str: Resultados de la consulta en el formato pedido.
     """
 
-    cache_key = f"period_{periodo}"
+    if format not in formats.FORMATS:
+        return f"Formato no soportado: {format}. Opciones: {', '.join(formats.FORMATS)}"
+    try:
+        config = await resolve_table(table)
+        periodo, _ = aggregations.parse_period_range(periodo, max_days=1)
+    except ValueError as e:
+        return str(e)
+
+    cache_key = config.cache_key(f"period_{periodo}")
+    deadline = Deadline()
+    max_rows, max_bytes = config.budget(max_rows, max_bytes)
 
-    # 1. Intentar obtener de caché
-    cached_data = get_cached_result(cache_key)
-    if cached_data:
-        return cached_data
+    # 1. Intentar obtener de caché (una entrada vencida se guarda como respaldo)
+    cached = await cache.lookup(cache_key, deadline)
+    if cached and cached.fresh:
+        return await respond(None, cached.payload, format, cached.rows, max_rows, max_bytes)
+
+    # 2. Si no está en caché, planificar y consultar
+    query = period_query(config, periodo)
+
+    plan = None
+    try:
+        plan = await plan_query(query, config, [periodo])
+        sampled = None
+        if plan.over_budget:
+            sampled = plan.sample_percent()
+            if sampled is None:
+                raise planner.reject(plan, "Use aggregate o approx_stats para este período.")
+            # Sobre el presupuesto: se leen solo algunos bloques de la partición (TABLESAMPLE SYSTEM)
+            planner.downgrade(plan, "sampled")
+            query = sampling.sampled_select(config.database, config.table, periodo, sampled, "SYSTEM",
+                                            config.partition_column, config.select_list())
 
-    # 2. Si no está en caché, consultar Athena
-    query = f"""
-    SELECT *
-    FROM {DATABASE_NAME}.{TABLE_NAME}
-    WHERE fecha_proceso = '{periodo}'
+        # En streaming el resultado no se materializa, por lo que tampoco se guarda en caché
+        if stream and ctx is not None:
+            return with_meta(await stream_query(query, ctx, deadline, format), plan)
+
+        scan = None if sampled else (config, [periodo])
+        result = await sql_query(query, athena.ProgressReporter(ctx), client_id=client_id_of(ctx),
+                                 deadline=deadline, table=config, scan=scan)
+        payload = await asyncio.to_thread(formats.to_payload, result)
+        if sampled:
+            text = await respond(result, payload, format, None, max_rows, max_bytes)
+            return with_meta(f"[Muestra del {sampled}% de la partición: supera el presupuesto de escaneo]\n{text}", plan)
+
+        # 3. Guardar en caché en formato neutro (encolado; se vuelca tras responder)
+        await cache.save(cache_key, payload, deadline, config.cache_ttl_seconds, rows=len(result))
+        await resources.publish(resources.period_uri(config.name, periodo), cache.content_etag(payload))
+
+        return with_meta(await respond(result, payload, format, None, max_rows, max_bytes), plan)
+
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except (admission.AdmissionRejected, DeadlineExceeded, CircuitOpenError, ClientError, BotoCoreError) as e:
+        # Dependencia saturada o degradada: mejor un dato vencido que nada
+        if cached:
+            stale = await respond(None, cached.payload, format, cached.rows, max_rows, max_bytes)
+            return f"[Datos en caché vencidos: {e}]\n{stale}"
+        if isinstance(e, admission.AdmissionRejected):
+            return str(e)
+        return f"Error executing query: {str(e)}"
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+
+@mcp.tool()
+async def aggregate(
+    periodo_range: str,
+    metrics: list[str],
+    group_by: list[str] | None = None,
+    table: str | None = None,
+    format: str = formats.DEFAULT_FORMAT,  # pylint: disable=redefined-builtin
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
+    """
+    Agrega datos de la tabla en Athena (GROUP BY) y devuelve solo el resultado agregado.
+     Preferir esta herramienta a descargar filas para sumarlas o contarlas.
+    Args:
+        periodo_range (str): 'YYYY-MM-DD' o 'YYYY-MM-DD:YYYY-MM-DD' (ambos extremos incluidos).
+        metrics (list[str]): Métricas: count(*), count(col), count_distinct(col),
+            sum(col), avg(col), min(col), max(col). P. ej. ['sum(monto)', 'count(*)'].
+        group_by (list[str] | None): Columnas de agrupación, p. ej. ['fecha_proceso', 'categoria'].
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+        format (str): Formato de salida (ver get_data_by_period).
+        max_rows (int | None): Máximo de filas a devolver (0 sin límite).
+        max_bytes (int | None): Máximo de bytes de la respuesta (0 sin límite).
+    Returns:
+        str: Resultado agregado en el formato pedido.
+    """
+
+    if format not in formats.FORMATS:
+        return f"Formato no soportado: {format}. Opciones: {', '.join(formats.FORMATS)}"
+
+    deadline = Deadline()
+
+    try:
+        config = await resolve_table(table)
+        max_rows, max_bytes = config.budget(max_rows, max_bytes)
+        column_types = await asyncio.to_thread(schema_dtypes.table_types, config.database, config.table)
+        query, cache_key = aggregations.build_query(
+            config.database, config.table, column_types, periodo_range, group_by or [], metrics,
+            config.partition_column
+        )
+        cache_key = config.cache_key(cache_key)
+        scanned = aggregations.period_values(*aggregations.parse_period_range(periodo_range))
+    except ValueError as e:
+        return str(e)
+    except (ClientError, BotoCoreError) as e:
+        return f"Error reading table schema: {str(e)}"
+
+    cached = await cache.lookup(cache_key, deadline)
+    if cached and cached.fresh:
+        return await respond_aggregate(None, cached.payload, format, cached.rows, max_rows, max_bytes)
+
+    plan = None
+    try:
+        plan = await plan_query(query, config, scanned, require_all=False)
+        if plan.over_budget:
+            raise planner.reject(plan, "Reduzca el rango de períodos.")
+
+        result = await sql_query(query, athena.ProgressReporter(ctx), client_id=client_id_of(ctx),
+                                 deadline=deadline, scan=(config, scanned))
+        payload = await asyncio.to_thread(formats.to_payload, result)
+        await cache.save(cache_key, payload, deadline, config.cache_ttl_seconds, rows=len(result))
+        return with_meta(await respond_aggregate(result, payload, format, None, max_rows, max_bytes), plan)
+
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except (admission.AdmissionRejected, DeadlineExceeded, CircuitOpenError, ClientError, BotoCoreError) as e:
+        if cached:
+            stale = await respond_aggregate(None, cached.payload, format, cached.rows, max_rows, max_bytes)
+            return f"[Datos en caché vencidos: {e}]\n{stale}"
+        if isinstance(e, admission.AdmissionRejected):
+            return str(e)
+        return f"Error executing query: {str(e)}"
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+
+@mcp.tool()
+async def sample_period(
+    periodo: str,
+    n: int = 20,
+    seed: int = 0,
+    table: str | None = None,
+    format: str = formats.DEFAULT_FORMAT,  # pylint: disable=redefined-builtin
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
+    """
+    Devuelve una muestra aleatoria de filas de un período, para ver cómo son los datos
+     sin descargar la partición completa. La misma combinación período/n/semilla devuelve siempre la misma muestra.
+    Args:
+        periodo (str): Período a muestrear (formato 'YYYY-MM-DD').
+        n (int): Número de filas de la muestra.
+        seed (int): Semilla de la muestra.
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+        format (str): Formato de salida (ver get_data_by_period).
+    Returns:
+        str: Filas de la muestra en el formato pedido.
     """
 
+    if format not in formats.FORMATS:
+        return f"Formato no soportado: {format}. Opciones: {', '.join(formats.FORMATS)}"
     try:
-        result = sql_query(query)
-        result_str = result.to_string()
+        config = await resolve_table(table)
+        periodo = sampling.validate(periodo, n)
+    except ValueError as e:
+        return str(e)
 
-        # 3. Guardar en caché
-        save_cached_result(cache_key, result_str)
+    deadline = Deadline()
+    _, max_bytes = config.budget(0, None)
+    cache_key = config.cache_key(sampling.cache_key(periodo, n, seed))
 
-        return result_str
+    cached = await cache.lookup(cache_key, deadline)
+    if cached and cached.fresh:
+        text = await respond(None, cached.payload, format, cached.rows, 0, max_bytes)
+        return (sampling.shortfall(cached.rows, n) if cached.rows is not None else "") + text
 
+    plan = None
+    try:
+        # Si el período completo ya está en caché, se muestrea localmente sin ir a Athena
+        full = await cache.lookup(config.cache_key(f"period_{periodo}"), deadline)
+        if full and full.fresh:
+            rows = await asyncio.to_thread(formats.from_payload, full.payload)
+        else:
+            query = sampling.build_query(config.database, config.table, periodo, n,
+                                         partition_column=config.partition_column, columns=config.select_list())
+            plan = await plan_query(query, config, [periodo])
+            method, max_percent = "BERNOULLI", 100.0
+            if plan.over_budget:
+                # BERNOULLI lee la partición completa; SYSTEM solo una fracción de sus bloques
+                max_percent = plan.sample_percent()  # type: ignore
+                if max_percent is None:
+                    raise planner.reject(plan, "La partición es demasiado grande incluso para muestrearla.")
+                planner.downgrade(plan, "system_sample")
+                method = "SYSTEM"
+
+            # Porcentaje según las filas de la partición en Glue; con 100 se lee sin TABLESAMPLE
+            percent = min(sampling.sample_percent(n, plan.estimate.rows if plan.estimate else None), max_percent)
+            while True:
+                query = sampling.build_query(config.database, config.table, periodo, n, percent, method,
+                                             config.partition_column, config.select_list())
+                rows = await sql_query(query, athena.ProgressReporter(ctx),
+                                       client_id=client_id_of(ctx), deadline=deadline, table=config)
+                if len(rows) >= n or percent >= max_percent:
+                    break
+                # Menos filas de las pedidas (partición pequeña o sin estadísticas): se repite con el máximo permitido
+                percent = max_percent
+
+        result = await asyncio.to_thread(sampling.reservoir, rows, n, seed)
+        payload = await asyncio.to_thread(formats.to_payload, result)
+        await cache.save(cache_key, payload, deadline, config.cache_ttl_seconds, rows=len(result))
+        text = await respond(result, payload, format, None, 0, max_bytes)
+        return with_meta(sampling.shortfall(len(result), n) + text, plan)
+
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except (admission.AdmissionRejected, DeadlineExceeded, CircuitOpenError, ClientError, BotoCoreError) as e:
+        if cached:
+            stale = await respond(None, cached.payload, format, cached.rows, 0, max_bytes)
+            return f"[Datos en caché vencidos: {e}]\n{stale}"
+        if isinstance(e, admission.AdmissionRejected):
+            return str(e)
+        return f"Error executing query: {str(e)}"
     except Exception as e:
         return f"Error executing query: {str(e)}"
 
+@mcp.tool()
+async def search(
+    periodo: str,
+    query: str,
+    table: str | None = None,
+    limit: int = search_index.SEARCH_MAX_RESULTS,
+    format: str = formats.DEFAULT_FORMAT,  # pylint: disable=redefined-builtin
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
+    """
+    Busca filas de un período por texto en sus columnas de texto, sin descargar la partición.
+     Usa un índice invertido que se construye una vez por período en caché.
+    Args:
+        periodo (str): Período (formato 'YYYY-MM-DD').
+        query (str): Términos a buscar; todos deben aparecer en la fila. Un término puede
+            limitarse a una columna con 'columna:valor', p. ej. 'canal:app lima', y varias
+            palabras en la misma columna van entre comillas: 'comercio:"bodega central"'.
+            No distingue mayúsculas ni tildes.
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+        limit (int): Máximo de filas a devolver.
+        format (str): Formato de salida (ver get_data_by_period).
+    Returns:
+        str: Total de coincidencias y las filas encontradas en el formato pedido.
+    """
+
+    if format not in formats.FORMATS:
+        return f"Formato no soportado: {format}. Opciones: {', '.join(formats.FORMATS)}"
+    if not search_index.tokenize(query):
+        return "Indique al menos un término de búsqueda"
+    try:
+        config = await resolve_table(table)
+        periodo, _ = aggregations.parse_period_range(periodo, max_days=1)
+    except ValueError as e:
+        return str(e)
+
+    deadline = Deadline()
+    limit = max(1, min(limit, search_index.SEARCH_MAX_RESULTS))
+    _, max_bytes = config.budget(0, None)
+    cache_key = config.cache_key(f"period_{periodo}")
+
+    plan = None
+    try:
+        # El índice se carga solo al buscar: memoria, luego /tmp o S3, y se construye si no existe
+        searchable = search_index.cached(cache_key)
+        if searchable is None:
+            cached = await cache.lookup(cache_key, deadline)
+            if cached and cached.fresh:
+                searchable = await asyncio.to_thread(search_index.load, cache_key, cached.payload, cached.expires_at)
+            else:
+                # Sin el período en caché se lee una vez completo; las búsquedas siguientes usan el índice
+                result, payload, plan = await load_period(config, periodo, ctx, deadline)
+                expires_at = int(time.time()) + config.cache_ttl_seconds
+                searchable = await asyncio.to_thread(search_index.load, cache_key, payload, expires_at, result)
+
+        matches, total = search_index.search(searchable, query, limit)
+        text = await respond(matches, b"", format, None, 0, max_bytes)
+        return with_meta(f"{total} filas coinciden (se muestran {len(matches)})\n{text}", plan)
+
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except admission.AdmissionRejected as e:
+        return str(e)
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+
+async def stats_row(query: str, cache_key: str, config: catalog.TableConfig,
+                    ctx: Context | None, deadline: Deadline) -> tuple[dict, bool]:
+    """
+    Ejecuta (o lee de caché) una consulta de estadísticas de una sola fila.
+    Returns:
+        tuple: La fila como dict (con el costo de la ejecución original) y si vino de la caché.
+    """
+
+    cached = await cache.lookup(cache_key, deadline)
+    if cached and cached.fresh:
+        df = await asyncio.to_thread(formats.from_payload, cached.payload)
+        return df.to_dict("records")[0], True
+
+    start = time.perf_counter()
+    result = await sql_query(query, athena.ProgressReporter(ctx), client_id=client_id_of(ctx), deadline=deadline)
+    approximate.attach_query_stats(result, approximate.query_stats(result, time.perf_counter() - start))
+    payload = await asyncio.to_thread(formats.to_payload, result)
+    await cache.save(cache_key, payload, deadline, config.cache_ttl_seconds, rows=len(result))
+    return result.to_dict("records")[0], False
+
+@mcp.tool()
+async def approx_stats(
+    periodo_range: str,
+    columns: list[str],
+    percentiles: list[float] | None = None,
+    sample_percent: float | None = None,
+    compare: bool = False,
+    table: str | None = None,
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
+    """
+    Estadísticas aproximadas (distintos, percentiles, media) con sketches de Athena,
+     mucho más rápidas que el cálculo exacto. Cada valor incluye su intervalo de error del 95%.
+    Args:
+        periodo_range (str): 'YYYY-MM-DD' o 'YYYY-MM-DD:YYYY-MM-DD' (ambos extremos incluidos).
+        columns (list[str]): Columnas a describir, p. ej. ['id_cliente', 'monto'].
+        percentiles (list[float] | None): Percentiles de las columnas numéricas (por defecto [0.5]).
+        sample_percent (float | None): Si se indica, calcula sobre esa fracción de filas (TABLESAMPLE).
+        compare (bool): Ejecutar también la ruta exacta y reportar error real, latencia y bytes escaneados.
+            Los percentiles exactos se omiten si el volumen estimado es demasiado grande (ver `percentile_method`).
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+    Returns:
+        str: JSON con las estadísticas, sus cotas de error y el costo de la consulta.
+    """
+
+    deadline = Deadline()
+    percentiles = percentiles or [0.5]
+
+    try:
+        config = await resolve_table(table)
+        column_types = await asyncio.to_thread(schema_dtypes.table_types, config.database, config.table)
+        columns, percentiles = approximate.validate(column_types, columns, percentiles, sample_percent)
+        approx_query = approximate.build_query(config.database, config.table, column_types, periodo_range,
+                                               columns, percentiles, sample_percent, False, config.partition_column)
+        scanned = aggregations.period_values(*aggregations.parse_period_range(periodo_range))
+    except ValueError as e:
+        return str(e)
+    except (ClientError, BotoCoreError) as e:
+        return f"Error reading table schema: {str(e)}"
+
+    plan = None
+    try:
+        # Aproximada y exacta leen las mismas particiones: se planifica una vez
+        plan = await plan_query(approx_query, config, scanned, require_all=False)
+        if plan.over_budget:
+            raise planner.reject(plan, "Reduzca el rango de períodos.")
+
+        # Los percentiles exactos solo se calculan si el planificador estima un volumen acotado
+        exact_percentiles = approximate.exact_percentiles_allowed(
+            plan.estimate.rows if plan.estimate else None,
+            plan.estimate.bytes if plan.estimate else None
+        )
+        plans = [(False, approx_query)]
+        if compare:
+            plans.append((True, approximate.build_query(
+                config.database, config.table, column_types, periodo_range, columns, percentiles,
+                sample_percent, True, config.partition_column, exact_percentiles
+            )))
+
+        results = []
+        for exact, query in plans:
+            cache_key = config.cache_key(approximate.cache_key(config.table, periodo_range, columns, percentiles,
+                                                               sample_percent, exact, exact_percentiles))
+            row, from_cache = await stats_row(query, cache_key, config, ctx, deadline)
+            result = approximate.interpret(row, column_types, columns, percentiles, sample_percent, exact,
+                                           exact_percentiles)
+            result["query"] = {**approximate.read_query_stats(row), "cached": from_cache}
+            results.append(result)
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except admission.AdmissionRejected as e:
+        return str(e)
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+
+    response = results[0]
+    if compare:
+        response["exact"] = results[1]
+        response["comparison"] = approximate.compare(results[0], results[1])
+    return with_meta(json.dumps(response, ensure_ascii=False, default=str), plan)
+
+async def cached_frame(
+    query: str,
+    cache_key: str,
+    ctx: Context | None,
+    deadline: Deadline,
+    scan: tuple[catalog.TableConfig, list[str]]
+) -> pd.DataFrame:
+    """Ejecuta la consulta (enrutada según `scan`, ver sql_query) o devuelve su resultado en caché"""
+    cached = await cache.lookup(cache_key, deadline)
+    if cached and cached.fresh:
+        return await asyncio.to_thread(formats.from_payload, cached.payload)
+
+    result = await sql_query(query, athena.ProgressReporter(ctx), client_id=client_id_of(ctx),
+                             deadline=deadline, scan=scan)
+    payload = await asyncio.to_thread(formats.to_payload, result)
+    await cache.save(cache_key, payload, deadline, scan[0].cache_ttl_seconds, rows=len(result))
+    return result
+
+@mcp.tool()
+async def compare_periods(
+    a: str,
+    b: str,
+    keys: list[str],
+    metrics: list[str],
+    table: str | None = None,
+    ctx: Context | None = None
+) -> Annotated[CallToolResult, str]:
+    """
+    Compara dos períodos por clave y devuelve solo la diferencia: claves añadidas, eliminadas
+     o con métricas distintas, y los deltas de las métricas globales.
+    Args:
+        a (str): Período base (formato 'YYYY-MM-DD').
+        b (str): Período comparado (formato 'YYYY-MM-DD').
+        keys (list[str]): Columnas que identifican una fila, p. ej. ['id_cliente'].
+        metrics (list[str]): Métricas por clave, como en aggregate, p. ej. ['sum(monto)', 'count(*)'].
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+    Returns:
+        str: JSON con conteos por tipo de cambio, deltas globales y las filas de diferencia.
+    """
+
+    deadline = Deadline()
+    try:
+        config = await resolve_table(table)
+        column_types = await asyncio.to_thread(schema_dtypes.table_types, config.database, config.table)
+        a, b, keys, parsed = period_diff.parse(column_types, a, b, keys, metrics)
+    except ValueError as e:
+        return str(e)
+    except (ClientError, BotoCoreError) as e:
+        return f"Error reading table schema: {str(e)}"
+
+    plan = None
+    try:
+        # Con ambos períodos en caché la diferencia se calcula localmente sin ir a Athena
+        cached_a = await cache.lookup(config.cache_key(f"period_{a}"), deadline)
+        cached_b = await cache.lookup(config.cache_key(f"period_{b}"), deadline)
+        frames = None
+        if cached_a and cached_a.fresh and cached_b and cached_b.fresh:
+            df_a = await asyncio.to_thread(formats.from_payload, cached_a.payload)
+            df_b = await asyncio.to_thread(formats.from_payload, cached_b.payload)
+            # La caché guarda la proyección de la tabla; claves o métricas fuera de ella van a Athena
+            if period_diff.covers(df_a, keys, parsed) and period_diff.covers(df_b, keys, parsed):
+                frames = (df_a, df_b)
+        if frames is not None:
+            df_a, df_b = frames
+            diff = await asyncio.to_thread(period_diff.diff_frames, df_a, df_b, keys, parsed)
+            totals = await asyncio.to_thread(period_diff.totals_frames, df_a, df_b, a, b, parsed)
+            source = "cache"
+        else:
+            cache_key = config.cache_key(period_diff.cache_key(config.table, a, b, keys, parsed))
+            query = period_diff.build_diff_query(config.database, config.table, a, b, keys, parsed,
+                                                 config.partition_column)
+            plan = await plan_query(query, config, [a, b])
+            if plan.over_budget:
+                raise planner.reject(plan, "Compare períodos más pequeños o use aggregate por período.")
+            totals_query = period_diff.build_totals_query(config.database, config.table, a, b, parsed,
+                                                          config.partition_column)
+            diff = await cached_frame(query, f"{cache_key}_page", ctx, deadline, (config, [a, b]))
+            totals = await cached_frame(totals_query, f"{cache_key}_totals", ctx, deadline, (config, [a, b]))
+            source = "query"
+    except planner.QueryRejected as e:
+        return with_meta(str(e), plan)
+    except admission.AdmissionRejected as e:
+        return str(e)
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+
+    report = period_diff.report(diff, totals, a, b, parsed, source)
+    return with_meta(json.dumps(report, ensure_ascii=False, default=str), plan)
+
+async def read_period(table: str, periodo: str, etag: str | None, ctx: Context | None) -> str:
+    """
+    Contenido del recurso de un período. Si `etag` coincide con la versión vigente
+    no se envían los datos, solo la confirmación de que no cambiaron.
+    """
+
+    config = await resolve_table(table)
+    periodo, _ = aggregations.parse_period_range(periodo, max_days=1)
+    uri = resources.period_uri(config.name, periodo)
+    deadline = Deadline()
+
+    cached = await cache.lookup(config.cache_key(f"period_{periodo}"), deadline)
+    if cached and cached.fresh:
+        df, payload, rows, expires_at = None, cached.payload, cached.rows, cached.expires_at
+        current = cached.etag or cache.content_etag(payload)
+        await resources.publish(uri, current)
+    else:
+        df, payload, _ = await load_period(config, periodo, ctx, deadline)
+        current, rows, expires_at = cache.content_etag(payload), len(df), int(time.time()) + config.cache_ttl_seconds
+
+    resources.watch(uri, ctx.session if ctx is not None else None)
+    if etag == current:
+        return resources.document(uri, current, rows, expires_at, None)
+    data = await render_pool.render(df, payload, "json")
+    return resources.document(uri, current, rows, expires_at, data)
+
+@mcp.resource(resources.PERIOD_URI, mime_type=resources.MIME_TYPE)
+async def period_resource(table: str, periodo: str, ctx: Context) -> str:
+    """
+    Datos de un período de una tabla del catálogo, en JSON columnar, con su ETag.
+     Quien lee el recurso recibe notifications/resources/updated cuando su contenido cambia.
+    """
+    return await read_period(table, periodo, None, ctx)
+
+@mcp.resource(resources.PERIOD_IF_NONE_MATCH_URI, mime_type=resources.MIME_TYPE)
+async def period_resource_if_none_match(table: str, periodo: str, etag: str, ctx: Context) -> str:
+    """
+    Revalidación de ibk://{table}/{periodo}: si el ETag sigue vigente responde not_modified
+     sin los datos; si no, devuelve la versión nueva completa.
+    """
+    return await read_period(table, periodo, etag, ctx)
+
+@mcp.tool()
+async def invalidate_period(periodo: str, table: str | None = None) -> str:
+    """
+    Descarta el período de la caché (p. ej. tras recargar la partición) y avisa a los clientes
+     que leyeron su recurso ibk://{table}/{periodo}. La próxima lectura irá a Athena.
+    Args:
+        periodo (str): Período (formato 'YYYY-MM-DD').
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+    Returns:
+        str: Confirmación con la URI invalidada.
+    """
+
+    try:
+        config = await resolve_table(table)
+        periodo, _ = aggregations.parse_period_range(periodo, max_days=1)
+    except ValueError as e:
+        return str(e)
+
+    cache_key = config.cache_key(f"period_{periodo}")
+    await cache.invalidate(cache_key, Deadline())
+    search_index.forget(cache_key)
+    uri = resources.period_uri(config.name, periodo)
+    await resources.invalidate(uri)
+    return f"Período invalidado: {uri}"
+
+@mcp.tool()
+async def get_profile(key: str, as_of: str | None = None) -> str:
+    """
+    Perfil precalculado de un cliente: conteos y montos en ventanas móviles (1, 7, 30 y 90 días),
+     días con actividad y última actividad. Es una lectura directa, sin consultar Athena:
+     preferirla para preguntas sobre un solo cliente.
+    Args:
+        key (str): Identificador del cliente (p. ej. el valor de id_cliente).
+        as_of (str | None): Fecha de corte máxima ('YYYY-MM-DD'); por defecto el perfil más reciente.
+    Returns:
+        str: JSON con el perfil del cliente.
+    """
+
+    if profiles.profile_table is None:
+        return "Perfiles no configurados (PROFILE_TABLE_NAME)"
+    try:
+        if as_of:
+            as_of, _ = aggregations.parse_period_range(as_of, max_days=1)
+        profile = await asyncio.to_thread(profiles.get_profile, key, as_of)
+    except ValueError as e:
+        return str(e)
+    except (CircuitOpenError, ClientError, BotoCoreError) as e:
+        return f"Error reading profile: {str(e)}"
+
+    if profile is None:
+        return f"No hay perfil para el cliente {key}. Use search o aggregate sobre sus transacciones."
+    return json.dumps(profile, ensure_ascii=False)
+
+@mcp.tool()
+async def list_tables() -> str:
+    """
+    Lista las tablas consultables, con su columna de partición y sus límites.
+     El nombre de cada tabla es el parámetro `table` de las demás herramientas.
+    Returns:
+        str: JSON con las tablas del catálogo.
+    """
+
+    try:
+        tables = await asyncio.to_thread(catalog.tables.entries)
+    except ValueError as e:
+        return str(e)
+    return json.dumps([config.as_dict() for config in tables.values()], ensure_ascii=False)
+
+@mcp.tool()
+async def describe_table(table: str | None = None) -> str:
+    """
+    Describe una tabla consultable: columnas, tipos Athena y claves de partición.
+     Usar antes de armar métricas, agrupaciones o filtros en lugar de adivinar nombres de columna.
+    Args:
+        table (str | None): Tabla del catálogo (por defecto la tabla principal).
+    Returns:
+        str: JSON con la definición de la tabla según el catálogo de Glue y su configuración.
+    """
+
+    try:
+        config = await resolve_table(table)
+        definition = await asyncio.to_thread(glue_catalog.schemas.get, config.database, config.table)
+    except ValueError as e:
+        return str(e)
+    except (ClientError, BotoCoreError) as e:
+        return f"Error reading table schema: {str(e)}"
+    return json.dumps({**definition.as_dict(), "catalog": config.as_dict()}, ensure_ascii=False)
+
+@mcp.tool()
+def get_server_stats() -> str:
+    """
+    Devuelve métricas internas del servidor.
+    Returns:
+        str: JSON con los contadores de conexiones por cliente AWS, del control de admisión,
+            de los circuit breakers, de la caché (lecturas con cobertura y escritura diferida)
+            la memoria ahorrada al materializar resultados, el uso del pool de render
+            las decisiones del enrutador de consultas (DuckDB / Athena), del planificador
+            la caché de esquemas de Glue, el catálogo de tablas, los índices de búsqueda
+            las lecturas de perfiles y las lecturas y avisos de recursos.
+    """
+
+    stats = {
+        "aws_connections": aws_clients.connection_stats(),
+        "admission": admission.controller.snapshot(),
+        "breakers": {name: breaker.snapshot() for name, breaker in resilience.breakers.items()},
+        "cache_hedging": cache.hedging.snapshot(),
+        "cache_write_behind": cache.write_behind.snapshot(),
+        "dataframe_memory": schema_dtypes.snapshot(),
+        "render_pool": render_pool.snapshot(),
+        "query_router": router.snapshot(),
+        "query_planner": planner.snapshot(),
+        "schema_cache": glue_catalog.schemas.snapshot(),
+        "table_catalog": catalog.tables.snapshot(),
+        "search_index": search_index.snapshot(),
+        "profiles": profiles.snapshot(),
+        "resources": resources.snapshot()
+    }
+
+    return json.dumps(stats)
+
+
+def serve(transport: str = MCP_TRANSPORT):
+    """
+    Arranca el servidor. En los transportes HTTP, si CACHE_FLUSH_ON_RESPONSE está activo,
+    la escritura diferida de la caché se vuelca antes de cerrar cada respuesta. Solo con
+    streamable-http esa respuesta sigue al fin de la herramienta; con SSE en Lambda la caché
+    se escribe de forma síncrona (ver CACHE_WRITE_BEHIND).
+    """
+
+    for config in catalog.tables.entries().values():
+        glue_catalog.schemas.warm(config.database, [config.table])
+
+    if transport not in ("sse", "streamable-http") or not cache.CACHE_FLUSH_ON_RESPONSE:
+        mcp.run(transport=transport)  # type: ignore
+        return
+
+    app = mcp.sse_app() if transport == "sse" else mcp.streamable_http_app()
+    uvicorn.run(
+        cache.FlushOnResponse(app, cache.write_behind, cache.CACHE_FLUSH_RESPONSE_SECONDS),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower()
+    )
+
 
 if __name__ == "__main__":
-    mcp.run(transport="sse")
+    serve()
@@ -0,0 +1,80 @@
+''' Presupuesto de respuesta y resumen compacto de resultados grandes '''
+
+import os
+import json
+import math
+import pandas as pd
+
+# Límites por defecto de una respuesta; 0 desactiva el límite correspondiente
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "1000"))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", str(256 * 1024)))
+SUMMARY_TOP_N = int(os.getenv("SUMMARY_TOP_N", "5"))
+SUMMARY_SAMPLE_ROWS = int(os.getenv("SUMMARY_SAMPLE_ROWS", "5"))
+
+
+def budget(max_rows: int | None, max_bytes: int | None) -> tuple[int, int]:
+    """Límites efectivos de la petición: los del cliente o los del servidor"""
+    rows = RESULT_MAX_ROWS if max_rows is None else max(0, max_rows)
+    size = RESULT_MAX_BYTES if max_bytes is None else max(0, max_bytes)
+    return rows, size
+
+
+def _scalar(value):
+    """Convierte escalares de numpy/pandas en valores serializables en JSON"""
+    if value is None or value is pd.NaT:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    return value
+
+
+def summarize(df: pd.DataFrame, reason: str, top_n: int = SUMMARY_TOP_N,
+              sample_rows: int = SUMMARY_SAMPLE_ROWS) -> dict:
+    """
+    Resume un resultado demasiado grande para devolverlo completo.
+    Todas las estadísticas se calculan por columna con operaciones vectorizadas de pandas.
+    Args:
+        df (pd.DataFrame): Resultado completo.
+        reason (str): Motivo del resumen (límite superado).
+        top_n (int): Categorías más frecuentes por columna de texto.
+        sample_rows (int): Filas de muestra incluidas.
+    Returns:
+        dict: Filas, estadísticas por columna y muestra.
+    """
+
+    numeric = set(df.select_dtypes(include="number").columns)
+    temporal = set(df.select_dtypes(include="datetime").columns)
+    nulls = df.isna().sum()
+
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        info = {"dtype": str(series.dtype), "nulls": int(nulls[column])}
+        # Estadísticos por columna: agregarlos juntos forzaría un dtype común (enteros a float)
+        if column in numeric:
+            info.update(min=_scalar(series.min()), max=_scalar(series.max()), mean=_scalar(series.mean()))
+        elif column in temporal:
+            info.update(min=_scalar(series.min()), max=_scalar(series.max()))
+        else:
+            top = series.value_counts(dropna=True).head(top_n)
+            info["distinct"] = int(series.nunique(dropna=True))
+            info["top"] = {str(value): int(count) for value, count in top.items()}
+        columns[str(column)] = info
+
+    sample = df.sample(n=min(sample_rows, len(df)), random_state=0).sort_index() if len(df) else df
+    return {
+        "summary": True,
+        "reason": reason,
+        "rows": len(df),
+        "columns": columns,
+        "sample": json.loads(sample.to_json(orient="records", date_format="iso")),
+    }
+
+
+def render_summary(df: pd.DataFrame, reason: str) -> str:
+    """Resumen serializado como JSON compacto"""
+    return json.dumps(summarize(df, reason), ensure_ascii=False, separators=(",", ":"), default=str)
@@ -0,0 +1,11 @@
+''' Configuración común de las pruebas unitarias de los módulos del servidor MCP (src/) '''
+
+import os
+import sys
+
+# Los módulos del servidor crean sus clientes boto3 al importarse (sin llamar a AWS)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("CACHE_TABLE_NAME", "")
+
+# Al final del path: src/ incluye su propia copia de typing_extensions para el paquete de Lambda
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
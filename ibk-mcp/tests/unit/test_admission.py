@@ -0,0 +1,141 @@
+import time
+import asyncio
+import boto3
+import pytest
+from moto import mock_aws
+
+import admission
+from resilience import Deadline
+
+TABLE = "admission-test"
+
+
+@pytest.fixture(name="table")
+def fixture_table():
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        yield dynamodb.create_table(
+            TableName=TABLE,
+            KeySchema=[{"AttributeName": "name_table", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "name_table", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+
+def controller(table, max_concurrency=1, max_queue=10, lease_seconds=60):
+    return admission.AdmissionController(table, max_concurrency, max_queue, lease_seconds, poll_seconds=0.01)
+
+
+def slots(table) -> dict:
+    return {item["name_table"]: item for item in table.scan()["Items"]}
+
+
+def test_slot_is_leased_and_released(table):
+    gate = controller(table, max_concurrency=2)
+
+    async def run():
+        async with gate.slot("a") as slot:
+            held = slots(table)
+        return slot, held
+
+    slot, held = asyncio.run(run())
+    assert slot.startswith(admission.SLOT_PREFIX)
+    assert held[slot]["holder"] == gate.owner
+    assert held[slot]["lease_until"] > time.time()
+    assert slots(table) == {}
+    assert gate.stats == {"admitted": 1, "rejected": 0, "released": 1}
+
+
+def test_expired_lease_is_reclaimed(table):
+    gate = controller(table)
+    slot = f"{admission.SLOT_PREFIX}0"
+    table.put_item(Item={"name_table": slot, "holder": "otra-instancia", "lease_until": int(time.time()) + 60})
+    assert gate._try_acquire() is None  # pylint: disable=protected-access
+
+    # La instancia que lo tenía murió sin liberarlo: su préstamo vence y el slot se reutiliza
+    table.put_item(Item={"name_table": slot, "holder": "otra-instancia", "lease_until": int(time.time()) - 1})
+    assert gate._try_acquire() == slot  # pylint: disable=protected-access
+    assert slots(table)[slot]["holder"] == gate.owner
+
+
+def test_release_does_not_free_a_slot_taken_by_another_holder(table):
+    gate = controller(table)
+    slot = gate._try_acquire()  # pylint: disable=protected-access
+    table.put_item(Item={"name_table": slot, "holder": "otra-instancia", "lease_until": int(time.time()) + 60})
+    gate._release(slot)  # pylint: disable=protected-access
+    assert slots(table)[slot]["holder"] == "otra-instancia"
+
+
+def test_weighted_fair_queuing_interleaves_clients(table):
+    gate = controller(table)
+    order = []
+
+    async def request(client_id: str):
+        async with gate.slot(client_id):
+            order.append(client_id)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        # Un cliente con ráfaga encola primero; el otro no espera a que termine toda la ráfaga
+        burst = [asyncio.create_task(request("batch")) for _ in range(4)]
+        await asyncio.sleep(0)
+        late = asyncio.create_task(request("chat"))
+        await asyncio.gather(*burst, late)
+
+    asyncio.run(run())
+    assert order == ["batch", "chat", "batch", "batch", "batch"]
+
+
+def test_weights_favor_heavier_clients(table, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_CLIENT_WEIGHTS", {"chat": 3})
+    gate = controller(table)
+    order = []
+
+    async def request(client_id: str):
+        async with gate.slot(client_id):
+            order.append(client_id)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        tasks = [asyncio.create_task(request("batch")) for _ in range(3)]
+        tasks += [asyncio.create_task(request("chat")) for _ in range(3)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    # Con peso 3 el cliente "chat" avanza a un tercio del coste por turno
+    assert order == ["chat", "chat", "batch", "chat", "batch", "batch"]
+
+
+def test_wait_past_deadline_is_rejected(table):
+    gate = controller(table)
+
+    async def run():
+        async with gate.slot("a"):
+            with pytest.raises(admission.AdmissionRejected, match="Servidor ocupado"):
+                async with gate.slot("b", Deadline(0.05)):
+                    pass
+        # El turno abandonado no retiene el slot
+        async with gate.slot("c", Deadline(1)):
+            pass
+
+    asyncio.run(run())
+    assert gate.stats["rejected"] == 1
+    assert gate.stats["admitted"] == 2
+    assert slots(table) == {}
+
+
+def test_full_queue_is_rejected_immediately(table):
+    gate = controller(table, max_queue=1)
+
+    async def run():
+        async with gate.slot("a"):
+            waiting = asyncio.create_task(gate.slot("b").__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(admission.AdmissionRejected) as error:
+                async with gate.slot("c"):
+                    pass
+            waiting.cancel()
+            return error.value
+
+    rejected = asyncio.run(run())
+    assert rejected.retry_after >= 1
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+import aggregations
+
+COLUMN_TYPES = {
+    "fecha_proceso": "string",
+    "categoria": "string",
+    "monto": "decimal(18,2)",
+    "x": "bigint",
+    "distinct_x": "bigint",
+}
+
+
+def test_parse_period_range_single_day_and_range():
+    assert aggregations.parse_period_range("2024-01-05") == ("2024-01-05", "2024-01-05")
+    assert aggregations.parse_period_range(" 2024-01-05 : 2024-01-07 ") == ("2024-01-05", "2024-01-07")
+    assert aggregations.period_values("2024-02-28", "2024-03-01") == ["2024-02-28", "2024-02-29", "2024-03-01"]
+
+
+@pytest.mark.parametrize("periodo_range, message", [
+    ("2024-01-05:2024-01-01", "invertido"),
+    ("2024-13-01", "inválido"),
+    ("2024-01-01:2024-01-02:2024-01-03", "inválido"),
+    ("2024-01-01:2024-01-03", "máximo de 2 días"),
+])
+def test_parse_period_range_rejects(periodo_range, message):
+    with pytest.raises(ValueError, match=message):
+        aggregations.parse_period_range(periodo_range, max_days=2)
+
+
+def test_build_query_groups_and_asks_one_extra_group():
+    query, cache_key = aggregations.build_query(
+        "db", "tabla", COLUMN_TYPES, "2024-01-01:2024-01-31", ["categoria", "categoria"],
+        ["sum(monto)", "count(*)", "SUM(monto)"]
+    )
+    assert 'SELECT "categoria", sum("monto") AS "sum_monto", count(*) AS "count"' in query
+    assert "fecha_proceso BETWEEN '2024-01-01' AND '2024-01-31'" in query
+    assert 'GROUP BY "categoria"' in query
+    assert f"LIMIT {aggregations.AGGREGATE_MAX_GROUPS + 1}" in query
+    assert cache_key.startswith("aggregate_")
+
+    # La clave depende del contenido, no de la forma de escribirlo
+    _, same_key = aggregations.build_query(
+        "db", "tabla", COLUMN_TYPES, "2024-01-01:2024-01-31", ["categoria"], ["sum(monto)", "count(*)"]
+    )
+    assert same_key == cache_key
+
+
+def test_build_query_without_groups_has_no_limit():
+    query, _ = aggregations.build_query("db", "tabla", COLUMN_TYPES, "2024-01-01", [], ["count_distinct(x)"])
+    assert 'count(DISTINCT "x") AS "count_distinct_x"' in query
+    assert "GROUP BY" not in query and "LIMIT" not in query
+
+
+@pytest.mark.parametrize("group_by, metrics, message", [
+    ([], ["count(distinct_x)", "count_distinct(x)"], "misma columna count_distinct_x"),
+    (["categoria"], ["median(monto)"], "Métrica inválida"),
+    ([], ["sum(*)"], "Solo count"),
+    ([], ["avg(categoria)"], "numérica"),
+    (["desconocida"], ["count(*)"], "Columna desconocida"),
+    ([], [], "al menos una métrica"),
+])
+def test_build_query_rejects(group_by, metrics, message):
+    with pytest.raises(ValueError, match=message):
+        aggregations.build_query("db", "tabla", COLUMN_TYPES, "2024-01-01", group_by, metrics)
+
+
+def test_build_query_rejects_alias_equal_to_group_column():
+    column_types = {**COLUMN_TYPES, "count": "bigint"}
+    with pytest.raises(ValueError, match="coinciden con columnas de agrupación"):
+        aggregations.build_query("db", "tabla", column_types, "2024-01-01", ["count"], ["count(*)"])
+
+
+def test_truncate_reports_extra_group(monkeypatch):
+    monkeypatch.setattr(aggregations, "AGGREGATE_MAX_GROUPS", 2)
+    df, truncated = aggregations.truncate(pd.DataFrame({"g": [1, 2, 3]}))
+    assert truncated and df["g"].tolist() == [1, 2]
+    df, truncated = aggregations.truncate(pd.DataFrame({"g": [1, 2]}))
+    assert not truncated and len(df) == 2
@@ -0,0 +1,45 @@
+import approximate
+
+COLUMN_TYPES = {"monto": "double", "segmento": "string", "periodo": "string"}
+
+
+def query(exact_percentiles: bool) -> str:
+    return approximate.build_query("db", "t", COLUMN_TYPES, "2024-01-01", ["monto"], [0.5], exact=True,
+                                   partition_column="periodo", exact_percentiles=exact_percentiles)
+
+
+def test_exact_percentiles_are_gated_on_the_estimate(monkeypatch):
+    monkeypatch.setattr(approximate, "APPROX_EXACT_PERCENTILE_MAX_ROWS", 1000)
+    monkeypatch.setattr(approximate, "APPROX_EXACT_PERCENTILE_MAX_BYTES", 10_000)
+    assert approximate.exact_percentiles_allowed(1000, 10**12)
+    assert not approximate.exact_percentiles_allowed(1001, 1)
+    # Sin estadísticas de filas se decide por bytes; sin estimación no se arriesga
+    assert approximate.exact_percentiles_allowed(None, 10_000)
+    assert not approximate.exact_percentiles_allowed(None, 10_001)
+    assert not approximate.exact_percentiles_allowed(None, None)
+
+
+def test_exact_query_omits_sorted_arrays_over_the_limit():
+    assert "array_sort(array_agg(" in query(True)
+    omitted = query(False)
+    assert "array_agg" not in omitted
+    assert 'CAST(NULL AS double) AS "monto__p50"' in omitted
+    assert "count(DISTINCT" in omitted
+
+
+def test_result_reports_the_percentile_path():
+    row = {"rows": 10, "monto__distinct": 5, "monto__count": 10, "monto__min": 1.0, "monto__max": 9.0,
+           "monto__avg": 5.0, "monto__stddev": 2.0, "monto__p50": None}
+    exact = approximate.interpret(row, COLUMN_TYPES, ["monto"], [0.5], None, True, exact_percentiles=False)
+    assert exact["percentile_method"] == "omitted"
+    assert exact["columns"]["monto"]["percentiles"]["p50"]["value"] is None
+
+    approx = approximate.interpret({**row, "monto__p50": 5.0}, COLUMN_TYPES, ["monto"], [0.5], None, False)
+    assert approx["percentile_method"] == "approx_percentile"
+    approx["query"] = exact["query"] = {"elapsed_seconds": 1, "bytes_scanned": 1}
+    assert approximate.compare(approx, exact)["relative_error"]["monto"]["p50"] is None
+
+
+def test_cache_key_separates_exact_runs_without_percentiles():
+    keys = {approximate.cache_key("t", "2024-01-01", ["monto"], [0.5], None, True, flag) for flag in (True, False)}
+    assert len(keys) == 2
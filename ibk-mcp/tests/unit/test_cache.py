@@ -0,0 +1,243 @@
+import time
+import asyncio
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import cache
+from resilience import CircuitBreaker, Deadline
+
+
+class FakeTable:
+    """Tabla en memoria que rechaza, como DynamoDB, los lotes con algún ítem demasiado grande"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items = {}
+        self.batches = 0
+
+    def _check(self, item):
+        if cache.item_size(item) > self.max_bytes:
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "Item size too large"}}, "PutItem")
+
+    def put_item(self, Item):  # pylint: disable=invalid-name
+        self._check(Item)
+        self.items[Item["name_table"]] = Item
+
+    def batch_writer(self):
+        table = self
+
+        class Writer:
+            def __init__(self):
+                self.buffer = []
+
+            def __enter__(self):
+                return self
+
+            def put_item(self, Item):  # pylint: disable=invalid-name
+                self.buffer.append(Item)
+
+            def __exit__(self, *exc):
+                table.batches += 1
+                for item in self.buffer:
+                    table._check(item)  # pylint: disable=protected-access
+                table.items.update({item["name_table"]: item for item in self.buffer})
+                return False
+
+        return Writer()
+
+
+def queue(table, max_item_bytes=1000):
+    return cache.WriteBehindQueue(table, interval=60, batch_size=25, max_pending=10, max_item_bytes=max_item_bytes)
+
+
+def test_item_size_counts_names_and_values():
+    item = cache._item("k", b"x" * 100, 60, rows=3)  # pylint: disable=protected-access
+    size = cache.item_size(item)
+    assert size >= 100 + len("payload") + len("name_table")
+    assert size < 300
+
+
+def test_enqueue_rejects_oversized_items():
+    async def run():
+        pending = queue(FakeTable(10_000), max_item_bytes=200)
+        pending.enqueue(cache._item("big", b"x" * 500, 60, None))  # pylint: disable=protected-access
+        return pending
+
+    pending = asyncio.run(run())
+    assert pending.pending() == 0
+    assert pending.stats["oversized"] == 1
+
+
+def test_invalid_item_does_not_fail_the_whole_batch():
+    table = FakeTable(max_bytes=300)
+    pending = queue(table, max_item_bytes=10_000)
+
+    async def run():
+        pending.enqueue(cache._item("ok-1", b"a", 60, 1))  # pylint: disable=protected-access
+        pending.enqueue(cache._item("too-big", b"x" * 500, 60, 1))  # pylint: disable=protected-access
+        pending.enqueue(cache._item("ok-2", b"b", 60, 1))  # pylint: disable=protected-access
+
+    asyncio.run(run())
+    pending.drain(timeout=1)
+
+    assert set(table.items) == {"ok-1", "ok-2"}
+    assert pending.stats["flushed"] == 2
+    assert pending.stats["failed"] == 1
+
+
+class FlakyTable(FakeTable):
+    """Rechaza el lote por un ítem inválido y pierde la conexión al escribir los ítems uno a uno"""
+
+    def put_item(self, Item):  # pylint: disable=invalid-name
+        if Item["name_table"] == "unreachable":
+            raise EndpointConnectionError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+        super().put_item(Item)
+
+
+def test_connection_error_in_the_per_item_fallback_is_counted(monkeypatch):
+    breaker = CircuitBreaker("dynamodb", failure_threshold=5)
+    monkeypatch.setattr(cache, "breaker", breaker)
+    table = FlakyTable(max_bytes=300)
+    pending = queue(table, max_item_bytes=10_000)
+
+    async def run():
+        pending.enqueue(cache._item("too-big", b"x" * 500, 60, 1))  # pylint: disable=protected-access
+        pending.enqueue(cache._item("ok", b"a", 60, 1))  # pylint: disable=protected-access
+        pending.enqueue(cache._item("unreachable", b"b", 60, 1))  # pylint: disable=protected-access
+        pending.enqueue(cache._item("after", b"c", 60, 1))  # pylint: disable=protected-access
+
+    asyncio.run(run())
+    # El error de red no escapa de flush_once (mataría el volcado en segundo plano)
+    assert pending.flush_once() == 4
+
+    assert set(table.items) == {"ok"}
+    assert pending.stats["flushed"] == 1
+    assert pending.stats["failed"] == 3
+    assert breaker.stats["failures"] == 1
+
+
+def test_counters_account_for_every_queued_write():
+    pending = queue(FakeTable(10_000))
+
+    async def run():
+        for key in ("a", "b", "a", "c"):
+            pending.enqueue(cache._item(key, b"v", 60, 1))  # pylint: disable=protected-access
+        pending.discard("b")
+        pending.discard("missing")
+
+    asyncio.run(run())
+    assert pending.stats["coalesced"] == 1
+    assert pending.stats["discarded"] == 1
+    pending.drain(timeout=1)
+
+    stats = pending.snapshot()
+    settled = ("flushed", "failed", "dropped", "coalesced", "discarded", "pending")
+    assert stats["queued"] == sum(stats[name] for name in settled)
+
+
+def test_lookup_serves_pending_writes():
+    pending = queue(FakeTable(10_000))
+    original = cache.write_behind
+    cache.write_behind = pending
+    try:
+        async def run():
+            pending.enqueue(cache._item("period", b"payload", 60, 7))  # pylint: disable=protected-access
+            return await cache.lookup("period", Deadline())
+
+        entry = asyncio.run(run())
+    finally:
+        cache.write_behind = original
+
+    assert entry is not None
+    assert entry.payload == b"payload"
+    assert entry.rows == 7
+    assert entry.fresh
+    assert entry.etag == cache.content_etag(b"payload")
+
+
+def test_flush_on_response_writes_before_the_last_chunk():
+    table = FakeTable(10_000)
+    pending = queue(table)
+    sent = []
+
+    async def app(scope, receive, send):
+        pending.enqueue(cache._item("k", b"v", 60, 1))  # pylint: disable=protected-access
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"partial", "more_body": True})
+        await send({"type": "http.response.body", "body": b"end"})
+
+    async def send(message):
+        sent.append((message["type"], dict(table.items)))
+
+    asyncio.run(cache.FlushOnResponse(app, pending, timeout=1)({"type": "http"}, None, send))
+
+    assert sent[1][1] == {}
+    assert "k" in sent[2][1]
+    assert pending.pending() == 0
+
+
+def test_save_skips_empty_results(monkeypatch):
+    pending = queue(FakeTable(10_000))
+    monkeypatch.setattr(cache, "write_behind", pending)
+    monkeypatch.setattr(cache, "cache_table", FakeTable(10_000))
+    monkeypatch.setattr(cache, "CACHE_WRITE_BEHIND", True)
+
+    async def run():
+        await cache.save("empty", b"payload", Deadline(), rows=0)
+        await cache.save("full", b"payload", Deadline(), rows=3)
+
+    asyncio.run(run())
+    assert pending.get("empty") is None
+    assert pending.get("full") is not None
+
+
+def test_hedge_rate_is_capped_from_the_first_read():
+    policy = cache.HedgePolicy(percentile=95, max_rate=0.05, min_ms=5, default_ms=50)
+    allowed = 0
+    for _ in range(100):
+        policy.stats["reads"] += 1
+        if policy.allow_hedge():
+            policy.stats["hedges"] += 1
+            allowed += 1
+        # Nunca por encima del tope, tampoco con pocas lecturas
+        assert policy.stats["hedges"] <= policy.stats["reads"] * policy.max_rate
+
+    assert allowed == 5
+    assert policy.snapshot()["hedge_rate"] == 0.05
+
+
+def test_hedged_read_wins_over_a_slow_primary(monkeypatch):
+    policy = cache.HedgePolicy(percentile=95, max_rate=1, min_ms=1, default_ms=10)
+    monkeypatch.setattr(cache, "hedging", policy)
+    calls = []
+
+    def get_cached_result(key):
+        calls.append(key)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            return None
+        return cache.CacheEntry(payload=b"hedged", expires_at=0)
+
+    monkeypatch.setattr(cache, "get_cached_result", get_cached_result)
+
+    entry = asyncio.run(cache.hedged_get("k"))
+    assert entry.payload == b"hedged"
+    assert calls == ["k", "k"]
+    assert policy.stats["hedges"] == 1
+    assert policy.stats["hedge_wins"] == 1
+
+
+def test_hedged_read_is_skipped_over_the_cap(monkeypatch):
+    policy = cache.HedgePolicy(percentile=95, max_rate=0.05, min_ms=1, default_ms=10)
+    monkeypatch.setattr(cache, "hedging", policy)
+    calls = []
+
+    def get_cached_result(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return None
+
+    monkeypatch.setattr(cache, "get_cached_result", get_cached_result)
+
+    assert asyncio.run(cache.hedged_get("k")) is None
+    assert calls == ["k"]
+    assert policy.stats["hedges"] == 0
@@ -0,0 +1,65 @@
+import json
+import base64
+import pandas as pd
+import pytest
+
+import formats
+
+
+@pytest.fixture(name="df")
+def fixture_df():
+    return pd.DataFrame({
+        "id": pd.array([1, None, 3], dtype="Int16"),
+        "monto": pd.array([1.5, None, 2.0], dtype="Float64"),
+        "nota": ["x", "linea 1\nlinea|2", None],
+    })
+
+
+def test_json_is_columnar_and_keeps_nullable_ints(df):
+    payload = json.loads(formats.render(df, "json"))
+    assert payload["columns"] == ["id", "monto", "nota"]
+    assert payload["data"]["id"] == [1, None, 3]
+    assert all(isinstance(value, int) for value in payload["data"]["id"] if value is not None)
+    assert payload["data"]["monto"] == [1.5, None, 2.0]
+    assert payload["data"]["nota"] == ["x", "linea 1\nlinea|2", None]
+
+
+def test_markdown_keeps_one_line_per_row(df):
+    lines = formats.render(df, "markdown").split("\n")
+    assert lines[0] == "| id | monto | nota |"
+    assert len(lines) == 2 + len(df)
+    assert lines[3].endswith(r"| linea 1<br>linea\|2 |")
+
+
+def test_markdown_escapes_header_and_can_omit_it():
+    df = pd.DataFrame({"a\nb": [1]})
+    assert formats.render(df, "markdown").split("\n")[0] == "| a<br>b |"
+    assert formats.render(df, "markdown", header=False) == "| 1 |"
+
+
+def test_markdown_renders_nulls_as_empty_cells():
+    df = pd.DataFrame({
+        "id": pd.array([1, None], dtype="Int64"),
+        "nota": pd.Series(["a", None], dtype=object),
+        "monto": [1.5, float("nan")],
+    })
+    assert formats.render(df, "markdown", header=False).split("\n") == ["| 1 | a | 1.5 |", "|  |  |  |"]
+
+
+def test_csv_and_text_headers(df):
+    assert formats.render(df, "csv").splitlines()[0] == "id,monto,nota"
+    assert "id" not in formats.render(df, "csv", header=False)
+    assert "monto" in formats.render(df, "text")
+
+
+def test_arrow_round_trip_preserves_dtypes(df):
+    restored = formats.from_payload(base64.b64decode(formats.render(df, "arrow")))
+    pd.testing.assert_frame_equal(restored, formats.from_payload(formats.to_payload(df)))
+    assert str(restored["id"].dtype) == "Int16"
+    assert str(restored["monto"].dtype) == "Float64"
+    assert restored["id"].tolist()[0] == 1 and pd.isna(restored["id"].tolist()[1])
+
+
+def test_unknown_format_is_rejected(df):
+    with pytest.raises(ValueError, match="Formato no soportado"):
+        formats.render(df, "xml")
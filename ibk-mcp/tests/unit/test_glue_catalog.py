@@ -0,0 +1,41 @@
+import catalog
+import glue_catalog
+
+
+class FakeGlue:
+    """Cliente de Glue con una tabla cuya versión cambia al modificar sus columnas"""
+
+    def __init__(self):
+        self.version = 1
+        self.calls = 0
+
+    def get_table(self, DatabaseName, Name):  # pylint: disable=invalid-name
+        self.calls += 1
+        return {"Table": {
+            "Name": Name,
+            "DatabaseName": DatabaseName,
+            "VersionId": str(self.version),
+            "StorageDescriptor": {"Columns": [{"Name": "id", "Type": "bigint"}], "Location": "s3://datos/t/"},
+            "PartitionKeys": [{"Name": "periodo", "Type": "string"}],
+        }}
+
+
+def test_schema_version_change_rekeys_table_cache_entries(monkeypatch):
+    glue = FakeGlue()
+    schemas = glue_catalog.SchemaCache(ttl=900)
+    monkeypatch.setattr(glue_catalog.aws_clients, "get_client", lambda service_name: glue)
+    monkeypatch.setattr(glue_catalog, "schemas", schemas)
+    config = catalog.TableConfig(name="tx", database="db", table="t")
+
+    # Sin esquema cargado la clave no lleva versión (y no se llama a Glue)
+    assert config.cache_key("period_2024-01-01") == "tx#period_2024-01-01"
+    assert glue.calls == 0
+
+    schemas.get("db", "t")
+    before = config.cache_key("period_2024-01-01")
+    assert before == "tx@1#period_2024-01-01"
+
+    glue.version = 2
+    schemas._refresh("db", "t")  # pylint: disable=protected-access
+    assert schemas.stats["version_changes"] == 1
+    assert config.cache_key("period_2024-01-01") == "tx@2#period_2024-01-01" != before
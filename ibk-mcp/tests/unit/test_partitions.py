@@ -0,0 +1,25 @@
+from collections import OrderedDict
+
+import partitions
+
+
+def test_listing_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(partitions, "PARTITION_CACHE_MAX_ENTRIES", 2)
+    cache = OrderedDict()
+    loads = []
+
+    def load(key):
+        def loader():
+            loads.append(key)
+            return key.upper()
+        return loader
+
+    for key in ("a", "b", "a", "c"):
+        assert partitions._cached(cache, key, load(key)) == key.upper()  # pylint: disable=protected-access
+
+    # "a" se usó después de "b", así que al llegar "c" se descarta "b"
+    assert list(cache) == ["a", "c"]
+    assert loads == ["a", "b", "c"]
+    partitions._cached(cache, "b", load("b"))  # pylint: disable=protected-access
+    assert loads == ["a", "b", "c", "b"]
+    assert len(cache) == 2
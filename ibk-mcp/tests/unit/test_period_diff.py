@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+import period_diff
+
+COLUMN_TYPES = {"fecha_proceso": "string", "id_cliente": "string", "monto": "double", "canal": "string"}
+METRICS = [("sum", "monto", "sum_monto"), ("count", "*", "count")]
+
+
+@pytest.fixture(name="frames")
+def fixture_frames():
+    df_a = pd.DataFrame({
+        "id_cliente": ["c1", "c1", "c2", "c3", "c5"],
+        "monto": [10.0, 5.0, 7.0, 1.0, 2.0],
+        "fecha_proceso": "2024-01-01",
+    })
+    df_b = pd.DataFrame({
+        "id_cliente": ["c1", "c1", "c2", "c4", "c5"],
+        "monto": [10.0, 5.0, 8.0, 3.0, 2.0],
+        "fecha_proceso": "2024-01-02",
+    })
+    return df_a, df_b
+
+
+def test_parse_normalizes_and_deduplicates():
+    a, b, keys, metrics = period_diff.parse(
+        COLUMN_TYPES, "2024-01-01", "2024-01-02", ["id_cliente", "id_cliente"], ["sum(monto)", "count(*)", "sum(monto)"]
+    )
+    assert (a, b, keys) == ("2024-01-01", "2024-01-02", ["id_cliente"])
+    assert metrics == METRICS
+
+
+def test_diff_frames_classifies_changes_in_key_order(frames):
+    diff = period_diff.diff_frames(*frames, ["id_cliente"], METRICS)
+    assert diff["id_cliente"].tolist() == ["c2", "c3", "c4"]
+    assert diff["change"].tolist() == ["changed", "removed", "added"]
+    assert diff.columns.tolist() == ["id_cliente", "change", "sum_monto_a", "sum_monto_b", "count_a", "count_b"]
+    assert diff.loc[0, ["sum_monto_a", "sum_monto_b"]].tolist() == [7.0, 8.0]
+
+
+def test_covers_requires_keys_and_metric_columns(frames):
+    assert period_diff.covers(frames[0], ["id_cliente"], METRICS)
+    assert not period_diff.covers(frames[0], ["canal"], METRICS)
+    assert not period_diff.covers(frames[0], ["id_cliente"], [("max", "canal", "max_canal")])
+
+
+def test_report_counts_and_totals(frames, monkeypatch):
+    monkeypatch.setattr(period_diff, "COMPARE_MAX_ROWS", 2)
+    diff = period_diff.diff_frames(*frames, ["id_cliente"], METRICS)
+    totals = period_diff.totals_frames(*frames, "2024-01-01", "2024-01-02", METRICS)
+    report = period_diff.report(diff, totals, "2024-01-01", "2024-01-02", METRICS, "cache")
+
+    assert report["changes"] == {"added": 1, "removed": 1, "changed": 1}
+    assert report["truncated"] and len(report["rows"]) == 2
+    assert report["totals"]["sum_monto"] == {"a": 25.0, "b": 28.0, "delta": 3.0, "delta_pct": 12.0}
+    assert report["totals"]["count"]["delta"] == 0
+
+
+def test_diff_query_counts_are_complete_when_truncated(frames, monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+    monkeypatch.setattr(period_diff, "COMPARE_MAX_ROWS", 1)
+    df_a, df_b = frames
+    connection = duckdb.connect()
+    connection.execute("CREATE SCHEMA db")
+    connection.register("frames", pd.concat([df_a, df_b]))
+    connection.execute("CREATE TABLE db.tabla AS SELECT * FROM frames")
+
+    query = period_diff.build_diff_query("db", "tabla", "2024-01-01", "2024-01-02", ["id_cliente"], METRICS)
+    diff = connection.execute(query).df()
+    # La página tiene COMPARE_MAX_ROWS + 1 filas, ordenadas por clave
+    assert diff["id_cliente"].tolist() == ["c2", "c3"]
+
+    totals = connection.execute(
+        period_diff.build_totals_query("db", "tabla", "2024-01-01", "2024-01-02", METRICS)
+    ).df()
+    report = period_diff.report(diff, totals, "2024-01-01", "2024-01-02", METRICS, "query")
+    assert report["changes"] == {"added": 1, "removed": 1, "changed": 1}
+    assert report["truncated"]
+    assert [row["id_cliente"] for row in report["rows"]] == ["c2"]
+    assert "__added" not in report["rows"][0]
+
+
+def test_diff_query_without_changes_reports_zero(frames):
+    duckdb = pytest.importorskip("duckdb")
+    connection = duckdb.connect()
+    connection.execute("CREATE SCHEMA db")
+    connection.register("frames", frames[0])
+    connection.execute("CREATE TABLE db.tabla AS SELECT * FROM frames")
+    query = period_diff.build_diff_query("db", "tabla", "2024-01-01", "2024-01-01", ["id_cliente"], METRICS)
+    diff = connection.execute(query).df()
+    report = period_diff.report(diff, pd.DataFrame(columns=["periodo"]), "2024-01-01", "2024-01-01", METRICS, "query")
+    assert report["changes"] == {"added": 0, "removed": 0, "changed": 0}
+    assert report["rows"] == []
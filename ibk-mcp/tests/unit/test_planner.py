@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+
+import partitions
+import planner
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM t WHERE fecha_proceso = '2024-01-01'", True),
+    ("select * from t where x = 1 and FECHA_PROCESO in ('2024-01-01')", True),
+    ("SELECT * FROM t\nWHERE\n  fecha_proceso BETWEEN '2024-01-01' AND '2024-01-31'", True),
+    ("SELECT * FROM t", False),
+    ("SELECT fecha_proceso FROM t WHERE monto > 0", False),
+    ("SELECT * FROM t WHERE fecha_proceso_carga = '2024-01-01'", False),
+    ("SELECT * FROM t WHERE fecha_proceso >= '2024-01-01'", False),
+])
+def test_has_partition_predicate(query, expected):
+    assert planner.has_partition_predicate(query, "fecha_proceso") is expected
+
+
+def estimate(values: list[str], present: list[str], size: int = 100) -> partitions.ScanEstimate:
+    return partitions.ScanEstimate(
+        partitions=[partitions.Partition(value, f"s3://b/t/fecha_proceso={value}/", "parquet") for value in present],
+        bytes=size * len(present),
+        source="glue",
+        missing=sorted(set(values) - set(present)),
+    )
+
+
+def preflight(monkeypatch, values, present, budget=None, require_all=True, size=100):
+    monkeypatch.setattr(partitions, "estimate_scan", lambda *args: estimate(values, present, size))
+    query = "SELECT * FROM db.t WHERE fecha_proceso IN ('x')"
+    return asyncio.run(planner.preflight(query, "db", "t", "fecha_proceso", values, budget, require_all))
+
+
+def test_preflight_requires_partition_predicate():
+    with pytest.raises(planner.QueryRejected, match="columna de partición"):
+        asyncio.run(planner.preflight("SELECT * FROM db.t", "db", "t", "fecha_proceso", ["2024-01-01"]))
+
+
+def test_preflight_reports_missing_partition(monkeypatch):
+    with pytest.raises(planner.PartitionNotFound, match="Partición no encontrada en t: 2024-01-02"):
+        preflight(monkeypatch, ["2024-01-01", "2024-01-02"], ["2024-01-01"])
+
+
+def test_preflight_ranges_tolerate_gaps(monkeypatch):
+    plan = preflight(monkeypatch, ["2024-01-01", "2024-01-02"], ["2024-01-01"], require_all=False)
+    assert plan.estimate.missing == ["2024-01-02"]
+    with pytest.raises(planner.PartitionNotFound):
+        preflight(monkeypatch, ["2024-01-01", "2024-01-02"], [], require_all=False)
+
+
+def test_plan_budget_and_sample_percent(monkeypatch):
+    plan = preflight(monkeypatch, ["2024-01-01"], ["2024-01-01"], budget=1000, size=4000)
+    assert plan.over_budget
+    assert plan.sample_percent() == 25.0
+    assert plan.as_meta()["scan_estimate"]["bytes"] == 4000
+
+    monkeypatch.setattr(planner, "PLANNER_MIN_SAMPLE_PERCENT", 50)
+    assert plan.sample_percent() is None
+    assert "sobre el máximo de 1000" in str(planner.reject(plan, "Reduzca el rango."))
+    assert plan.action == "rejected"
+
+
+def test_plan_without_budget_never_over(monkeypatch):
+    plan = preflight(monkeypatch, ["2024-01-01"], ["2024-01-01"], budget=0, size=10 ** 12)
+    assert not plan.over_budget and plan.sample_percent() == 100.0
@@ -0,0 +1,48 @@
+from decimal import Decimal
+import boto3
+import pytest
+from moto import mock_aws
+
+import profiles
+
+
+@pytest.fixture(name="table")
+def fixture_table(monkeypatch):
+    with mock_aws():
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName="profiles-test",
+            KeySchema=[
+                {"AttributeName": "customer_key", "KeyType": "HASH"},
+                {"AttributeName": "as_of", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "customer_key", "AttributeType": "S"},
+                {"AttributeName": "as_of", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for as_of, count in (("2024-01-10", 3), ("2024-01-20", 5), ("2024-01-31", 8)):
+            table.put_item(Item={"customer_key": "42", "as_of": as_of, "count_7d": Decimal(count),
+                                 "amount_7d": Decimal("10.5"), "ttl": 1})
+        table.put_item(Item={"customer_key": "7", "as_of": "2024-01-31", "count_7d": Decimal(1)})
+        monkeypatch.setattr(profiles, "profile_table", table)
+        yield table
+
+
+def test_latest_profile(table):  # pylint: disable=unused-argument
+    profile = profiles.get_profile("42")
+    assert profile == {"customer_key": "42", "as_of": "2024-01-31", "count_7d": 8, "amount_7d": 10.5}
+    assert isinstance(profile["count_7d"], int)
+
+
+def test_profile_as_of_a_cutoff(table):  # pylint: disable=unused-argument
+    # La fotografía vigente a una fecha es la última con as_of <= esa fecha
+    assert profiles.get_profile("42", as_of="2024-01-25")["as_of"] == "2024-01-20"
+    assert profiles.get_profile("42", as_of="2024-01-20")["as_of"] == "2024-01-20"
+    assert profiles.get_profile("42", as_of="2024-01-01") is None
+
+
+def test_unknown_customer(table):  # pylint: disable=unused-argument
+    found = profiles.stats["found"]
+    assert profiles.get_profile("missing") is None
+    assert profiles.stats["found"] == found
@@ -0,0 +1,80 @@
+import sys
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+
+import formats
+import render_pool
+import render_worker
+
+
+def test_workers_start_eagerly_with_render_worker_as_main(monkeypatch):
+    monkeypatch.setattr(render_pool, "RENDER_POOL_WORKERS", 3)
+    mains = []
+
+    class Executor:
+        def submit(self, fn):
+            mains.append((fn, sys.modules["__main__"]))
+
+    main = sys.modules["__main__"]
+    render_pool._start_workers(Executor())  # pylint: disable=protected-access
+    assert mains == [(render_worker.ready, render_worker)] * 3
+    assert sys.modules["__main__"] is main
+
+
+def test_large_results_render_in_pool(monkeypatch):
+    monkeypatch.setattr(render_pool, "RENDER_POOL_MIN_BYTES", 0)
+    df = pd.DataFrame({"id": range(2000), "nota": ["x|y"] * 2000})
+    try:
+        result = asyncio.run(render_pool.render(None, formats.to_payload(df), "markdown"))
+    finally:
+        if render_pool._executor is not None:  # pylint: disable=protected-access
+            render_pool._executor.shutdown()  # pylint: disable=protected-access
+            monkeypatch.setattr(render_pool, "_executor", None)
+    assert result == formats.render(df, "markdown")
+    assert render_pool.stats["pooled"] == 1
+
+
+class BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_recreated_then_disabled(monkeypatch):
+    monkeypatch.setattr(render_pool, "RENDER_POOL_MIN_BYTES", 0)
+    monkeypatch.setattr(render_pool, "RENDER_POOL_MAX_FAILURES", 2)
+    monkeypatch.setattr(render_pool, "_unavailable", False)
+    monkeypatch.setattr(render_pool, "_slots", None)
+    monkeypatch.setattr(render_pool, "stats", dict.fromkeys(render_pool.stats, 0))
+    created = []
+
+    def get_executor():
+        if render_pool._unavailable:  # pylint: disable=protected-access
+            return None
+        if render_pool._executor is None:  # pylint: disable=protected-access
+            created.append(BrokenExecutor())
+            render_pool._executor = created[-1]  # pylint: disable=protected-access
+            render_pool._slots = asyncio.Semaphore(1)  # pylint: disable=protected-access
+        return render_pool._executor  # pylint: disable=protected-access
+
+    monkeypatch.setattr(render_pool, "_executor", None)
+    monkeypatch.setattr(render_pool, "_get_executor", get_executor)
+    df = pd.DataFrame({"id": [1, 2]})
+    payload = formats.to_payload(df)
+
+    for _ in range(3):
+        # Cada render cae al proceso principal en lugar de fallar
+        assert asyncio.run(render_pool.render(df, payload, "csv")) == formats.render(df, "csv")
+
+    assert len(created) == 2
+    assert all(executor.shut_down for executor in created)
+    assert render_pool._executor is None  # pylint: disable=protected-access
+    assert render_pool.snapshot()["enabled"] is False
+    assert render_pool.stats["pool_broken"] == 2
+    assert render_pool.stats["in_process"] == 3
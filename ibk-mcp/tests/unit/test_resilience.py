@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+import awswrangler as wr
+
+import athena
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded
+
+
+class Clock:
+    """Reloj monotónico controlado por el test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.check()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 29
+    assert not breaker.allow()
+    assert breaker.stats == {"successes": 0, "failures": 3, "rejected": 2, "opened": 1}
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    # Un único fallo de la prueba basta para reabrir, aunque no llegue al umbral
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats["opened"] == 2
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_abandoned_probe_can_be_retried(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+
+def test_deadline(clock):
+    deadline = Deadline(10)
+    assert deadline.timeout(30) == 10
+    clock.now += 4
+    assert deadline.timeout(0.5) == 0.5
+    deadline.check("consultar")
+    clock.now += 6
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded, match="consultar"):
+        deadline.check("consultar")
+
+
+class StuckAthena:
+    """Cliente Athena cuya consulta nunca sale de RUNNING"""
+
+    def __init__(self):
+        self.polls = 0
+        self.stopped = []
+
+    def get_query_execution(self, QueryExecutionId):  # pylint: disable=invalid-name
+        self.polls += 1
+        return {"QueryExecution": {
+            "QueryExecutionId": QueryExecutionId,
+            "Status": {"State": "RUNNING"},
+            "Statistics": {"DataScannedInBytes": 0}
+        }}
+
+    def stop_query_execution(self, QueryExecutionId):  # pylint: disable=invalid-name
+        self.stopped.append(QueryExecutionId)
+
+
+def test_run_query_stops_the_query_when_the_deadline_expires(monkeypatch):
+    client = StuckAthena()
+    breaker = CircuitBreaker("athena", failure_threshold=5)
+    monkeypatch.setattr(athena, "breaker", breaker)
+    monkeypatch.setattr(athena, "ATHENA_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(athena.aws_clients, "get_client", lambda service_name: client)
+    monkeypatch.setattr(wr.athena, "start_query_execution", lambda **kwargs: "qid-1")
+
+    def get_query_results(*args, **kwargs):
+        raise AssertionError("no se descarga el resultado de una consulta sin terminar")
+
+    monkeypatch.setattr(wr.athena, "get_query_results", get_query_results)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(athena.run_query("SELECT 1", "db", "s3://bucket/out/", deadline=Deadline(0.1)))
+
+    assert client.polls > 1
+    assert client.stopped == ["qid-1"]
+    assert breaker.stats["failures"] == 1
+    # El slot de admisión se devolvió aunque la consulta se abortara
+    assert not athena.admission.controller._local_slots  # pylint: disable=protected-access
@@ -0,0 +1,139 @@
+import asyncio
+from collections import OrderedDict
+import pandas as pd
+import pytest
+
+import aws_clients
+import partitions
+import router
+from resilience import Deadline
+
+duckdb = pytest.importorskip("duckdb")
+
+
+class FakeGlue:
+    """Cliente de Glue con las particiones en memoria (una página)"""
+
+    def __init__(self, items: list[dict]):
+        self.items = items
+        self.calls = 0
+
+    def get_paginator(self, operation: str):
+        assert operation == "get_partitions"
+        glue = self
+
+        class Paginator:
+            def paginate(self, **_kwargs):
+                glue.calls += 1
+                return [{"Partitions": glue.items}]
+
+        return Paginator()
+
+
+def partition_item(value: str, location: str, parameters: dict | None = None) -> dict:
+    return {
+        "Values": [value],
+        "Parameters": parameters or {},
+        "StorageDescriptor": {
+            "Location": location,
+            "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+        },
+    }
+
+
+@pytest.fixture(name="table_dir")
+def fixture_table_dir(tmp_path):
+    """Tabla Parquet local con particiones estilo Hive, como las escribe el pipeline"""
+    for day, amounts in (("2024-01-01", [1.0, 2.0]), ("2024-01-02", [3.0, 4.0, 5.0])):
+        folder = tmp_path / "tabla" / f"fecha_proceso={day}"
+        folder.mkdir(parents=True)
+        pd.DataFrame({"monto": amounts}).to_parquet(folder / "part-0.parquet")
+        (folder / "_SUCCESS").write_text("")
+    return tmp_path / "tabla"
+
+
+@pytest.fixture(name="glue")
+def fixture_glue(table_dir, monkeypatch):
+    glue = FakeGlue([
+        partition_item("2024-01-01", str(table_dir / "fecha_proceso=2024-01-01"), {"numRows": "2"}),
+        partition_item("2024-01-02", str(table_dir / "fecha_proceso=2024-01-02")),
+    ])
+    monkeypatch.setattr(aws_clients, "get_client", lambda service: glue)
+    monkeypatch.setattr(partitions, "_partitions_cache", OrderedDict())
+    monkeypatch.setattr(partitions, "_listing_cache", OrderedDict())
+    return glue
+
+
+def test_estimate_scan_lists_files_without_glue_stats(glue, table_dir):
+    estimate = partitions.estimate_scan("db", "tabla", "fecha_proceso", ["2024-01-01", "2024-01-02", "2024-01-03"])
+    assert [partition.value for partition in estimate.partitions] == ["2024-01-01", "2024-01-02"]
+    assert estimate.missing == ["2024-01-03"]
+    assert estimate.source == "s3"
+    # _SUCCESS no cuenta: Athena ignora los archivos que empiezan con "_"
+    assert estimate.files["2024-01-02"] == [str(table_dir / "fecha_proceso=2024-01-02" / "part-0.parquet")]
+    assert estimate.bytes == sum(partitions.list_files(str(path))[1] for path in table_dir.iterdir())
+
+
+def test_estimate_scan_uses_glue_stats(glue):
+    glue.items[1]["Parameters"] = {"totalSize": "100", "recordCount": "3"}
+    estimate = partitions.estimate_scan("db", "tabla", "fecha_proceso", ["2024-01-02"])
+    assert (estimate.bytes, estimate.source, estimate.rows, estimate.files) == (100, "glue", 3, {})
+    # Las filas solo se conocen si todas las particiones tienen estadísticas
+    glue.items[0]["Parameters"] = {}
+    partitions._partitions_cache.clear()  # pylint: disable=protected-access
+    assert partitions.estimate_scan("db", "tabla", "fecha_proceso", ["2024-01-01", "2024-01-02"]).rows is None
+
+
+def test_estimate_scan_caches_glue_metadata(glue):
+    partitions.estimate_scan("db", "tabla", "fecha_proceso", ["2024-01-01"])
+    partitions.estimate_scan("db", "tabla", "fecha_proceso", ["2024-01-01"])
+    assert glue.calls == 1
+
+
+def test_route_small_hive_parquet_to_duckdb(glue):
+    decision = asyncio.run(router.route("db", "tabla", "fecha_proceso", ["2024-01-01", "2024-01-02"]))
+    assert decision.engine == "duckdb"
+    assert sorted(decision.estimate.files) == ["2024-01-01", "2024-01-02"]
+
+
+@pytest.mark.parametrize("change, reason", [
+    ({"values": ["2024-01-09"]}, "partitions not in Glue"),
+    ({"max_bytes": 1}, "scan above 1 bytes"),
+    ({"input_format": "org.apache.hadoop.mapred.TextInputFormat"}, "is not Parquet"),
+    ({"location": "/datos/2024-01-01"}, "not Hive-style"),
+])
+def test_route_to_athena(glue, monkeypatch, change, reason):
+    if "max_bytes" in change:
+        monkeypatch.setattr(router, "ROUTER_DUCKDB_MAX_BYTES", change["max_bytes"])
+    if "input_format" in change:
+        glue.items[0]["StorageDescriptor"]["InputFormat"] = change["input_format"]
+    if "location" in change:
+        glue.items[0]["StorageDescriptor"]["Location"] = change["location"]
+    decision = asyncio.run(router.route("db", "tabla", "fecha_proceso", change.get("values", ["2024-01-01"])))
+    assert decision.engine == "athena" and reason in decision.reason
+
+
+def test_run_duckdb_answers_athena_query(glue, tmp_path, monkeypatch):
+    # HOME no escribible, como en Lambda: DuckDB debe trabajar solo en DUCKDB_HOME
+    monkeypatch.setenv("HOME", "/nonexistent")
+    monkeypatch.setattr(router, "DUCKDB_HOME", str(tmp_path / "duckdb"))
+    decision = asyncio.run(router.route("db", "tabla", "fecha_proceso", ["2024-01-01", "2024-01-02"]))
+    query = """
+    SELECT fecha_proceso, sum(monto) AS total
+    FROM db.tabla
+    WHERE fecha_proceso IN ('2024-01-01', '2024-01-02')
+    GROUP BY fecha_proceso
+    ORDER BY fecha_proceso
+    """
+    result = asyncio.run(router.run_duckdb(query, "db", "tabla", decision, Deadline(30)))
+    assert result.to_dict("list") == {"fecha_proceso": ["2024-01-01", "2024-01-02"], "total": [3.0, 12.0]}
+    assert (tmp_path / "duckdb").is_dir()
+
+
+def test_run_duckdb_falls_back_on_unsupported_sql(glue):
+    decision = asyncio.run(router.route("db", "tabla", "fecha_proceso", ["2024-01-01"]))
+    fallbacks = router.stats["duckdb_fallbacks"]
+    result = asyncio.run(router.run_duckdb("SELECT no_such_function(monto) FROM db.tabla", "db", "tabla",
+                                           decision, Deadline(30)))
+    assert result is None
+    assert router.stats["duckdb_fallbacks"] == fallbacks + 1
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+import sampling
+
+
+@pytest.fixture(name="df")
+def fixture_df():
+    return pd.DataFrame({"id": range(100)}, index=range(100, 200))
+
+
+def test_reservoir_is_reproducible_and_keeps_order(df):
+    sample = sampling.reservoir(df, 10, seed=7)
+    assert len(sample) == 10
+    assert sample.equals(sampling.reservoir(df, 10, seed=7))
+    assert not sample.equals(sampling.reservoir(df, 10, seed=8))
+    assert sample["id"].is_monotonic_increasing
+    assert sample.index.tolist() == list(range(10))
+
+
+def test_reservoir_returns_everything_when_short(df):
+    sample = sampling.reservoir(df.head(3), 10, seed=0)
+    assert sample["id"].tolist() == [0, 1, 2]
+    assert sample.index.tolist() == [0, 1, 2]
+
+
+def test_sample_percent_from_partition_rows():
+    rows = 1_000_000
+    assert sampling.sample_percent(10, rows) == pytest.approx(10 * sampling.SAMPLE_OVERSAMPLE / rows * 100)
+    # Particiones pequeñas se leen completas; sin estadísticas se usa el porcentaje por defecto
+    assert sampling.sample_percent(10, 50) == 100.0
+    assert sampling.sample_percent(10, None) == sampling.SAMPLE_PERCENT
+
+
+def test_sample_percent_never_rounds_to_zero():
+    percent = sampling.sample_percent(10, 5_000_000_000)
+    assert percent == sampling.SAMPLE_MIN_PERCENT > 0
+    query = sampling.build_query("db", "t", "2024-01-01", 10, percent)
+    assert f"TABLESAMPLE BERNOULLI ({sampling.SAMPLE_MIN_PERCENT})" in query
+    assert "(0.0)" not in query
+
+
+def test_build_query_orders_randomly_before_limit():
+    query = sampling.build_query("db", "tabla", "2024-01-01", 5, 2.5, "SYSTEM")
+    assert "FROM db.tabla TABLESAMPLE SYSTEM (2.5)" in query
+    assert "WHERE fecha_proceso = '2024-01-01'" in query
+    assert query.index("ORDER BY rand()") < query.index(f"LIMIT {5 * sampling.SAMPLE_OVERSAMPLE}")
+
+
+def test_build_query_full_read_has_no_tablesample():
+    assert "TABLESAMPLE" not in sampling.build_query("db", "tabla", "2024-01-01", 5, 100.0)
+
+
+def test_shortfall_reports_actual_rows():
+    assert sampling.shortfall(3, 20) == "[Muestra de 3 filas; se pidieron 20]\n"
+    assert sampling.shortfall(20, 20) == ""
+
+
+@pytest.mark.parametrize("n", [0, sampling.SAMPLE_MAX_ROWS + 1])
+def test_validate_rejects_sizes(n):
+    with pytest.raises(ValueError, match="Tamaño de muestra"):
+        sampling.validate("2024-01-01", n)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+import schema_dtypes
+
+COLUMN_TYPES = {"id": "bigint", "segmento": "string", "monto": "double", "periodo": "string"}
+
+
+def test_empty_result_keeps_the_selected_columns():
+    df, report = schema_dtypes.materialize(iter([]), COLUMN_TYPES, ["id", "monto"])
+    assert list(df.columns) == ["id", "monto"]
+    assert report["rows"] == 0
+
+
+def test_empty_result_without_projection_uses_the_table_columns():
+    df, _ = schema_dtypes.materialize(iter([]), COLUMN_TYPES)
+    assert list(df.columns) == list(COLUMN_TYPES)
+
+
+def test_chunks_are_compacted_with_the_schema():
+    chunks = [
+        pd.DataFrame({"id": pd.array([1, 2], dtype="Int64"), "segmento": ["a", "a"]}),
+        pd.DataFrame({"id": pd.array([3, 4], dtype="Int64"), "segmento": ["b", "a"]}),
+    ]
+    df, report = schema_dtypes.materialize(iter(chunks), COLUMN_TYPES, ["id", "segmento"])
+    assert df["id"].tolist() == [1, 2, 3, 4]
+    assert isinstance(df["segmento"].dtype, pd.CategoricalDtype)
+    assert report["categories"] == ["segmento"]
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+import search_index
+
+
+@pytest.fixture(name="df")
+def fixture_df():
+    return pd.DataFrame({
+        "nombre": ["Juan Pérez", "Juan Soto", "Ana Pérez", "Luis Juan"],
+        "canal": pd.Categorical(["app", "web", "app", "app"]),
+        "nota": ["llamar 12:30", None, "perez", "12 30"],
+        "monto": [1.0, 2.0, 3.0, 4.0],
+    })
+
+
+@pytest.fixture(name="index")
+def fixture_index(df):
+    return search_index.InvertedIndex(search_index.build(df))
+
+
+def test_tokenize_ignores_case_and_accents():
+    assert search_index.tokenize("Perú, LIMA-Norte") == ["peru", "lima", "norte"]
+
+
+def test_build_indexes_text_columns_only(df):
+    table = search_index.build(df)
+    terms = table.column("term").to_pylist()
+    assert terms == sorted(terms)
+    assert "nombre:perez" in terms and "canal:app" in terms and "perez" in terms
+    assert not any(term.startswith("monto:") for term in terms)
+    rows = dict(zip(terms, table.column("rows").to_pylist()))
+    assert rows["perez"] == [0, 2]
+    assert rows["canal:app"] == [0, 2, 3]
+
+
+def test_build_empty_frame():
+    assert search_index.build(pd.DataFrame({"monto": [1.0]})).num_rows == 0
+
+
+def test_match_free_and_field_terms(index):
+    assert index.match("juan").tolist() == [0, 1, 3]
+    assert index.match("canal:app juan").tolist() == [0, 3]
+    assert index.match("CANAL:App").tolist() == [0, 2, 3]
+    assert index.match("canal:tienda").tolist() == []
+    assert index.match("").tolist() == []
+
+
+def test_match_unquoted_field_restricts_first_word_only(index):
+    # 'perez' queda libre: también coincide por la columna nota
+    assert index.match("nombre:ana perez").tolist() == [2]
+    assert index.match("nombre:juan perez").tolist() == [0]
+    assert index.terms("nombre:juan perez") == ["nombre:juan", "perez"]
+
+
+def test_match_quoted_value_requires_all_words_in_column(index):
+    assert index.terms('nombre:"juan perez"') == ["nombre:juan", "nombre:perez"]
+    assert index.match('nombre:"juan perez"').tolist() == [0]
+    assert index.match('nombre:"luis juan"').tolist() == [3]
+    assert index.match('"ana perez"').tolist() == [2]
+
+
+def test_unknown_prefix_is_free_text(index):
+    assert index.terms("12:30") == ["12", "30"]
+    assert index.match("12:30").tolist() == [0, 3]
+    assert index.match("monto:1").tolist() == []
+
+
+def test_search_returns_rows_in_original_order(df):
+    searchable = search_index.Searchable(df=df, index=search_index.InvertedIndex(search_index.build(df)),
+                                         expires_at=0, source="build")
+    rows, total = search_index.search(searchable, "canal:app", limit=2)
+    assert total == 3
+    assert rows["nombre"].tolist() == ["Juan Pérez", "Ana Pérez"]
@@ -0,0 +1,43 @@
+import json
+import numpy as np
+import pandas as pd
+
+import summary
+
+
+def test_budget_uses_server_defaults_and_clamps():
+    assert summary.budget(None, None) == (summary.RESULT_MAX_ROWS, summary.RESULT_MAX_BYTES)
+    assert summary.budget(10, -5) == (10, 0)
+
+
+def test_summarize_stats_by_column_kind():
+    df = pd.DataFrame({
+        "monto": pd.array([10, None, 30, 30], dtype="Int64"),
+        "ratio": [0.5, np.inf, 1.5, np.nan],
+        "fecha": pd.to_datetime(["2024-01-01", "2024-03-01", None, "2024-02-01"]),
+        "segmento": ["a", "b", "a", None],
+    })
+    result = summary.summarize(df, "motivo", top_n=1, sample_rows=2)
+    columns = result["columns"]
+
+    assert result["rows"] == 4 and result["reason"] == "motivo"
+    # Los enteros conservan su tipo aunque haya nulos
+    assert columns["monto"] == {"dtype": "Int64", "nulls": 1, "min": 10, "max": 30, "mean": 70 / 3}
+    assert isinstance(columns["monto"]["min"], int)
+    # Infinitos no son JSON válido
+    assert columns["ratio"]["max"] is None
+    assert columns["fecha"]["min"] == "2024-01-01T00:00:00"
+    assert {k: columns["segmento"][k] for k in ("nulls", "distinct", "top")} == {"nulls": 1, "distinct": 2, "top": {"a": 2}}
+    assert len(result["sample"]) == 2
+
+
+def test_summarize_empty_frame():
+    result = summary.summarize(pd.DataFrame({"a": pd.Series([], dtype="float64")}), "vacío")
+    assert result["rows"] == 0 and result["sample"] == []
+    assert result["columns"]["a"]["nulls"] == 0
+
+
+def test_render_summary_is_compact_json():
+    text = summary.render_summary(pd.DataFrame({"a": [1, 2]}), "límite")
+    assert " " not in text.replace("límite", "")
+    assert json.loads(text)["summary"] is True
@@ -0,0 +1,57 @@
+''' Consulta de perfiles precalculados por cliente '''
+from datetime import date, timedelta
+
+
+def window_start(periodo: str, days: int) -> str:
+    '''
+    Primer día de una ventana móvil que termina en el periodo (ambos incluidos).
+    ### Parametros
+    - periodo: Último día de la ventana (YYYY-MM-DD).
+    - days: Tamaño de la ventana en días.
+    ### Retorna
+    - start: Primer día de la ventana (YYYY-MM-DD).
+    '''
+
+    return (date.fromisoformat(periodo) - timedelta(days=days - 1)).isoformat()
+
+
+def build_query(database: str,
+                table: str,
+                periodo: str,
+                key_column: str = 'id_cliente',
+                amount_column: str = 'monto',
+                partition_column: str = 'fecha_proceso',
+                windows: tuple = (1, 7, 30, 90)):
+    '''
+    Crea la consulta de Athena que agrega cada cliente en ventanas móviles que terminan en el periodo.
+    Se lee una sola vez el rango de la ventana más larga; las ventanas cortas se calculan con agregaciones condicionales.
+    ### Parametros
+    - database: Base de datos de Glue.
+    - table: Tabla de transacciones.
+    - periodo: Fecha de corte de los perfiles (YYYY-MM-DD).
+    - key_column: Columna que identifica al cliente.
+    - amount_column: Columna del monto.
+    - partition_column: Columna de partición (un valor por día).
+    - windows: Tamaños de las ventanas en días.
+    ### Retorna
+    - query: Consulta SQL con una fila por cliente.
+    '''
+
+    date.fromisoformat(periodo)
+    select = [
+        f'CAST("{key_column}" AS varchar) AS "customer_key"',
+        f'max({partition_column}) AS "last_activity"',
+    ]
+    for days in sorted(windows):
+        inside = f"{partition_column} >= '{window_start(periodo, days)}'"
+        select.append(f'count_if({inside}) AS "count_{days}d"')
+        select.append(f'sum(CASE WHEN {inside} THEN "{amount_column}" END) AS "amount_{days}d"')
+        select.append(f'count(DISTINCT CASE WHEN {inside} THEN {partition_column} END) AS "active_days_{days}d"')
+
+    return f"""
+            SELECT {", ".join(select)}
+            FROM {database}.{table}
+            WHERE {partition_column} BETWEEN '{window_start(periodo, max(windows))}' AND '{periodo}'
+              AND "{key_column}" IS NOT NULL
+            GROUP BY 1
+        """
@@ -5,13 +5,17 @@ import os
 import logging
 from datetime import datetime
 
-from helper import processing_job
+from helper import processing_job, profiles
 
 DATABASE_NAME = os.environ.get('DATABASE_NAME', 'default_db')
 TABLE_NAME = os.environ.get('TABLE_NAME', 'default_table')
 IMAGE_URI = os.environ.get("SAGEMAKER_IMAGE_URI", "")
 ROLE_ARN = os.environ.get("SAGEMAKER_ROLE_ARN", "")
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "")
+PROFILE_KEY_COLUMN = os.environ.get("PROFILE_KEY_COLUMN", "id_cliente")
+PROFILE_AMOUNT_COLUMN = os.environ.get("PROFILE_AMOUNT_COLUMN", "monto")
+# Ventanas móviles de los perfiles, en días
+PROFILE_WINDOWS = tuple(int(days) for days in os.environ.get("PROFILE_WINDOWS", "1,7,30,90").split(","))
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -41,10 +45,19 @@ def handler(event, _):
 
         logger.info("Query generada: %s", query_string)
 
+        profile_query = profiles.build_query(
+            DATABASE_NAME, TABLE_NAME, periodo,
+            key_column=PROFILE_KEY_COLUMN,
+            amount_column=PROFILE_AMOUNT_COLUMN,
+            windows=PROFILE_WINDOWS
+        )
+
         # Buena practica: juntar las carpetas de input y output con el timestamp
         path_athena_result = f"s3://{S3_BUCKET_NAME}/pipeline-executions/{timestamp}/athena-results/"
         s3_output_uri = f"s3://{S3_BUCKET_NAME}/pipeline-executions/{timestamp}/sagemaker/output/"
 
+        path_profile_result = f"s3://{S3_BUCKET_NAME}/pipeline-executions/{timestamp}/profiles/"
+
         path_sagemaker_code = f"s3://{S3_BUCKET_NAME}/sagemaker/input/sagemaker.py"
 
         sagemaker = processing_job.make_request(
@@ -68,6 +81,15 @@ def handler(event, _):
                 }
             },
             "MainJob": sagemaker,
+            "ProfileSelection": {
+                "QueryString": profile_query,
+                "ResultConfiguration": {
+                    "OutputLocation": path_profile_result
+                }
+            },
+            "ProfileLoad": {
+                "periodo": periodo
+            },
             "timestamp": date.isoformat()
         }
 
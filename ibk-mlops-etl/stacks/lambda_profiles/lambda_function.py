@@ -0,0 +1,69 @@
+'''Lambda Function for loading customer profiles into DynamoDB.'''
+
+import csv
+import codecs
+import json
+import os
+import time
+import logging
+from decimal import Decimal
+from urllib.parse import urlparse
+
+import boto3
+
+PROFILE_TABLE_NAME = os.environ.get('PROFILE_TABLE_NAME', '')
+# Días que se conserva cada fotografía de perfil (TTL de DynamoDB)
+PROFILE_RETENTION_DAYS = int(os.environ.get('PROFILE_RETENTION_DAYS', '120'))
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+s3 = boto3.client('s3')
+table = boto3.resource('dynamodb').Table(PROFILE_TABLE_NAME)
+
+
+def to_item(row: dict, periodo: str, expires_at: int) -> dict:
+    '''
+    Convierte una fila del resultado de Athena en un ítem de DynamoDB.
+    Las ventanas sin movimientos llegan vacías (NULL) y se guardan como cero.
+    '''
+
+    item = {
+        'customer_key': row['customer_key'],
+        'as_of': periodo,
+        'last_activity': row['last_activity'],
+        'updated_at': int(time.time()),
+        'ttl': expires_at
+    }
+    for name, value in row.items():
+        if name.startswith(('count_', 'amount_', 'active_days_')):
+            item[name] = Decimal(value) if value else Decimal(0)
+    return item
+
+
+def handler(event, _):
+    """
+    Lambda Handler para cargar los perfiles calculados por Athena.
+    Lee el CSV de resultados en streaming y lo escribe por lotes en la tabla de perfiles,
+    una fotografía por cliente y fecha de corte (clave customer_key + as_of).
+    """
+    try:
+        logger.info("Evento recibido: %s", json.dumps(event))
+
+        periodo = event['periodo']
+        location = urlparse(event['OutputLocation'])
+        body = s3.get_object(Bucket=location.netloc, Key=location.path.lstrip('/'))['Body']
+        expires_at = int(time.time()) + PROFILE_RETENTION_DAYS * 86400
+
+        count = 0
+        with table.batch_writer(overwrite_by_pkeys=['customer_key', 'as_of']) as batch:
+            for row in csv.DictReader(codecs.getreader('utf-8')(body)):
+                batch.put_item(Item=to_item(row, periodo, expires_at))
+                count += 1
+
+        logger.info("Perfiles cargados para %s: %s", periodo, count)
+        return {"profiles": count, "periodo": periodo}
+
+    except Exception as e:
+        logger.error("Error crítico en Profiles Lambda: %s", str(e))
+        raise e
@@ -9,6 +9,9 @@ from aws_cdk import (
     aws_sns,
     aws_sns_subscriptions as sub,
     aws_iam,
+    aws_dynamodb,
+    RemovalPolicy,
+    CfnOutput,
 )
 from constructs import Construct
 
@@ -18,6 +21,11 @@ SAGEMAKER_IMAGE_URI = os.getenv("SAGEMAKER_IMAGE_URI", "")
 SAGEMAKER_ROLE_ARN = os.getenv("SAGEMAKER_ROLE_ARN", "")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "")
 TABLE_NAME = os.getenv("TABLE_NAME", "")
+# Perfiles precalculados por cliente (ver lambda_profiles)
+PROFILE_KEY_COLUMN = os.getenv("PROFILE_KEY_COLUMN", "id_cliente")
+PROFILE_AMOUNT_COLUMN = os.getenv("PROFILE_AMOUNT_COLUMN", "monto")
+PROFILE_WINDOWS = os.getenv("PROFILE_WINDOWS", "1,7,30,90")
+PROFILE_RETENTION_DAYS = os.getenv("PROFILE_RETENTION_DAYS", "120")
 
 class MainStack(Stack):
     '''Stack for a test CDK application for Interbank MLOps'''
@@ -53,7 +61,10 @@ class MainStack(Stack):
             "TABLE_NAME": TABLE_NAME,
             "S3_BUCKET_NAME": S3_BUCKET_NAME,
             "SAGEMAKER_IMAGE_URI": SAGEMAKER_IMAGE_URI,
-            "SAGEMAKER_ROLE_ARN": SAGEMAKER_ROLE_ARN
+            "SAGEMAKER_ROLE_ARN": SAGEMAKER_ROLE_ARN,
+            "PROFILE_KEY_COLUMN": PROFILE_KEY_COLUMN,
+            "PROFILE_AMOUNT_COLUMN": PROFILE_AMOUNT_COLUMN,
+            "PROFILE_WINDOWS": PROFILE_WINDOWS
         }
 
         init_lambda = aws_lambda.Function(
@@ -72,6 +83,49 @@ class MainStack(Stack):
             resources=["*"]
         ))
 
+        # Tabla de perfiles: una fotografía por cliente y fecha de corte, leída por el servidor MCP
+        profile_table = aws_dynamodb.Table(
+            self, "CustomerProfiles",
+            partition_key=aws_dynamodb.Attribute(
+                name="customer_key",
+                type=aws_dynamodb.AttributeType.STRING
+            ),
+            sort_key=aws_dynamodb.Attribute(
+                name="as_of",
+                type=aws_dynamodb.AttributeType.STRING
+            ),
+            time_to_live_attribute="ttl",
+            removal_policy=RemovalPolicy.RETAIN,
+            billing_mode=aws_dynamodb.BillingMode.PAY_PER_REQUEST
+        )
+
+        profiles_lambda = aws_lambda.Function(
+            self,
+            id="ProfilesLambda",
+            runtime=aws_lambda.Runtime.PYTHON_3_11,
+            function_name="ibk_mlops_profiles_lambda",
+            handler="lambda_function.handler",
+            code=aws_lambda.Code.from_asset("stacks/lambda_profiles"),
+            memory_size=512,
+            timeout=Duration.minutes(10),
+            environment={
+                "PROFILE_TABLE_NAME": profile_table.table_name,
+                "PROFILE_RETENTION_DAYS": PROFILE_RETENTION_DAYS
+            }
+        )
+
+        profile_table.grant_write_data(profiles_lambda)
+        profiles_lambda.add_to_role_policy(aws_iam.PolicyStatement(
+            actions=["s3:GetObject"],
+            resources=[f"arn:aws:s3:::{S3_BUCKET_NAME}/pipeline-executions/*"]
+        ))
+
+        CfnOutput(
+            self, "ProfileTableName",
+            value=profile_table.table_name,
+            description="Tabla de perfiles por cliente (PROFILE_TABLE_NAME del servidor MCP)"
+        )
+
         # ==========================================
         # 3. STATE MACHINE DESDE ARCHIVO ASL (.json)
         # ==========================================
@@ -81,6 +135,7 @@ class MainStack(Stack):
 
         substitutions={
             "lambda_initialize_arn": init_lambda.function_arn,
+            "lambda_profiles_arn": profiles_lambda.function_arn,
             "sns_topic_arn": topic.topic_arn
         }
 
@@ -90,13 +145,13 @@ class MainStack(Stack):
             definition_body=sm_body,
             definition_substitutions=substitutions,
             state_machine_name="ibk_mlops_pipeline_state_machine",
-            timeout=Duration.minutes(10)
+            timeout=Duration.minutes(30)
         )
 
         # Permisos para invocar la Lambda de inicialización y preparación
         state_machine.add_to_role_policy(aws_iam.PolicyStatement(
             actions=["lambda:InvokeFunction"],
-            resources=[init_lambda.function_arn]
+            resources=[init_lambda.function_arn, profiles_lambda.function_arn]
         ))
 
         # Permisos para Athena (StartQueryExecution.sync)
@@ -0,0 +1,10 @@
+''' Configuración común de las pruebas unitarias de las Lambdas del pipeline '''
+
+import os
+import sys
+
+# Las Lambdas crean sus clientes boto3 al importarse (sin llamar a AWS)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+# La Lambda de inicialización importa su paquete `helper` desde su propio directorio
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "stacks", "lambda_initialize"))
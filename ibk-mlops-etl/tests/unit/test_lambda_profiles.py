@@ -0,0 +1,102 @@
+import csv
+import io
+import boto3
+import pytest
+from moto import mock_aws
+
+from stacks.lambda_profiles import lambda_function
+
+BUCKET = "athena-results"
+COLUMNS = ["customer_key", "last_activity", "count_7d", "amount_7d", "active_days_7d"]
+
+
+@pytest.fixture(name="aws")
+def fixture_aws(monkeypatch):
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName="profiles-test",
+            KeySchema=[
+                {"AttributeName": "customer_key", "KeyType": "HASH"},
+                {"AttributeName": "as_of", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "customer_key", "AttributeType": "S"},
+                {"AttributeName": "as_of", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        monkeypatch.setattr(lambda_function, "s3", s3)
+        monkeypatch.setattr(lambda_function, "table", table)
+        yield s3, table
+
+
+def upload(s3, key: str, rows: list[dict]) -> str:
+    body = io.StringIO()
+    writer = csv.DictWriter(body, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body.getvalue().encode())
+    return f"s3://{BUCKET}/{key}"
+
+
+def row(customer: int, count: int = 1) -> dict:
+    return {"customer_key": str(customer), "last_activity": "2024-03-31", "count_7d": count,
+            "amount_7d": "12.5" if count else "", "active_days_7d": min(count, 7)}
+
+
+def items(table) -> list[dict]:
+    return table.scan()["Items"]
+
+
+def test_loads_every_row_across_batches(aws):
+    s3, table = aws
+    # Más filas que un lote de BatchWriteItem (25)
+    location = upload(s3, "profiles/2024-03-31.csv", [row(customer) for customer in range(60)])
+
+    result = lambda_function.handler({"periodo": "2024-03-31", "OutputLocation": location}, None)
+
+    assert result == {"profiles": 60, "periodo": "2024-03-31"}
+    loaded = items(table)
+    assert len(loaded) == 60
+    assert {item["as_of"] for item in loaded} == {"2024-03-31"}
+    assert all(item["ttl"] > item["updated_at"] for item in loaded)
+
+
+def test_reloading_a_cutoff_is_idempotent(aws):
+    s3, table = aws
+    location = upload(s3, "profiles/2024-03-31.csv", [row(customer) for customer in range(30)])
+    event = {"periodo": "2024-03-31", "OutputLocation": location}
+    lambda_function.handler(event, None)
+
+    # Un reintento (o un resultado corregido) reemplaza la fotografía en lugar de duplicarla
+    upload(s3, "profiles/2024-03-31.csv", [row(customer, count=3) for customer in range(30)])
+    lambda_function.handler(event, None)
+    loaded = items(table)
+    assert len(loaded) == 30
+    assert {int(item["count_7d"]) for item in loaded} == {3}
+
+    # Otra fecha de corte agrega fotografías sin tocar las anteriores
+    lambda_function.handler({"periodo": "2024-04-01", "OutputLocation": location}, None)
+    assert len(items(table)) == 60
+
+
+def test_duplicate_keys_in_one_result_do_not_fail_the_batch(aws):
+    s3, table = aws
+    location = upload(s3, "profiles/dup.csv", [row(1, count=1), row(1, count=2), row(2)])
+
+    assert lambda_function.handler({"periodo": "2024-03-31", "OutputLocation": location}, None)["profiles"] == 3
+    loaded = {item["customer_key"]: item for item in items(table)}
+    assert len(loaded) == 2
+    assert int(loaded["1"]["count_7d"]) == 2
+
+
+def test_empty_windows_are_stored_as_zero(aws):
+    s3, table = aws
+    location = upload(s3, "profiles/empty.csv", [row(1, count=0)])
+    lambda_function.handler({"periodo": "2024-03-31", "OutputLocation": location}, None)
+
+    item = items(table)[0]
+    assert item["amount_7d"] == 0
+    assert item["count_7d"] == 0
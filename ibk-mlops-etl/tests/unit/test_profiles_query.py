@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+import pytest
+
+from helper import profiles
+
+duckdb = pytest.importorskip("duckdb")
+
+
+def test_window_start_includes_both_ends():
+    assert profiles.window_start("2024-03-31", 1) == "2024-03-31"
+    assert profiles.window_start("2024-03-31", 7) == "2024-03-25"
+    assert profiles.window_start("2024-03-01", 30) == "2024-02-01"
+
+
+def test_query_reads_only_the_longest_window():
+    query = profiles.build_query("db", "tx", "2024-03-31", windows=(7, 1, 30))
+    assert "BETWEEN '2024-03-02' AND '2024-03-31'" in query
+    assert query.index('"count_1d"') < query.index('"count_7d"') < query.index('"count_30d"')
+    with pytest.raises(ValueError):
+        profiles.build_query("db", "tx", "2024-13-01")
+
+
+def test_windows_aggregate_each_customer():
+    connection = duckdb.connect()
+    connection.execute("CREATE SCHEMA db")
+    connection.execute("CREATE TABLE db.tx (id_cliente BIGINT, monto DOUBLE, fecha_proceso VARCHAR)")
+    periodo = date(2024, 3, 31)
+    rows = [
+        # Cliente 1: un movimiento por día durante 40 días (dos el último día)
+        *[(1, 10.0, (periodo - timedelta(days=offset)).isoformat()) for offset in range(40)],
+        (1, 5.0, periodo.isoformat()),
+        # Cliente 2: solo un movimiento hace 20 días
+        (2, 100.0, (periodo - timedelta(days=20)).isoformat()),
+        # Fuera de la ventana más larga y sin cliente: no cuentan
+        (3, 1.0, (periodo - timedelta(days=30)).isoformat()),
+        (None, 1.0, periodo.isoformat()),
+    ]
+    connection.executemany("INSERT INTO db.tx VALUES (?, ?, ?)", rows)
+
+    query = profiles.build_query("db", "tx", periodo.isoformat(), windows=(1, 7, 30))
+    result = {row[0]: row for row in connection.execute(query).fetchall()}
+    columns = [column[0] for column in connection.description]
+    profile = {key: dict(zip(columns, row)) for key, row in result.items()}
+
+    assert set(profile) == {"1", "2"}
+    assert profile["1"]["last_activity"] == "2024-03-31"
+    assert (profile["1"]["count_1d"], profile["1"]["amount_1d"], profile["1"]["active_days_1d"]) == (2, 15.0, 1)
+    assert (profile["1"]["count_7d"], profile["1"]["amount_7d"], profile["1"]["active_days_7d"]) == (8, 75.0, 7)
+    assert (profile["1"]["count_30d"], profile["1"]["active_days_30d"]) == (31, 30)
+    # Sin movimientos en la ventana: conteo cero y suma nula (el cargador la guarda como cero)
+    assert (profile["2"]["count_7d"], profile["2"]["amount_7d"]) == (0, None)
+    assert (profile["2"]["count_30d"], profile["2"]["amount_30d"]) == (1, 100.0)